@@ -0,0 +1,80 @@
+import time
+import asyncio
+import logging
+from backend.config import settings
+from backend.agent_client import AgentError
+
+logger = logging.getLogger("AccountState")
+
+
+class AccountState:
+    """
+    The agent's /account answer for the whole process.
+
+    main.py's monitor polls refresh() at ACCOUNT_POLL_SECONDS; engines read the
+    cached snapshot (with its fetched_at) instead of calling the agent
+    themselves. get(fresh=True) forces a read, coalesced with one already in
+    flight. A snapshot older than `max_age` counts as lost connection.
+    """
+    def __init__(self, agent=None, max_age=15.0):
+        self.agent = agent  # Set in main.py's lifespan
+        self.max_age = max_age
+        self.snapshot = None
+        self.fetched_at = None
+        self.connected = False
+        self.error = None
+        self._inflight = None
+
+    @property
+    def age(self):
+        return None if self.fetched_at is None else time.time() - self.fetched_at
+
+    def is_fresh(self):
+        return self.connected and self.age is not None and self.age <= self.max_age
+
+    async def refresh(self):
+        """Reads /account now; returns the snapshot, or None when the agent did not answer."""
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._read())
+            self._inflight.add_done_callback(lambda _: setattr(self, '_inflight', None))
+        return await asyncio.shield(self._inflight)
+
+    async def _read(self):
+        if self.agent is None:
+            self.connected, self.error = False, "No agent client"
+            return None
+        try:
+            info = await self.agent.batched("account")
+        except AgentError as e:
+            self.connected, self.error = False, str(e)
+            return None
+        self.snapshot = info
+        self.fetched_at = time.time()
+        self.connected, self.error = True, None
+        return info
+
+    async def get(self, fresh=False):
+        """
+        Cached snapshot when fresh enough, otherwise (or with fresh=True) a new read.
+        When that read fails the last snapshot is returned, except with fresh=True:
+        then None, and the caller decides whether an older snapshot will do.
+        """
+        if fresh or not self.is_fresh():
+            info = await self.refresh()
+            if info is not None or fresh:
+                return info
+        return self.snapshot
+
+    def to_dict(self):
+        info = self.snapshot or {}
+        return {
+            "balance": info.get("balance", 0.0),
+            "equity": info.get("equity", 0.0),
+            "margin": info.get("margin", 0.0),
+            "fetched_at": self.fetched_at,
+            "connected": self.is_fresh(),
+            "error": self.error,
+        }
+
+
+account_state = AccountState(max_age=settings.ACCOUNT_MAX_AGE)
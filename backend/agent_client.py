@@ -0,0 +1,288 @@
+import time
+import base64
+import json as _json
+import random
+import asyncio
+import logging
+import aiohttp
+import numpy as np
+from collections import deque
+from backend.config import settings
+from backend.candle_store import COLUMNS, to_block
+from backend.candle_codec import CONTENT_TYPE, decode
+
+logger = logging.getLogger("AgentClient")
+
+
+class AgentError(Exception):
+    """Agent call failed: status is the HTTP status, or None when it could not be reached."""
+    def __init__(self, status, detail):
+        super().__init__(f"{status}: {detail}" if status else detail)
+        self.status = status
+        self.detail = detail
+
+
+class TokenBucket:
+    """`rate` requests per second on average, up to `burst` at once; callers queue in order."""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+                await asyncio.sleep(wait)
+                self.tokens, self.updated = 1.0, time.monotonic()
+            self.tokens -= 1
+
+
+class AgentClient:
+    """
+    One keep-alive connection pool to the Windows agent, shared by every engine,
+    the scheduler, the market data hub and backtest loading.
+
+    Timeouts are per endpoint (first path segment). GETs are retried with
+    jittered exponential backoff on connection errors and 5xx answers; POSTs
+    are not retried unless asked (a repeated /trade would be a second order).
+    Every attempt takes a token from a shared bucket (AGENT_RATE_LIMIT), so
+    concurrent symbols and engines cannot flood the agent.
+    batched() reads (candles, account, positions) requested within
+    `batch_window` seconds of each other share one POST /batch round trip,
+    with candles in the columnar format (base64 inside the JSON answer);
+    against an agent without /batch they fall back to one request each.
+    Latency and error counts per endpoint are kept for stats().
+    """
+    TIMEOUTS = {"data": 30, "account": 5, "trade": 10, "time": 5}
+
+    # Columnar candles when the agent supports them, JSON from older agents
+    CANDLES_ACCEPT = f"{CONTENT_TYPE}, application/json;q=0.5"
+
+    def __init__(self, base_url, pool_size=None, retries=None, backoff=0.2, timeouts=None, rate=None, burst=None,
+                 batch_window=None):
+        self.base_url = base_url
+        self.pool_size = settings.AGENT_POOL_SIZE if pool_size is None else pool_size
+        self.retries = settings.AGENT_RETRIES if retries is None else retries
+        self.backoff = backoff
+        self.timeouts = dict(self.TIMEOUTS, **(timeouts or {}))
+        self.bucket = TokenBucket(settings.AGENT_RATE_LIMIT if rate is None else rate,
+                                  settings.AGENT_BURST if burst is None else burst)
+        self.batch_window = settings.AGENT_BATCH_WINDOW if batch_window is None else batch_window
+        self.batch_supported = True
+        self.batched_items = 0
+        self._pending = None
+        self._sending = set()
+        self._session = None
+        self._metrics = {}
+
+    @property
+    def session(self):
+        # Created on first use, inside the running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get(self, path, params=None, retries=None):
+        """Parsed JSON of a 200 answer; raises AgentError otherwise."""
+        return await self.request("GET", path, params=params, retries=self.retries if retries is None else retries)
+
+    async def get_candles(self, path, params=None, retries=None):
+        """Candles from a /data path as a (6, n) block (rows as in candle_store.COLUMNS)."""
+        data = await self.request("GET", path, params=params, headers={"Accept": self.CANDLES_ACCEPT},
+                                  retries=self.retries if retries is None else retries)
+        return data if isinstance(data, np.ndarray) else to_block(data)
+
+    async def get_candle_range(self, path, start, end, limit=None):
+        """
+        Every bar with start <= time <= end as one (6, n) block, following the
+        agent's X-Next-Cursor pages (older agents answer the range in one page).
+        """
+        blocks, cursor = [], start
+        while cursor is not None:
+            params = {"from": cursor, "to": end}
+            if limit:
+                params["limit"] = limit
+            data, headers = await self.request("GET", path, params=params, headers={"Accept": self.CANDLES_ACCEPT},
+                                               retries=self.retries, with_headers=True)
+            blocks.append(data if isinstance(data, np.ndarray) else to_block(data))
+            next_cursor = headers.get("X-Next-Cursor")
+            cursor = int(next_cursor) if next_cursor and int(next_cursor) > cursor else None
+        return np.concatenate(blocks, axis=1)
+
+    async def batched(self, kind, symbol=None, timeframe=None, since=None, n=100):
+        """
+        kind "candles": (6, n) block of the latest n bars, or of bars since `since`;
+        "account" / "positions": the agent's JSON. Sent with whatever else is asked
+        for in the next batch_window seconds.
+        """
+        if kind == "candles":
+            item = {"symbol": symbol, "timeframe": timeframe, "n": n, "since": since}
+        else:
+            item = None
+        if not self.batch_supported or self.batch_window <= 0:
+            return await self._single(kind, item)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._pending is None:
+            self._pending = []
+            loop.call_later(self.batch_window, self._start_batch)
+        self._pending.append((kind, item, future))
+        return await future
+
+    def _start_batch(self):
+        task = asyncio.ensure_future(self._send_batch())
+        # Held until done, so the task is not garbage collected mid-flight
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _single(self, kind, item):
+        if kind == "candles":
+            params = {"n": item["n"]} if item["since"] is None else {"since": item["since"]}
+            return await self.get_candles(f"/data/{item['symbol']}/{item['timeframe']}", params=params)
+        return await self.get(f"/{kind}")
+
+    async def _send_batch(self):
+        pending, self._pending = self._pending, None
+        try:
+            await self._answer_batch(pending)
+        except Exception as e:
+            # Whatever went wrong, no caller may be left waiting (feeds share these futures)
+            logger.error(f"Batch of {len(pending)} reads failed: {e!r}")
+            error = e if isinstance(e, AgentError) else AgentError(502, f"Unreadable batch answer: {e!r}")
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            for _, _, future in pending:
+                if not future.done():
+                    future.cancel()
+
+    async def _answer_batch(self, pending):
+        body = {
+            "candles": [item for kind, item, _ in pending if kind == "candles"],
+            "account": any(kind == "account" for kind, _, _ in pending),
+            "positions": any(kind == "positions" for kind, _, _ in pending),
+            "candle_format": CONTENT_TYPE,
+        }
+        try:
+            # A read, so safe to retry like a GET
+            answer = await self.post("/batch", json=body, retries=self.retries)
+        except AgentError as e:
+            if e.status in (404, 405):
+                # Older agent: remember, and send these one by one
+                self.batch_supported = False
+                await asyncio.gather(*(self._resolve_single(kind, item, future) for kind, item, future in pending))
+                return
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batched_items += len(pending)
+        candles = iter(answer.get("candles", []))
+        for kind, item, future in pending:
+            try:
+                if kind == "candles":
+                    entry = next(candles)
+                    if "error" in entry:
+                        raise AgentError(entry.get("status"), entry["error"])
+                    if "data" in entry:
+                        result = decode(base64.b64decode(entry["data"]))
+                    else:
+                        # Agent without the columnar batch format
+                        result = np.array([entry[col] for col in COLUMNS], dtype=float).reshape(len(COLUMNS), -1)
+                else:
+                    result = answer.get(kind)
+                    if result is None:
+                        raise AgentError(500, f"Failed to get {kind}")
+            except AgentError as e:
+                result = e
+            except (StopIteration, KeyError, ValueError, TypeError) as e:
+                result = AgentError(502, f"Unreadable batch answer: {e!r}")
+            if not future.done():
+                if isinstance(result, AgentError):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def _resolve_single(self, kind, item, future):
+        try:
+            result = await self._single(kind, item)
+        except AgentError as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def post(self, path, json=None, retries=0):
+        return await self.request("POST", path, json=json, retries=retries)
+
+    async def request(self, method, path, params=None, json=None, retries=0, headers=None, with_headers=False):
+        endpoint = path.strip("/").split("/")[0] or "root"
+        timeout = aiohttp.ClientTimeout(total=self.timeouts.get(endpoint, 10))
+        metrics = self._endpoint(endpoint)
+        for attempt in range(retries + 1):
+            if attempt:
+                metrics["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            await self.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                async with self.session.request(method, f"{self.base_url}{path}", params=params, json=json,
+                                                headers=headers, timeout=timeout) as resp:
+                    if resp.status == 200:
+                        body = await resp.read()
+                        data = decode(body) if resp.content_type == CONTENT_TYPE else _json.loads(body)
+                        metrics["calls"] += 1
+                        metrics["bytes"] += len(body)
+                        metrics["latency"].append(time.perf_counter() - started)
+                        return (data, resp.headers) if with_headers else data
+                    error = AgentError(resp.status, await resp.text())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = AgentError(None, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+            except ValueError as e:
+                # Truncated or garbled body: treated like a bad gateway answer
+                error = AgentError(502, f"Unreadable response: {e}")
+            metrics["errors"] += 1
+            if error.status is not None and error.status < 500:
+                break
+        raise error
+
+    def _endpoint(self, endpoint):
+        if endpoint not in self._metrics:
+            self._metrics[endpoint] = {"calls": 0, "errors": 0, "retries": 0, "bytes": 0, "latency": deque(maxlen=500)}
+        return self._metrics[endpoint]
+
+    def stats(self):
+        out = {}
+        for endpoint, m in self._metrics.items():
+            latency = sorted(m["latency"])
+            out[endpoint] = {
+                "calls": m["calls"],
+                "errors": m["errors"],
+                "retries": m["retries"],
+                "bytes": m["bytes"],
+                "latency_ms": {
+                    "p50": round(latency[len(latency) // 2] * 1000, 1),
+                    "p95": round(latency[int(len(latency) * 0.95)] * 1000, 1),
+                    "max": round(latency[-1] * 1000, 1),
+                } if latency else None,
+            }
+        return out
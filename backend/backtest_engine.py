@@ -1,118 +1,351 @@
 import pandas as pd
-import aiohttp
+import numpy as np
 import asyncio
 from datetime import datetime
-from backend.database import db
-from backend.config import settings
+from backend.database import db, run_db
+from backend.config import settings, TIMEFRAME_SECONDS
+from backend.simulator import simulate, trades_to_records, SIDES
+from backend.indicator_cache import indicator_cache, frame_fingerprint
+from backend.result_cache import result_key
+from backend.candle_store import candle_store, to_block, rows_to_block
+from backend.agent_client import AgentClient, AgentError
+
+# Gap filling: at most this many bars per agent request, and gaps closer than
+# MERGE_BARS apart are fetched as one range instead of many tiny requests.
+FETCH_MAX_BARS = 5000
+FETCH_MERGE_BARS = 500
+FETCH_CONCURRENCY = 4
+# DB tier: gaps are read in spans of up to this many bar slots, one query each
+DB_SPAN_BARS = 100_000
+
+async def _store(symbol, timeframe, block):
+    """candle_store.merge() on a thread: it rewrites the series file."""
+    await asyncio.get_running_loop().run_in_executor(None, candle_store.merge, symbol, timeframe, block)
+
+
+def missing_ranges(times, start_ts, end_ts, step):
+    """
+    Inclusive (first, last) bar-time ranges missing from sorted `times`
+    on the `step` grid inside [start_ts, end_ts].
+    """
+    first = -(-int(start_ts) // step) * step
+    last = int(end_ts) // step * step
+    if first > last:
+        return []
+
+    times = np.asarray(times, dtype=np.int64)
+    times = times[(times >= first) & (times <= last)]
+    if len(times) == 0:
+        return [(first, last)]
+
+    gaps = []
+    if times[0] > first:
+        gaps.append((first, int(times[0]) - step))
+    for k in np.flatnonzero(np.diff(times) > step).tolist():
+        gaps.append((int(times[k]) + step, int(times[k + 1]) - step))
+    if times[-1] < last:
+        gaps.append((int(times[-1]) + step, last))
+    return gaps
+
+
+def plan_fetches(gaps, step, merge_bars=None, max_bars=None):
+    """Coalesces nearby gaps and splits the result into ranges of at most max_bars bars."""
+    merge_bars = FETCH_MERGE_BARS if merge_bars is None else merge_bars
+    max_bars = FETCH_MAX_BARS if max_bars is None else max_bars
+    merged = []
+    for a, b in gaps:
+        if merged and a - merged[-1][1] <= merge_bars * step:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+
+    chunks = []
+    span = max_bars * step
+    for a, b in merged:
+        while a <= b:
+            chunks.append((a, min(a + span - step, b)))
+            a += span
+    return chunks
+
+
+def _without_fetched(gaps, fetched):
+    """Drops gaps that lie entirely inside a range the agent already answered."""
+    return [(a, b) for a, b in gaps if not any(fa <= a and b <= fb for fa, fb in fetched)]
+
+
+def _mark_fetched(symbol, timeframe, rng, step):
+    # Bars that have not closed yet may still appear: only remember the past
+    a, b = rng[0], min(rng[1], int(datetime.now().timestamp()) - step)
+    if a > b:
+        return
+    ranges = sorted(candle_store.fetched_ranges(symbol, timeframe) + [(a, b)])
+    merged = [ranges[0]]
+    for ra, rb in ranges[1:]:
+        if ra <= merged[-1][1] + step:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], rb))
+        else:
+            merged.append((ra, rb))
+    candle_store.set_fetched_ranges(symbol, timeframe, merged)
+
+
+# Part of every cached backtest result key: bump when a change to the
+# simulation would make previously stored results wrong.
+ENGINE_VERSION = 1
+
+
+def strategy_params(strategy):
+    """Hashable view of a strategy instance's parameters."""
+    return tuple(sorted((k, repr(v)) for k, v in vars(strategy).items()))
+
+def _plain_record(record):
+    """numpy scalars (read from df rows) -> Python numbers, so the record is JSON-serialisable."""
+    return {k: v.item() if isinstance(v, np.generic) else v for k, v in record.items()}
+
+class ProgressStream:
+    """
+    Turns simulation snapshots into incremental events for streaming clients:
+    {"type": "progress", "stage", "pct"}, {"type": "trades", "trades": [...]} with
+    only the trades closed since the last update, and {"type": "equity", "points"}
+    with new equity points, downsampled with the same step as the chart price data.
+    """
+    def __init__(self, emit, total_bars, step=1):
+        self.emit = emit
+        self.total = max(total_bars, 1)
+        self.step = step
+        self.sent_trades = 0
+        self.sent_bars = 0
+
+    def stage(self, name, pct=0.0):
+        self.emit({"type": "progress", "stage": name, "pct": pct})
+
+    def update(self, filled, new_trades, equity_at):
+        """
+        filled: equity bars recorded so far, new_trades: trade records closed since
+        the last update, equity_at(k) -> (time, equity) for any bar k < filled.
+        """
+        if new_trades:
+            self.emit({"type": "trades", "trades": new_trades})
+            self.sent_trades += len(new_trades)
+
+        # Next multiple of step, so chunk boundaries don't shift the sampling
+        first = -(-self.sent_bars // self.step) * self.step
+        if first < filled:
+            points = [equity_at(k) for k in range(first, filled, self.step)]
+            self.emit({"type": "equity", "points": [{"time": int(t), "equity": float(e)} for t, e in points]})
+        self.sent_bars = max(self.sent_bars, filled)
+
+        self.stage("simulating", round(min(filled / self.total, 1.0) * 100, 1))
+
 
 class BacktestEngine:
-    def __init__(self, agent_url):
+    def __init__(self, agent_url, agent=None):
         self.agent_url = agent_url
+        self.agent = agent # Shared AgentClient; None opens one per fetch
 
     async def get_data(self, symbol, timeframe, start_ts, end_ts):
         """
-        Smart Data Fetching:
-        1. Check DB for existing candles in range.
-        2. If gaps or missing, fetch from Agent (MT5).
-        3. Save new data to DB.
-        4. Return full DataFrame.
+        Smart Data Fetching, tier by tier:
+        1. Candle store (in-memory arrays, then local .npy files).
+        2. MariaDB, for the bar ranges the store is missing.
+        3. Agent (MT5), for what is still missing: parallel, bounded chunks.
+        Everything found in a lower tier is merged into the store (and agent data into the DB).
         """
-        # 1. Try DB
-        cached_data = db.get_candles(symbol, timeframe, start_ts, end_ts)
-        
-        # If we have enough data (naive check: at least 1 candle per timeframe interval roughly)
-        # Proper check would be finding gaps, but for MVP:
-        # If DB returns data covering the range, use it.
-        # But MT5 fetch is usually fast, so we can fetch to fill gaps.
-        # Let's fetch from Agent to ensure freshness and fill cache.
-        # NOTE: MT5 `copy_rates_range` is better, but our Agent currently has `copy_rates_from_pos` (n candles).
-        # We need to update Agent to support Date Range or just fetch a large N.
-        # User said "pull candles from mt5... save in db".
-        
-        # Current Agent API: /data/{symbol}/{timeframe}?n=100
-        # We should probably request a large N to cover the period if cache is empty.
-        
-        # Strategy: Always fetch fresh large chunk from Agent to Fill DB, then Read from DB.
-        # Calculating N based on timeframe is complex. 
-        # Simpler: Request N=5000 (enough for recent history) or add Date Range support to Agent.
-        # Given constraints, let's stick to N=5000 for now.
-        
-        if not cached_data:
-            print(f"Backtest: Fetching fresh data for {symbol} {timeframe}...")
-            async with aiohttp.ClientSession() as session:
+        step = TIMEFRAME_SECONDS.get(timeframe)
+        if not step:
+            # Unknown timeframe: no bar grid to diff against, fall back to recent history via the DB
+            if not await run_db(db.get_candle_stats, symbol, timeframe, start_ts, end_ts):
+                await _store(symbol, timeframe, await self._fetch_ranges(symbol, timeframe, [None], None))
+            await _store(symbol, timeframe, rows_to_block(await run_db(db.get_candle_rows, symbol, timeframe, start_ts, end_ts)))
+            return candle_store.frame(symbol, timeframe, start_ts, end_ts)
+
+        gaps = self._gaps(symbol, timeframe, start_ts, end_ts, step)
+        if gaps:
+            # 2. DB tier: one query per large span covering the gaps (session gaps are
+            # far apart, so one per gap would be hundreds of round trips), one merge
+            spans = plan_fetches(gaps, step, merge_bars=DB_SPAN_BARS, max_bars=DB_SPAN_BARS)
+            blocks = [rows_to_block(await run_db(db.get_candle_rows, symbol, timeframe, a, b)) for a, b in spans]
+            await _store(symbol, timeframe, np.concatenate(blocks, axis=1))
+            gaps = self._gaps(symbol, timeframe, start_ts, end_ts, step)
+
+        if gaps:
+            # 3. Agent tier
+            ranges = plan_fetches(gaps, step)
+            print(f"Backtest: Filling {len(gaps)} gaps in {symbol} {timeframe} with {len(ranges)} requests...")
+            await _store(symbol, timeframe, await self._fetch_ranges(symbol, timeframe, ranges, step))
+            # Only once the bars are in the store: a saved range is never asked for again
+            await asyncio.get_running_loop().run_in_executor(None, candle_store.save_fetched_ranges, symbol, timeframe)
+
+        return candle_store.frame(symbol, timeframe, start_ts, end_ts)
+
+    def _gaps(self, symbol, timeframe, start_ts, end_ts, step):
+        gaps = missing_ranges(candle_store.times(symbol, timeframe, start_ts, end_ts), start_ts, end_ts, step)
+        # Ranges the agent already answered (kept next to the candle files, so across restarts)
+        return _without_fetched(gaps, candle_store.fetched_ranges(symbol, timeframe))
+
+    async def _fetch_ranges(self, symbol, timeframe, ranges, step):
+        """
+        Fetches (from_ts, to_ts) ranges concurrently (None means the latest 5000 bars),
+        saves them to the DB and returns all candles received as one (6, n) block.
+        """
+        semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+        received = []
+        # Without a shared client (worker processes, scripts) a short-lived one is used
+        agent = self.agent or AgentClient(self.agent_url)
+
+        async def fetch(rng):
+            path = f"/data/{symbol}/{timeframe}"
+            async with semaphore:
                 try:
-                    # Requesting 10000 candles to clear "history" needs.
-                    url = f"{self.agent_url}/data/{symbol}/{timeframe}?n=5000"
-                    async with session.get(url, timeout=30) as resp:
-                        if resp.status == 200:
-                            new_data = await resp.json()
-                            if new_data:
-                                db.save_candles(symbol, timeframe, new_data)
-                                cached_data = new_data # Use what we just got
-                        else:
-                            print(f"Backtest: API Error {resp.status}")
-                except Exception as e:
-                    print(f"Backtest: Connection Error {e}")
-        
-        # Re-query DB significantly if we just saved? 
-        # Actually `db.get_candles` filters by timestamp, so relying on DB is safest to respect start/end.
-        # If we just fetched N=5000, we saved them. Now we query DB for specific range.
-        
-        final_data = db.get_candles(symbol, timeframe, start_ts, end_ts)
-        if not final_data:
-            return pd.DataFrame()
-            
-        df = pd.DataFrame(final_data)
-        # Ensure correct types
-        df['time'] = pd.to_numeric(df['time'])
-        df['close'] = pd.to_numeric(df['close'])
-        df['high'] = pd.to_numeric(df['high'])
-        df['low'] = pd.to_numeric(df['low'])
-        df['open'] = pd.to_numeric(df['open'])
-        return df
-
-    def run(self, strategy_class, df, start_balance=1000):
+                    if rng is None:
+                        new_data = await agent.get_candles(path, params={"n": 5000})
+                    else:
+                        new_data = await agent.get_candle_range(path, rng[0], rng[1])
+                except AgentError as e:
+                    print(f"Backtest: API Error {e.status}" if e.status else f"Backtest: Connection Error {e.detail}")
+                    return
+            if new_data.shape[1]:
+                await run_db(db.save_candles, symbol, timeframe, new_data)
+                received.append(new_data)
+            if rng is not None:
+                # Whatever is still missing in this range does not exist (weekend, session break)
+                _mark_fetched(symbol, timeframe, rng, step)
+
+        try:
+            await asyncio.gather(*(fetch(rng) for rng in ranges))
+        finally:
+            if agent is not self.agent:
+                await agent.close()
+        return np.concatenate(received, axis=1) if received else to_block([])
+
+    async def result_key(self, strategy_class, symbol, timeframe, start_ts, end_ts, start_balance):
+        """
+        Result cache key for a backtest over the stored candles in [start_ts, end_ts],
+        or None when nothing is stored. New candles in the range change the key.
+        """
+        stats = await run_db(db.get_candle_stats, symbol, timeframe, start_ts, end_ts)
+        if not stats:
+            return None
+        return result_key(
+            ENGINE_VERSION,
+            f"{strategy_class.__module__}.{strategy_class.__qualname__}",
+            strategy_params(strategy_class()),
+            symbol, timeframe, stats, float(start_balance),
+        )
+
+    def run(self, strategy_class, df, start_balance=1000, progress=None):
         """
         Simulates strategy on DataFrame.
         Assumes strategy has `calculate_indicators` and `get_signal`.
+        Strategies with `generate_signals` run on the array-backed simulator.
+        progress: optional callable(event) receiving ProgressStream events while it runs.
         """
         if df.empty:
             return {"error": "No Data"}
 
+        # Initialize Strategy
+        strategy = strategy_class()
+        stream = None
+        if progress is not None:
+            stream = ProgressStream(progress, len(df) - 200, step=max(1, len(df) // 2000))
+            stream.stage("indicators")
+        
+        # Pre-calc indicators (memoized on strategy, its parameters and the candles,
+        # so repeated runs over identical data skip the recomputation)
+        key = ("frame", f"{strategy_class.__module__}.{strategy_class.__qualname__}", frame_fingerprint(df), strategy_params(strategy))
+        df = indicator_cache.get_or_compute(key, lambda: strategy.calculate_indicators(df.copy()))
+        
+        # Vectorized signal path: strategies exposing `generate_signals` evaluate
+        # the whole frame once and the position loop runs over plain arrays.
+        if hasattr(strategy, 'generate_signals'):
+            if stream: stream.stage("signals")
+            signals = strategy.generate_signals(df)
+            balance, trades, equity_curve = self._run_arrays(strategy, df, signals, start_balance, stream)
+        else:
+            balance, trades, equity_curve = self._run_windows(strategy, df, start_balance, stream)
+
+        # Prepare Price Data for Chart
+        # Downsample if too large? For 100k points, chart.js might struggle.
+        # Simple Nth sampling if len > 2000
+        step = 1
+        if len(df) > 2000:
+            step = len(df) // 2000
+            
+        times = df['time'].to_numpy()[::step].tolist()
+        closes = df['close'].to_numpy(dtype=float)[::step].tolist()
+        price_data = [{"time": int(t), "close": c} for t, c in zip(times, closes)]
+
+        return {
+            "final_balance": balance,
+            "trades": trades,
+            "equity_curve": equity_curve,  # Already sampled? No. Should sample entries too if needed.
+            "price_data": price_data,
+            "total_trades": len(trades),
+            "win_rate": len([t for t in trades if t['pnl'] > 0]) / len(trades) if trades else 0
+        }
+
+    def _run_arrays(self, strategy, df, signals, start_balance, stream=None):
+        """Feeds generate_signals output into the NumPy position simulator."""
+        entry = np.asarray(signals['entry'])
+        sl = signals.get('sl')
+        tp = signals.get('tp')
+
+        # Strategies without vectorized levels: call get_entry_params on entry bars only
+        if sl is None or tp is None:
+            sl = np.full(len(df), np.nan)
+            tp = np.full(len(df), np.nan)
+            if hasattr(strategy, 'get_entry_params'):
+                for i in np.flatnonzero(entry):
+                    try:
+                        ep_res = strategy.get_entry_params(SIDES[int(entry[i])], df.iloc[i])
+                        if ep_res:
+                            _, sl[i], tp[i] = [np.nan if v is None else v for v in ep_res]
+                    except Exception:
+                        pass
+
+        def position_size(balance):
+            if hasattr(strategy, 'get_position_size'):
+                return max(0.01, strategy.get_position_size(balance))
+            elif hasattr(strategy, 'fixed_lot'):
+                return strategy.fixed_lot
+            return 1.0 # Default
+
+        times = df['time'].to_numpy()
+        on_progress = None
+        if stream:
+            def on_progress(filled, trades, equity):
+                new_trades = trades_to_records(trades[stream.sent_trades:])
+                stream.update(filled, new_trades, lambda k: (times[200 + k], equity[k]))
+
+        res = simulate(
+            times, df['open'].to_numpy(dtype=float), df['high'].to_numpy(dtype=float),
+            df['low'].to_numpy(dtype=float), df['close'].to_numpy(dtype=float), entry, sl=sl, tp=tp,
+            exit_long=signals.get('exit_long'), exit_short=signals.get('exit_short'),
+            start_balance=start_balance, size=position_size, warmup=200,
+            progress=on_progress, progress_every=max(1, len(df) // 50),
+        )
+
+        equity_curve = [
+            {"time": int(t), "equity": e}
+            for t, e in zip(res.equity_time.tolist(), res.equity.tolist())
+        ]
+        return res.balance, trades_to_records(res.trades), equity_curve
+
+    def _run_windows(self, strategy, df, start_balance, stream=None):
+        """Original per-bar loop: passes df.iloc[:i+1] to get_signal / get_exit_signal."""
         balance = start_balance
         equity_curve = []
         trades = []
         position = None # {'type': 'long', 'entry': 100, 'size': 1.0}
-        
-        # Initialize Strategy
-        strategy = strategy_class()
-        
-        # Pre-calc indicators
-        df = strategy.calculate_indicators(df)
+        progress_every = max(1, len(df) // 50)
         
         # Iterate (Skip first 200 for warm up)
         for i in range(200, len(df)):
             curr = df.iloc[i]
-            prev = df.iloc[i-1] # For close checks
-            
-            # Create a mini-slice for strategy if it needs history (most use columns)
-            # Strategy expects full DF usually, but handles row-based logic via iloc[-1]
-            # To simulate "Live", we should pass df[:i+1]. But that's slow.
-            # Most of our strategies are vectorised or check last row.
-            # We can hack `get_signal` to accept a row or just use pre-calced columns.
             
             # Our strategies use `curr = df.iloc[-2]` (closed candle).
-            # So we need to simulate the "current" moment.
-            # Let's assume indicators are already correct in `df`.
-            # We just need to check signals at index `i`.
-            
-            # Adaptation: Our strategies might need slight tweak to accept "current index" or we pass sliced DF.
             # Passing sliced DF df.iloc[:i+1] is safest but slow.
-            # Let's try passing sliced for correctness.
-            
             window = df.iloc[:i+1]
             
-            # 1. Check Exits (if position exists)
             # 1. Check Exits (if position exists)
             if position:
                 # Check for strategy exit signal
@@ -155,7 +388,7 @@ class BacktestEngine:
                          # ... (Bankruptcy logic same as before) ...
                         pnl = -balance 
                         balance = 0
-                        trades.append({
+                        trades.append(_plain_record({
                             "entry_time": position['time'],
                             "exit_time": curr['time'],
                             "type": position['type'],
@@ -164,7 +397,7 @@ class BacktestEngine:
                             "pnl": pnl,
                             "size": position['size'],
                             "note": "LIQUIDATED"
-                        })
+                        }))
                         position = None
                         break 
                     
@@ -172,7 +405,7 @@ class BacktestEngine:
                     
                     note = "TP" if take_profit_hit else "SL" if stop_loss_hit else "Signal"
                     
-                    trades.append({
+                    trades.append(_plain_record({
                         "entry_time": position['time'],
                         "exit_time": curr['time'],
                         "type": position['type'],
@@ -181,7 +414,7 @@ class BacktestEngine:
                         "pnl": pnl,
                         "size": position['size'],
                         "note": note
-                    })
+                    }))
                     position = None
             
             # 2. Check Entries (if no position)
@@ -227,26 +460,13 @@ class BacktestEngine:
             
             equity_curve.append({"time": curr['time'], "equity": balance})
             
-        # Prepare Price Data for Chart
-        # Downsample if too large? For 100k points, chart.js might struggle.
-        # But let's send full for now or downsample slightly.
-        # Sending 100k points to frontend is heavy.
-        # Simple Nth sampling if len > 2000
+            if stream and (i + 1) % progress_every == 0:
+                self._stream_windows(stream, trades, equity_curve)
         
-        price_data = []
-        step = 1
-        if len(df) > 2000:
-            step = len(df) // 2000
-            
-        for i in range(0, len(df), step):
-            row = df.iloc[i]
-            price_data.append({"time": int(row['time']), "close": float(row['close'])})
+        if stream:
+            self._stream_windows(stream, trades, equity_curve)
+        return balance, trades, equity_curve
 
-        return {
-            "final_balance": balance,
-            "trades": trades,
-            "equity_curve": equity_curve,  # Already sampled? No. Should sample entries too if needed.
-            "price_data": price_data,
-            "total_trades": len(trades),
-            "win_rate": len([t for t in trades if t['pnl'] > 0]) / len(trades) if trades else 0
-        }
+    def _stream_windows(self, stream, trades, equity_curve):
+        stream.update(len(equity_curve), trades[stream.sent_trades:],
+                      lambda k: (equity_curve[k]['time'], equity_curve[k]['equity']))
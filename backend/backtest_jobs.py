@@ -0,0 +1,334 @@
+import time
+import uuid
+import asyncio
+import traceback
+import multiprocessing
+from collections import OrderedDict
+from backend.backtest_engine import BacktestEngine
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, TIMEOUT = "queued", "running", "done", "failed", "cancelled", "timeout"
+FINISHED = (DONE, FAILED, CANCELLED, TIMEOUT)
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _log_failure(tb):
+    """Full traceback goes to logs/backtest_error.log; the job keeps the last line."""
+    try:
+        with open("logs/backtest_error.log", "w") as f:
+            f.write(tb)
+    except OSError:
+        pass
+    return f"Internal Error: {tb.strip().splitlines()[-1]}"
+
+
+def _summary(result):
+    """Result without the trades and equity curve a stream already carried."""
+    return {k: v for k, v in result.items() if k not in ("trades", "equity_curve")}
+
+
+def _worker_main(conn):
+    """
+    Backtest worker process: receives (strategy_class, df, start_balance, stream, cache, cache_key)
+    and answers ("result", dict) or ("error", traceback). With stream set it also sends
+    ("event", dict) progress events first, and the result is only the summary.
+    Full results are written to the result cache here, off the event loop.
+    Lives across jobs, so its indicator cache keeps serving repeated runs.
+    """
+    engine = BacktestEngine(agent_url=None)
+    while True:
+        try:
+            strategy_class, df, start_balance, stream, cache, cache_key = conn.recv()
+        except EOFError:
+            return
+        try:
+            progress = (lambda event: conn.send(("event", event))) if stream else None
+            result = engine.run(strategy_class, df, start_balance=start_balance, progress=progress)
+            if cache is not None and cache_key and "error" not in result:
+                cache.put(cache_key, result)
+            if stream:
+                result = _summary(result)
+            conn.send(("result", result))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+
+class _WorkerProcess:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class BacktestJob:
+    def __init__(self, strategy_class, symbol, timeframe, start_ts, end_ts, balance, agent_url, stream=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.strategy_class = strategy_class
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.balance = balance
+        self.agent_url = agent_url
+        self.stream = stream
+        self.cache_key = None
+        self.cached = False
+
+        self.status = QUEUED
+        self.error = None
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = False
+        self.done = asyncio.Event()
+        self.progress = None
+        self._listeners = []
+
+    def subscribe(self):
+        """Queue receiving this job's events; the last one is "done" or "error"."""
+        queue = asyncio.Queue()
+        self._listeners.append(queue)
+        return queue
+
+    def publish(self, event):
+        if event.get("type") == "progress":
+            self.progress = event
+        for queue in self._listeners:
+            queue.put_nowait(event)
+
+    def finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        self.done.set()
+        if status == DONE:
+            self.publish({"type": "done", "result": result})
+        else:
+            self.publish({"type": "error", "status": status, "error": error or f"Backtest {status}"})
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "strategy": self.strategy_class.__name__,
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "error": self.error,
+            "cached": self.cached,
+            "progress": self.progress,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class BacktestJobQueue:
+    """
+    Runs backtests outside the trading event loop.
+
+    Jobs wait in a bounded queue and are picked up by `workers` long-lived
+    worker processes. Candle loading stays on the event loop (it is I/O);
+    the simulation runs in the worker. A job that exceeds `timeout` seconds, or
+    is cancelled while running, has its worker killed and replaced.
+
+    With a `cache` (ResultCache), a request whose candles and parameters were
+    already simulated finishes at submit time without touching the queue.
+    `agent` (AgentClient) is used to fill candle gaps when set.
+    """
+    def __init__(self, workers=2, max_queued=16, timeout=300, keep_finished=100, poll_interval=0.05, cache=None, agent=None):
+        self.workers = workers
+        self.cache = cache
+        self.agent = agent
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.keep_finished = keep_finished
+        self.poll_interval = poll_interval
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._runners = []
+        self._closing = False
+        # spawn: forking a process that runs an event loop and aiohttp sessions is unsafe
+        self._ctx = multiprocessing.get_context("spawn")
+
+    def start(self):
+        if self._runners:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue()
+        self._runners = [asyncio.create_task(self._runner()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # The flag covers a cancellation swallowed by wait_for() in the middle of a job
+        self._closing = True
+        for task in self._runners:
+            task.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        for job in self.jobs.values():
+            if job.status not in FINISHED:
+                job.finish(CANCELLED, error="Server shutting down")
+
+    async def submit(self, strategy_class, symbol, timeframe, start_ts, end_ts, balance, agent_url, stream=False):
+        """Queues a job, or finishes it from the result cache. Must be awaited on the event loop."""
+        if self._queue is None:
+            self.start()
+
+        job = BacktestJob(strategy_class, symbol, timeframe, start_ts, end_ts, balance, agent_url, stream)
+        if self.cache is not None:
+            job.cache_key = await self._cache_key(job)
+            # Loads a pickle from disk, so it runs on a thread
+            cached = await asyncio.get_running_loop().run_in_executor(None, self.cache.get, job.cache_key) if job.cache_key else None
+            if cached is not None:
+                job.cached = True
+                self.jobs[job.id] = job
+                # Next loop iteration, so the caller can subscribe() to the job first
+                asyncio.get_running_loop().call_soon(self._finish_cached, job, cached)
+                return job
+
+        if self._waiting() >= self.max_queued:
+            raise QueueFull(f"Backtest queue is full ({self.max_queued} jobs waiting)")
+
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self._prune()
+        return job
+
+    async def _cache_key(self, job):
+        engine = BacktestEngine(agent_url=job.agent_url)
+        return await engine.result_key(job.strategy_class, job.symbol, job.timeframe, job.start_ts, job.end_ts, job.balance)
+
+    def _finish_cached(self, job, result):
+        job.started = time.time()
+        if not job.stream:
+            job.finish(DONE, result=result)
+            return
+        # Replay what a live stream would have sent, in one go
+        equity = result.get("equity_curve", [])
+        step = max(1, (len(equity) + 200) // 2000)
+        job.publish({"type": "trades", "trades": result.get("trades", [])})
+        job.publish({"type": "equity", "points": equity[::step]})
+        job.publish({"type": "progress", "stage": "simulating", "pct": 100.0})
+        job.finish(DONE, result=_summary(result))
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _waiting(self):
+        # Cancelled jobs stay in the asyncio queue until a runner pops them, so qsize() overcounts
+        return sum(job.status == QUEUED and not job.cached for job in self.jobs.values())
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_requested = True
+        if job.status == QUEUED:
+            # The runner skips it when it reaches the front of the queue
+            job.finish(CANCELLED)
+        return job
+
+    def stats(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "queued": self._waiting(), "jobs": counts}
+
+    def _prune(self):
+        # Drop the oldest finished jobs beyond keep_finished
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    async def _runner(self):
+        worker = None
+        try:
+            while not self._closing:
+                job = await self._queue.get()
+                if job.status != QUEUED:
+                    continue
+
+                job.status = RUNNING
+                job.started = time.time()
+                try:
+                    if worker is None or not worker.alive():
+                        worker = _WorkerProcess(self._ctx)
+                    reusable = await self._run(job, worker)
+                except Exception:
+                    job.finish(FAILED, error=_log_failure(traceback.format_exc()))
+                    reusable = False
+                if not reusable and worker is not None:
+                    # Timed out, cancelled or failed mid-run: the worker may still be busy
+                    worker.kill()
+                    worker = None
+                self._prune()
+        finally:
+            if worker is not None:
+                worker.kill()
+
+    async def _run(self, job, worker):
+        """Returns False when the worker was abandoned mid-job and must be replaced."""
+        deadline = job.started + self.timeout
+
+        engine = BacktestEngine(agent_url=job.agent_url, agent=self.agent)
+        job.publish({"type": "progress", "stage": "loading", "pct": 0.0})
+        try:
+            df = await asyncio.wait_for(
+                engine.get_data(job.symbol, job.timeframe, job.start_ts, job.end_ts),
+                timeout=max(deadline - time.time(), 0),
+            )
+        except asyncio.TimeoutError:
+            job.finish(TIMEOUT, error=f"Timed out after {self.timeout}s (loading data)")
+            return True
+
+        if job.cancel_requested or self._closing:
+            job.finish(CANCELLED)
+            return True
+        if df.empty:
+            job.finish(FAILED, error="No data found for this period.")
+            return True
+        if self.cache is not None:
+            # Loading may have filled the range, so key on what is stored now
+            job.cache_key = await self._cache_key(job)
+
+        # Pipe transfers block until the other side reads (a fresh worker is
+        # still importing), so they run on a thread instead of the event loop
+        loop = asyncio.get_running_loop()
+        request = (job.strategy_class, df, job.balance, job.stream, self.cache, job.cache_key)
+        await loop.run_in_executor(None, worker.conn.send, request)
+        while True:
+            if job.cancel_requested or self._closing:
+                job.finish(CANCELLED)
+                return False
+            if time.time() > deadline:
+                job.finish(TIMEOUT, error=f"Timed out after {self.timeout}s")
+                return False
+            if not worker.conn.poll():
+                if not worker.alive():
+                    job.finish(FAILED, error="Backtest worker exited unexpectedly")
+                    return False
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            kind, payload = await loop.run_in_executor(None, worker.conn.recv)
+            if kind != "event":
+                break
+            job.publish(payload)
+
+        if kind == "error":
+            job.finish(FAILED, error=_log_failure(payload))
+        else:
+            job.finish(DONE, result=payload)
+        return True
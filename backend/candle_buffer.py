@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from backend.candle_store import COLUMNS, to_block
+
+
+def block_records(block):
+    """(6, k) block -> agent-style candle dicts, oldest first."""
+    rows = zip(*(block[i].tolist() for i in range(len(COLUMNS))))
+    return [{'time': int(t), 'open': o, 'high': h, 'low': l, 'close': c, 'tick_volume': int(v)}
+            for t, o, h, l, c, v in rows]
+
+
+def block_frame(block):
+    """(6, k) block -> DataFrame, like pd.DataFrame(agent_json)."""
+    columns = {col: block[i] for i, col in enumerate(COLUMNS)}
+    columns['time'] = columns['time'].astype(np.int64)
+    columns['tick_volume'] = columns['tick_volume'].astype(np.int64)
+    return pd.DataFrame(columns)
+
+
+class CandleBuffer:
+    """
+    The newest `capacity` candles of one (symbol, timeframe), in a fixed (6, capacity)
+    float64 ring (rows as in candle_store.COLUMNS). extend() takes what the agent
+    returned since last_time: the bar at last_time (it was still forming) is
+    overwritten, newer bars are appended over the oldest ones.
+    """
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._data = np.empty((len(COLUMNS), capacity))
+        self._end = 0  # Next write position
+        self.size = 0
+
+    @property
+    def last_time(self):
+        return int(self._data[0, self._end - 1]) if self.size else None
+
+    def extend(self, candles):
+        """Merges agent candles (dicts or a (6, n) block); returns how many new bars were added."""
+        block = candles if isinstance(candles, np.ndarray) else to_block(candles)
+        if block.shape[1] == 0:
+            return 0
+        block = block[:, np.argsort(block[0], kind='stable')]
+        if self.size:
+            last = self._data[0, self._end - 1]
+            block = block[:, block[0] >= last]
+            if block.shape[1] and block[0, 0] == last:
+                self._data[:, self._end - 1] = block[:, 0]
+                block = block[:, 1:]
+
+        added = block.shape[1]
+        if added >= self.capacity:
+            self._data[:] = block[:, -self.capacity:]
+            self._end, self.size = 0, self.capacity
+            return added
+        first = min(added, self.capacity - self._end)
+        self._data[:, self._end:self._end + first] = block[:, :first]
+        self._data[:, :added - first] = block[:, first:]
+        self._end = (self._end + added) % self.capacity
+        self.size = min(self.size + added, self.capacity)
+        return added
+
+    def tail(self, n=None):
+        """The newest n candles (all by default) as an ordered (6, k) block."""
+        k = self.size if n is None else min(n, self.size)
+        return self._data[:, (self._end - k + np.arange(k)) % self.capacity]
+
+    def records(self, n=None):
+        """The newest n candles as agent-style dicts, oldest first."""
+        return block_records(self.tail(n))
+
+    def frame(self, n=None):
+        """The newest n candles as a DataFrame, like pd.DataFrame(agent_json)."""
+        return block_frame(self.tail(n))
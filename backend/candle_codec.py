@@ -0,0 +1,39 @@
+import struct
+import numpy as np
+from backend.candle_store import COLUMNS
+
+# Columnar candle format served by windows_agent/agent.py when asked for it
+# (Accept: application/x-candles). All little-endian:
+#   header  b"CNDL", u8 version, u8 column count, u16 reserved, u32 bar count
+#   columns time i8[n], open f8[n], high f8[n], low f8[n], close f8[n], tick_volume i8[n]
+CONTENT_TYPE = "application/x-candles"
+MAGIC = b"CNDL"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHI")
+DTYPES = ("<i8", "<f8", "<f8", "<f8", "<f8", "<i8")
+
+
+class CandleFormatError(ValueError):
+    pass
+
+
+def encode_block(block):
+    """(6, n) block -> bytes (the agent encodes MT5's rates array the same way)."""
+    n = block.shape[1]
+    return HEADER.pack(MAGIC, VERSION, len(COLUMNS), 0, n) + b"".join(
+        np.ascontiguousarray(block[i], dtype=dtype).tobytes() for i, dtype in enumerate(DTYPES))
+
+
+def decode(payload):
+    """bytes -> (6, n) float64 block, one vectorised copy per column."""
+    if len(payload) < HEADER.size:
+        raise CandleFormatError("Truncated candle header")
+    magic, version, ncols, _, n = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION or ncols != len(COLUMNS):
+        raise CandleFormatError(f"Unsupported candle payload ({magic!r} v{version}, {ncols} columns)")
+    if len(payload) != HEADER.size + 8 * ncols * n:
+        raise CandleFormatError(f"Candle payload is {len(payload)} bytes, expected {HEADER.size + 8 * ncols * n}")
+    block = np.empty((ncols, n))
+    for i, dtype in enumerate(DTYPES):
+        block[i] = np.frombuffer(payload, dtype=dtype, count=n, offset=HEADER.size + 8 * n * i)
+    return block
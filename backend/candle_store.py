@@ -0,0 +1,222 @@
+import os
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from backend.config import settings
+
+logger = logging.getLogger("CandleStore")
+
+# Row order of the (6, n) float64 block kept per (symbol, timeframe).
+# Each row is contiguous, so a column slice is a plain view of the file.
+COLUMNS = ('time', 'open', 'high', 'low', 'close', 'tick_volume')
+
+
+def to_block(candles):
+    """Agent/DB candle dicts -> (6, n) block."""
+    if not len(candles):
+        return np.empty((len(COLUMNS), 0))
+    return np.array([[c.get(col, 0) for c in candles] for col in COLUMNS], dtype=float)
+
+
+def rows_to_block(rows):
+    """DB (timestamp, open, high, low, close, volume) tuples -> (6, n) block."""
+    if not len(rows):
+        return np.empty((len(COLUMNS), 0))
+    return np.array(rows, dtype=float).T
+
+
+class CandleStore:
+    """
+    Full candle history per (symbol, timeframe) as NumPy arrays, in two tiers:
+    an in-process LRU (bounded by bytes) and one .npy file per series that is
+    memory-mapped on first use. Callers merge whatever they fetch from MariaDB
+    or the agent back in, so both tiers fill up over time.
+
+    merge() rewrites the series file, so async callers run it on a thread;
+    merges of one series are serialised, and reads never wait on a write.
+
+    Next to each series file, {symbol}_{timeframe}.fetched.json keeps the
+    bar ranges the agent already answered: bars still missing inside them are
+    market closures, so they are not requested again after a restart.
+    """
+    def __init__(self, directory="cache/candles", max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()  # (symbol, timeframe) -> block
+        self.bytes = 0
+        self.memory_hits = 0
+        self.file_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # memory tier and counters
+        self._series_locks = {}  # (symbol, timeframe) -> lock held while merging
+        self._fetched = {}  # (symbol, timeframe) -> [(first, last), ...] answered by the agent
+
+    def _path(self, symbol, timeframe):
+        return os.path.join(self.directory, f"{symbol}_{timeframe}.npy")
+
+    def _fetched_path(self, symbol, timeframe):
+        return os.path.join(self.directory, f"{symbol}_{timeframe}.fetched.json")
+
+    def fetched_ranges(self, symbol, timeframe):
+        """Inclusive (first, last) bar-time ranges the agent already answered (read from disk once)."""
+        key = (symbol, timeframe)
+        with self._lock:
+            ranges = self._fetched.get(key)
+        if ranges is not None:
+            return ranges
+        try:
+            with open(self._fetched_path(symbol, timeframe)) as f:
+                ranges = [(int(a), int(b)) for a, b in json.load(f)]
+        except FileNotFoundError:
+            ranges = []
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Ignoring unreadable fetched ranges for {symbol} {timeframe}: {e}")
+            ranges = []
+        with self._lock:
+            return self._fetched.setdefault(key, ranges)
+
+    def set_fetched_ranges(self, symbol, timeframe, ranges):
+        """Replaces the answered ranges in memory; save_fetched_ranges() writes them."""
+        with self._lock:
+            self._fetched[(symbol, timeframe)] = ranges
+
+    def save_fetched_ranges(self, symbol, timeframe):
+        ranges = self.fetched_ranges(symbol, timeframe)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._fetched_path(symbol, timeframe)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(ranges, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Error writing fetched ranges for {symbol} {timeframe}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def load(self, symbol, timeframe):
+        """The stored (6, n) block, or None."""
+        key = (symbol, timeframe)
+        with self._lock:
+            block = self._memory.get(key)
+            if block is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return block
+
+        try:
+            block = np.load(self._path(symbol, timeframe), mmap_mode='r')
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable candle file for {symbol} {timeframe}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.file_hits += 1
+        return self._remember(key, block)
+
+    def merge(self, symbol, timeframe, block):
+        """Adds candles (a (6, m) block); rows with an existing time replace the stored bar."""
+        if block.shape[1] == 0:
+            return self.load(symbol, timeframe)
+
+        with self._lock:
+            series_lock = self._series_locks.setdefault((symbol, timeframe), threading.Lock())
+        with series_lock:
+            return self._merge(symbol, timeframe, block)
+
+    def _merge(self, symbol, timeframe, block):
+        current = self.load(symbol, timeframe)
+        combined = block if current is None else np.concatenate([block, current], axis=1)
+        # Stable sort keeps the new bar first among equal times; unique keeps the first
+        order = np.argsort(combined[0], kind='stable')
+        combined = combined[:, order]
+        _, first = np.unique(combined[0], return_index=True)
+        merged = np.ascontiguousarray(combined[:, first])
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(symbol, timeframe)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, merged)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Error writing candle file for {symbol} {timeframe}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+        return self._remember((symbol, timeframe), merged)
+
+    def times(self, symbol, timeframe, start_ts, end_ts):
+        """Stored bar times in [start_ts, end_ts] as int64."""
+        block = self.load(symbol, timeframe)
+        if block is None:
+            return np.empty(0, dtype=np.int64)
+        lo, hi = self._bounds(block, start_ts, end_ts)
+        return block[0, lo:hi].astype(np.int64)
+
+    def frame(self, symbol, timeframe, start_ts, end_ts):
+        """Candles in [start_ts, end_ts] as a DataFrame (empty if none)."""
+        block = self.load(symbol, timeframe)
+        if block is None:
+            return pd.DataFrame()
+        lo, hi = self._bounds(block, start_ts, end_ts)
+        if lo >= hi:
+            return pd.DataFrame()
+        columns = {col: np.array(block[i, lo:hi]) for i, col in enumerate(COLUMNS)}
+        columns['time'] = columns['time'].astype(np.int64)
+        return pd.DataFrame(columns)
+
+    def _bounds(self, block, start_ts, end_ts):
+        times = block[0]
+        return int(np.searchsorted(times, start_ts, side='left')), int(np.searchsorted(times, end_ts, side='right'))
+
+    def _remember(self, key, block):
+        """Keeps block in the memory tier and returns the array callers should use."""
+        if block.nbytes <= self.max_bytes:
+            # mmapped blocks are read into memory here; later hits never touch the disk
+            block = np.array(block)
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            if block.nbytes > self.max_bytes:
+                # Too big for the memory tier: keep serving it from the mmapped file
+                return block
+            self._memory[key] = block
+            self.bytes += block.nbytes
+            while self.bytes > self.max_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self.bytes -= evicted.nbytes
+        return block
+
+    def stats(self):
+        return {
+            "memory_hits": self.memory_hits,
+            "file_hits": self.file_hits,
+            "misses": self.misses,
+            "series_in_memory": len(self._memory),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.bytes = 0
+
+
+candle_store = CandleStore(settings.CANDLE_STORE_DIR, settings.CANDLE_CACHE_MAX_MB * 1024 * 1024)
@@ -1,5 +1,16 @@
 from pydantic_settings import BaseSettings
 
+# Bar length per timeframe (seconds), as used by the agent's /data endpoint
+TIMEFRAME_SECONDS = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "30m": 30 * 60,
+    "1h": 60 * 60,
+    "4h": 4 * 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
 class Settings(BaseSettings):
     # Windows Agent Configuration
     AGENT_URL: str = "http://192.168.122.121:8001" # User provided IP
@@ -42,6 +53,53 @@ class Settings(BaseSettings):
     # Risk Management
     RISK_PERCENT: float = 5.0  # 5% risk per trade
     
+    # Backtest Jobs (worker processes, queued jobs allowed, seconds per job)
+    BACKTEST_WORKERS: int = 2
+    BACKTEST_QUEUE_SIZE: int = 16
+    BACKTEST_TIMEOUT: int = 300
+    BACKTEST_CACHE_DIR: str = "cache/backtests"
+    BACKTEST_CACHE_MAX_MB: int = 512
+    
+    # Candle Store (local columnar files + in-memory LRU in front of MariaDB)
+    CANDLE_STORE_DIR: str = "cache/candles"
+    CANDLE_CACHE_MAX_MB: int = 512
+    
+    # Agent Client (one keep-alive pool shared by engines, scheduler and backtests)
+    AGENT_POOL_SIZE: int = 16
+    AGENT_RETRIES: int = 2 # GET retries on connection errors / 5xx
+    AGENT_RATE_LIMIT: float = 20.0 # Requests per second to the agent (token bucket), 0 = unlimited
+    AGENT_BURST: int = 10
+    AGENT_BATCH_WINDOW: float = 0.005 # Reads requested this close together share one /batch call (0 = off)
+    SYMBOL_CONCURRENCY: int = 8 # Symbols evaluated at once per engine
+    SYMBOL_FETCH_TIMEOUT: float = 20.0 # Seconds one symbol's data fetch may take in a pass
+    ANALYSIS_WORKERS: int = 4 # Threads for indicator / signal evaluation off the event loop
+    
+    # MariaDB connection pool (one connection per operation)
+    DB_POOL_SIZE: int = 8
+    
+    # Write-behind queue for live candles and trades
+    DB_WRITE_BATCH: int = 500 # Rows per flush
+    DB_WRITE_INTERVAL: float = 1.0 # Max seconds a write waits in the queue
+    DB_WRITE_QUEUE: int = 1000 # Queued writes before producers wait (backpressure)
+    
+    # Event loop lag monitor
+    LOOP_LAG_INTERVAL: float = 0.25
+    LOOP_LAG_THRESHOLD: float = 0.1 # Stalls longer than this are logged with their culprit
+    
+    # Account State (one /account poll shared by every engine and order)
+    ACCOUNT_POLL_SECONDS: float = 5.0
+    ACCOUNT_MAX_AGE: float = 15.0 # Older snapshots count as a lost connection
+    
+    # Market Data Hub (one shared candle feed per symbol/timeframe for the live engines)
+    MARKET_DATA_BARS: int = 200 # Bars held per feed: the live engines' history window (strategy_engine.HISTORY_BARS)
+    MARKET_DATA_MAX_AGE: float = 0.5 # Seconds a snapshot is served without refetching
+    
+    # Live Scheduler (entries just after each bar close, exits at their own cadence)
+    BAR_CLOSE_DELAY: float = 1.0 # Seconds after the close before evaluating
+    BAR_WAIT_SECONDS: float = 10.0 # Retry while the agent has no tick in the new bar yet
+    EXIT_CHECK_SECONDS: float = 10.0
+    CLOCK_SYNC_SECONDS: float = 600.0
+    
     class Config:
         env_file = ".env"
 
@@ -1,32 +1,121 @@
 import mariadb
+import numpy as np
 import sys
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from backend.config import settings
 import logging
 
 logger = logging.getLogger("Database")
 
 class Database:
-    def __init__(self):
-        self.conn = None
-        self.cursor = None
+    """
+    MariaDB access through a connection pool.
+
+    Every operation checks out its own connection (pinged, and reconnected
+    when the server dropped it) and hands it back when done, so engines, the
+    DB writer and backtests never share a cursor. The pool is created on first
+    use; after a failed attempt the next one waits `retry_seconds`.
+    Methods block: async code calls them through run_db().
+    """
+    def __init__(self, pool_size=8, checkout_timeout=5.0, retry_seconds=5.0):
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.retry_seconds = retry_seconds
+        self.pool = None
+        self._lock = threading.Lock()
+        self._failed_at = None
+        self.last_error = None
+        self.reconnects = 0
 
     def connect(self):
         try:
-            self.conn = mariadb.connect(
-                user="bot_user",
-                password="bot_pass",
-                host="localhost",
-                port=3306,
-                database="algo_trading"
-            )
-            self.cursor = self.conn.cursor()
-            self.init_table()
-            self.init_candle_table()
-            logger.info("Connected to MariaDB")
+            self._get_pool()
         except mariadb.Error as e:
             logger.error(f"Error connecting to MariaDB: {e}")
 
-    def init_table(self):
+    def _get_pool(self):
+        with self._lock:
+            if self.pool is not None:
+                return self.pool
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_seconds:
+                raise mariadb.Error(f"Database unavailable: {self.last_error}")
+            try:
+                pool = mariadb.ConnectionPool(
+                    pool_name="algo_trading",
+                    pool_size=self.pool_size,
+                    user="bot_user",
+                    password="bot_pass",
+                    host="localhost",
+                    port=3306,
+                    database="algo_trading"
+                )
+            except mariadb.Error as e:
+                self._failed_at, self.last_error = time.monotonic(), str(e)
+                raise
+            self.pool, self._failed_at, self.last_error = pool, None, None
+        with self.connection() as conn:
+            self.init_table(conn)
+            self.init_candle_table(conn)
+        logger.info("Connected to MariaDB")
+        return self.pool
+
+    def _checkout(self, pool):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            try:
+                conn = pool.get_connection()
+            except mariadb.Error:
+                conn = None
+            if conn is not None:
+                return conn
+            if time.monotonic() >= deadline:
+                raise mariadb.Error(f"No free connection in the pool after {self.checkout_timeout}s")
+            time.sleep(0.01)
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection for one operation; returned to the pool afterwards."""
+        conn = self._checkout(self.pool or self._get_pool())
+        try:
+            try:
+                conn.ping()
+            except mariadb.Error:
+                # Dropped by the server (wait_timeout, restart): reconnect in place
+                conn.reconnect()
+                self.reconnects += 1
+            yield conn
+        except mariadb.Error as e:
+            self.last_error = str(e)
+            try:
+                conn.rollback()
+            except mariadb.Error:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    def health(self):
+        """Pings one pooled connection."""
+        started = time.perf_counter()
+        try:
+            with self.connection():
+                pass
+            ok = True
+        except mariadb.Error as e:
+            self.last_error, ok = str(e), False
+        return {
+            "connected": ok,
+            "ping_ms": round((time.perf_counter() - started) * 1000, 1) if ok else None,
+            "pool_size": self.pool_size,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        }
+
+    def init_table(self, conn):
         query = """
         CREATE TABLE IF NOT EXISTS trades (
             id INT AUTO_INCREMENT PRIMARY KEY,
@@ -40,17 +129,18 @@ class Database:
         )
         """
         try:
-            self.cursor.execute(query)
+            cursor = conn.cursor()
+            cursor.execute(query)
             # Add column if missing (for existing tables)
             try:
-                self.cursor.execute("ALTER TABLE trades ADD COLUMN strategy VARCHAR(20) AFTER symbol")
+                cursor.execute("ALTER TABLE trades ADD COLUMN strategy VARCHAR(20) AFTER symbol")
             except: pass  # Ignore if exists
             
-            self.conn.commit()
+            conn.commit()
         except mariadb.Error as e:
             logger.error(f"Error creating table: {e}")
 
-    def init_candle_table(self):
+    def init_candle_table(self, conn):
         """Creates table for caching OHLCV data for backtesting"""
         query = """
         CREATE TABLE IF NOT EXISTS candles (
@@ -67,65 +157,112 @@ class Database:
         )
         """
         try:
-            self.cursor.execute(query)
-            self.conn.commit()
+            conn.cursor().execute(query)
+            conn.commit()
         except mariadb.Error as e:
             logger.error(f"Error creating candles table: {e}")
 
     def log_trade(self, symbol, strategy, action, price, volume, result):
-        if not self.conn: self.connect()
-        if not self.cursor: return
-
+        """Returns False when the row could not be written."""
         try:
-            self.cursor.execute(
-                "INSERT INTO trades (symbol, strategy, action, price, volume, result) VALUES (?, ?, ?, ?, ?, ?)",
-                (symbol, strategy, action, price, volume, result)
-            )
-            self.conn.commit()
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO trades (symbol, strategy, action, price, volume, result) VALUES (?, ?, ?, ?, ?, ?)",
+                    (symbol, strategy, action, price, volume, result)
+                )
+                conn.commit()
+            return True
         except mariadb.Error as e:
             logger.error(f"Error inserting trade: {e}")
+            return False
 
     def save_candles(self, symbol, timeframe, candles):
         """
         Bulk insert/ignore candles.
-        candles: list of dicts {'time': int, 'open': float...}
+        candles: list of dicts {'time': int, 'open': float...}, or a (6, n) block
+        (rows time, open, high, low, close, tick_volume) straight from the agent.
+        Returns False when the rows could not be written.
         """
-        if not self.conn: self.connect()
-        if not self.cursor: return
-
         try:
-            data = []
-            for c in candles:
-                data.append((symbol, timeframe, c['time'], c['open'], c['high'], c['low'], c['close'], c.get('tick_volume', 0)))
-            
-            self.cursor.executemany(
-                "INSERT IGNORE INTO candles (symbol, timeframe, timestamp, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                data
-            )
-            self.conn.commit()
-            logger.info(f"Cached {len(data)} candles for {symbol} {timeframe}")
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                if isinstance(candles, np.ndarray):
+                    t, o, h, l, c, v = (candles[i].tolist() for i in range(6))
+                    data = [(symbol, timeframe, int(ts), *row, int(vol)) for ts, *row, vol in zip(t, o, h, l, c, v)]
+                else:
+                    data = []
+                    for c in candles:
+                        data.append((symbol, timeframe, c['time'], c['open'], c['high'], c['low'], c['close'], c.get('tick_volume', 0)))
+
+                cursor.executemany(
+                    "INSERT IGNORE INTO candles (symbol, timeframe, timestamp, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    data
+                )
+                conn.commit()
+                logger.info(f"Cached {len(data)} candles for {symbol} {timeframe}")
+            return True
         except mariadb.Error as e:
             logger.error(f"Error saving candles: {e}")
+            return False
 
     def get_candles(self, symbol, timeframe, start_ts, end_ts):
         """Retrieve cached candles"""
-        if not self.conn: self.connect()
-        if not self.cursor: return []
-        
         try:
-            self.cursor.execute(
-                "SELECT timestamp, open, high, low, close, volume FROM candles WHERE symbol=? AND timeframe=? AND timestamp >= ? AND timestamp <= ? ORDER BY timestamp ASC",
-                (symbol, timeframe, int(start_ts), int(end_ts))
-            )
-            rows = self.cursor.fetchall()
-            # Convert to list of dicts matching Agent format
-            return [
-                {'time': r[0], 'open': r[1], 'high': r[2], 'low': r[3], 'close': r[4], 'tick_volume': r[5]} 
-                for r in rows
-            ]
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT timestamp, open, high, low, close, volume FROM candles WHERE symbol=? AND timeframe=? AND timestamp >= ? AND timestamp <= ? ORDER BY timestamp ASC",
+                    (symbol, timeframe, int(start_ts), int(end_ts))
+                )
+                rows = cursor.fetchall()
+                # Convert to list of dicts matching Agent format
+                return [
+                    {'time': r[0], 'open': r[1], 'high': r[2], 'low': r[3], 'close': r[4], 'tick_volume': r[5]} 
+                    for r in rows
+                ]
         except mariadb.Error as e:
             logger.error(f"Error getting candles: {e}")
             return []
 
-db = Database()
+    def get_candle_rows(self, symbol, timeframe, start_ts, end_ts):
+        """Cached candles as raw (timestamp, open, high, low, close, volume) tuples"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT timestamp, open, high, low, close, volume FROM candles WHERE symbol=? AND timeframe=? AND timestamp >= ? AND timestamp <= ? ORDER BY timestamp ASC",
+                    (symbol, timeframe, int(start_ts), int(end_ts))
+                )
+                return cursor.fetchall()
+        except mariadb.Error as e:
+            logger.error(f"Error getting candle rows: {e}")
+            return []
+
+    def get_candle_stats(self, symbol, timeframe, start_ts, end_ts):
+        """
+        (count, first ts, last ts, sum of closes) for stored candles in range.
+        Cheap fingerprint of a range: it changes when candles are added or corrected.
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT COUNT(*), MIN(timestamp), MAX(timestamp), SUM(close) FROM candles WHERE symbol=? AND timeframe=? AND timestamp >= ? AND timestamp <= ?",
+                    (symbol, timeframe, int(start_ts), int(end_ts))
+                )
+                count, first, last, close_sum = cursor.fetchone()
+                if not count: return None
+                return (int(count), int(first), int(last), float(close_sum))
+        except mariadb.Error as e:
+            logger.error(f"Error getting candle stats: {e}")
+            return None
+
+db = Database(settings.DB_POOL_SIZE)
+
+_db_threads = ThreadPoolExecutor(max_workers=settings.DB_POOL_SIZE, thread_name_prefix="db")
+
+async def run_db(fn, *args):
+    """Runs a blocking Database call (e.g. db.get_candle_rows) on a DB thread."""
+    return await asyncio.get_running_loop().run_in_executor(_db_threads, fn, *args)
 
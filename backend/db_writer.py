@@ -0,0 +1,169 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from backend.config import settings
+from backend.database import db
+
+logger = logging.getLogger("DBWriter")
+
+
+class WriteBehindQueue:
+    """
+    Live candle and trade writes, queued and flushed to MariaDB off the event loop.
+
+    Producers await save_candles()/log_trade(). The call returns once the
+    write is queued. It only waits when `max_pending` writes are already
+    queued (backpressure while the DB is slow). A background task collects
+    writes until it has `batch_size` rows or `flush_interval` seconds have
+    passed. It then flushes the batch on its own DB thread, with one
+    save_candles per (symbol, timeframe).
+
+    Candles at or before the newest time already queued for their feed are
+    dropped. Writes in a failed flush are kept and retried with the next one,
+    every `flush_interval` seconds until the DB is back. At most `max_pending`
+    of them are kept; beyond that the oldest are dropped and logged. When the
+    writer is not running (scripts, tests), writes go straight to the DB.
+    """
+    def __init__(self, batch_size=500, flush_interval=1.0, max_pending=1000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue(max_pending)
+        self._queued = {}  # (symbol, timeframe) -> newest candle time queued
+        self._retry = deque(maxlen=max_pending)  # writes from failed flushes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._task = None
+        self.flush_latency = deque(maxlen=500)
+        self.counts = {"flushes": 0, "candles": 0, "trades": 0, "duplicates": 0, "failed_flushes": 0, "dropped": 0, "blocked_s": 0.0}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flushes what is queued, then stops."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def save_candles(self, symbol, timeframe, candles):
+        newest = self._queued.get((symbol, timeframe))
+        fresh = [c for c in candles if newest is None or c['time'] > newest]
+        self.counts["duplicates"] += len(candles) - len(fresh)
+        if not fresh:
+            return
+        self._queued[(symbol, timeframe)] = fresh[-1]['time']
+        await self._put(("candles", (symbol, timeframe), fresh))
+
+    async def log_trade(self, symbol, strategy, action, price, volume, result):
+        await self._put(("trade", None, (symbol, strategy, action, price, volume, result)))
+
+    async def _put(self, item):
+        if self._task is None:
+            self._write([item])
+            return
+        if self._queue.full():
+            started = time.perf_counter()
+            await self._queue.put(item)
+            self.counts["blocked_s"] += time.perf_counter() - started
+        else:
+            self._queue.put_nowait(item)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            if self._retry:
+                batch = list(self._retry)
+                self._retry.clear()
+            else:
+                item = await self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+            rows = sum(map(_rows, batch))
+            deadline = time.monotonic() + self.flush_interval
+            while rows < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += _rows(item)
+            started = time.perf_counter()
+            try:
+                failed = await loop.run_in_executor(self._executor, self._write, batch)
+            except Exception as e:
+                logger.error(f"Flush of {rows} rows failed: {e}")
+                failed = batch
+            self.flush_latency.append(time.perf_counter() - started)
+            if failed:
+                self._keep(failed, stopping)
+                if not stopping:
+                    # Give the DB time to come back before the retry
+                    await asyncio.sleep(self.flush_interval)
+
+    def _keep(self, failed, stopping):
+        self.counts["failed_flushes"] += 1
+        if stopping:
+            self.counts["dropped"] += len(failed)
+            logger.error(f"Dropping {sum(map(_rows, failed))} rows the DB did not take before shutdown")
+            return
+        dropped = max(0, len(failed) - self._retry.maxlen)
+        self._retry.extend(failed)
+        if dropped:
+            self.counts["dropped"] += dropped
+            logger.error(f"Retry buffer full: dropped the oldest {dropped} writes")
+        else:
+            logger.warning(f"Keeping {len(failed)} writes for retry")
+
+    def _write(self, batch):
+        """Writes a batch; returns the items that failed, to be retried."""
+        candles, failed = {}, []
+        for item in batch:
+            kind, key, payload = item
+            if kind == "candles":
+                candles.setdefault(key, []).append(item)
+            elif db.log_trade(*payload):
+                self.counts["trades"] += 1
+            else:
+                failed.append(item)
+        for (symbol, timeframe), items in candles.items():
+            rows = [c for item in items for c in item[2]]
+            if db.save_candles(symbol, timeframe, rows):
+                self.counts["candles"] += len(rows)
+            else:
+                failed.extend(items)
+        self.counts["flushes"] += 1
+        return failed
+
+    def stats(self):
+        latency = sorted(self.flush_latency)
+        return dict(
+            self.counts,
+            blocked_s=round(self.counts["blocked_s"], 3),
+            queue_depth=self._queue.qsize(),
+            retrying=len(self._retry),
+            running=self._task is not None,
+            flush_ms={
+                "p50": round(latency[len(latency) // 2] * 1000, 1),
+                "p95": round(latency[int(len(latency) * 0.95)] * 1000, 1),
+                "max": round(latency[-1] * 1000, 1),
+            } if latency else None,
+        )
+
+
+def _rows(item):
+    return len(item[2]) if item[0] == "candles" else 1
+
+
+db_writer = WriteBehindQueue(settings.DB_WRITE_BATCH, settings.DB_WRITE_INTERVAL, settings.DB_WRITE_QUEUE)
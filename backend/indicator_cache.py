@@ -0,0 +1,122 @@
+import hashlib
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+from collections import OrderedDict
+
+
+def fingerprint(*series):
+    """Content hash of one or more Series/arrays (values only, index ignored)."""
+    h = hashlib.blake2b(digest_size=16)
+    for s in series:
+        arr = np.ascontiguousarray(s.to_numpy() if hasattr(s, 'to_numpy') else s)
+        h.update(arr.dtype.str.encode())
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def frame_fingerprint(df, columns=('time', 'open', 'high', 'low', 'close')):
+    """Dataset fingerprint over the candle columns that exist in df."""
+    return fingerprint(*[df[c] for c in columns if c in df.columns])
+
+
+def _nbytes(value):
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+class IndicatorCache:
+    """
+    Content-addressed LRU cache for indicator series.
+
+    Keys are (indicator name, fingerprint of the input data, params), so two
+    configs that need the same EMA on the same candles share one computation.
+    Eviction is least-recently-used, bounded by total bytes.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        value = compute()
+        size = _nbytes(value)
+        # None (e.g. insufficient data) and oversized values are not kept
+        if value is not None and size <= self.max_bytes:
+            self._entries[key] = (value, size)
+            self.bytes += size
+            self._evict()
+        return value
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def compute(self, name, *series, **params):
+        """
+        Cached pandas_ta call: compute("ema", df['close'], length=200).
+        Values are stored as arrays and re-wrapped on the caller's index, so the
+        result aligns even when the same candles come from a differently indexed frame.
+        """
+        key = (name, fingerprint(*series), tuple(sorted(params.items())))
+
+        def run():
+            out = getattr(ta, name)(*series, **params)
+            if out is None:
+                return None
+            if isinstance(out, pd.DataFrame):
+                return (True, tuple((col, out[col].to_numpy(copy=True)) for col in out.columns))
+            return (False, ((out.name, out.to_numpy(copy=True)),))
+
+        cached = self.get_or_compute(key, run)
+        if cached is None:
+            return None
+
+        is_frame, columns = cached
+        index = series[0].index
+        # Copies keep callers from mutating the cached arrays in place
+        if is_frame:
+            return pd.DataFrame({col: values.copy() for col, values in columns}, index=index)
+        col, values = columns[0]
+        return pd.Series(values.copy(), index=index, name=col)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+
+indicator_cache = IndicatorCache()
@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from backend.config import settings
+
+logger = logging.getLogger("LoopMonitor")
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoopLagMonitor:
+    """
+    Measures how long the event loop was blocked, and by what.
+
+    A task sleeps `interval` seconds and records how late it woke up. A
+    watchdog thread checks that task's heartbeat. When the heartbeat is
+    overdue, it samples the asyncio task running on the loop thread, whose
+    name is the engine for scheduler tasks, and the innermost repo frame.
+    Stalls over `threshold` are logged and counted per culprit.
+    """
+    def __init__(self, interval=0.25, threshold=0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=1000)
+        self.culprits = {}
+        self.stalls = 0
+        self._loop = None
+        self._loop_thread = None
+        self._beat_at = None
+        self._sample = None
+        self._task = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat_at = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        threading.Thread(target=self._watch, name="loop-monitor", daemon=True).start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat_at = now
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            sample, self._sample = self._sample, None
+            if lag >= self.threshold:
+                self._record(lag, sample or ("unknown", None))
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            if self._sample is None and time.monotonic() - self._beat_at > self.interval + self.threshold:
+                self._sample = self._blocker()
+
+    def _blocker(self):
+        """(task name, 'file:line function') of what the loop thread is running now."""
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        name = task.get_name() if task is not None else "callback"
+        frame = sys._current_frames().get(self._loop_thread)
+        where = None
+        while frame is not None:
+            path = frame.f_code.co_filename
+            if path.startswith(_ROOT) and "site-packages" not in path:
+                where = f"{os.path.relpath(path, _ROOT)}:{frame.f_lineno} {frame.f_code.co_name}"
+                break
+            frame = frame.f_back
+        return name, where
+
+    def _record(self, lag, sample):
+        name, where = sample
+        self.stalls += 1
+        entry = self.culprits.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "where": None})
+        entry["count"] += 1
+        entry["total_ms"] += lag * 1000
+        if lag * 1000 >= entry["max_ms"]:
+            entry["max_ms"], entry["where"] = lag * 1000, where
+        logger.warning(f"Event loop blocked {lag * 1000:.0f}ms by {name}" + (f" at {where}" if where else ""))
+
+    def stats(self):
+        lags = sorted(self.lags)
+        return {
+            "samples": len(lags),
+            "lag_ms": {
+                "p50": round(lags[len(lags) // 2] * 1000, 1),
+                "p95": round(lags[int(len(lags) * 0.95)] * 1000, 1),
+                "max": round(lags[-1] * 1000, 1),
+            } if lags else None,
+            "stalls": self.stalls,
+            "by_task": {name: dict(e, total_ms=round(e["total_ms"], 1), max_ms=round(e["max_ms"], 1))
+                        for name, e in self.culprits.items()},
+        }
+
+
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL, settings.LOOP_LAG_THRESHOLD)
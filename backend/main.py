@@ -1,19 +1,31 @@
 from fastapi import FastAPI, BackgroundTasks
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import asyncio
+import json
 from contextlib import asynccontextmanager
 import logging
-import aiohttp
 import pandas as pd
 
 
 from backend.strategy_engine import StrategyEngine
 from backend.config import settings
 from backend.backtest_engine import BacktestEngine
+from backend.indicator_cache import indicator_cache
+from backend.backtest_jobs import BacktestJobQueue, QueueFull, DONE
+from backend.result_cache import result_cache
+from backend.candle_store import candle_store
+from backend.market_data import market_data
+from backend.scheduler import BarCloseScheduler
+from backend.agent_client import AgentClient
+from backend.account_state import account_state
+from backend.loop_monitor import loop_monitor
+from backend.db_writer import db_writer
+from backend.database import db, run_db
 
 
 # from strategy.TMA.tma_strategy import TMAStrategy - REMOVED
@@ -59,50 +71,57 @@ engine_gold_5m = StrategyEngine(
     symbols=["GOLD"]
 )
 
+# Backtests run in worker processes so they never block the trading loop
+backtest_jobs = BacktestJobQueue(
+    workers=settings.BACKTEST_WORKERS,
+    max_queued=settings.BACKTEST_QUEUE_SIZE,
+    timeout=settings.BACKTEST_TIMEOUT,
+    cache=result_cache,
+)
+
 # Global loop controller
 loop_active = True
 
 async def monitor_account():
     '''Independent loop to fetch account info regardless of strategy status'''
     while loop_active:
-        async with aiohttp.ClientSession() as session:
-             # Use one engine to update account info (Shared)
-             await engine_btc_breakout_5m.update_account_info(session)
-        await asyncio.sleep(5)
+        # The only /account poll; engines and orders read this snapshot
+        await account_state.refresh()
+        # Use one engine to update account info (Shared)
+        await engine_btc_breakout_5m.update_account_info()
+        await asyncio.sleep(settings.ACCOUNT_POLL_SECONDS)
 
-async def bot_background_loop():
-    while loop_active:
-        tasks = []
-        # Mean Reversion REMOVED
-        
-        # TMA REMOVED
-        
-        # Bitcoin Breakout
-        if engine_btc_breakout_5m.active: tasks.append(engine_btc_breakout_5m.run_loop())
-
-        # Gold
-        if engine_gold_1h.active: tasks.append(engine_gold_1h.run_loop())
-        if engine_gold_15m.active: tasks.append(engine_gold_15m.run_loop())
-        if engine_gold_5m.active: tasks.append(engine_gold_5m.run_loop())
-            
-        if tasks:
-            await asyncio.gather(*tasks)
-            
-        await asyncio.sleep(10) # Run every 10 seconds
+# Live engines run on their bar closes (entries) and exit cadence instead of a fixed poll
+scheduler = BarCloseScheduler([engine_btc_breakout_5m, engine_gold_1h, engine_gold_15m, engine_gold_5m])
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    asyncio.create_task(bot_background_loop())
-    asyncio.create_task(monitor_account())
+    # One keep-alive connection pool to the agent for everything in this process
+    agent = AgentClient(settings.AGENT_URL)
+    for engine in scheduler.engines:
+        engine.set_agent(agent)
+    backtest_jobs.agent = agent
+    account_state.agent = agent
+    loop_monitor.start()
+    await run_db(db.connect)
+    db_writer.start()
+    scheduler.start()
+    monitor_task = asyncio.create_task(monitor_account())
+    backtest_jobs.start()
     
     yield
     
     # Shutdown
     print("[SYSTEM] Shutting Down...")
+    await backtest_jobs.stop()
+    await scheduler.stop()
     global loop_active
     loop_active = False
-    task.cancel()
+    monitor_task.cancel()
+    await loop_monitor.stop()
+    await db_writer.stop()
+    await agent.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -192,35 +211,34 @@ async def test_trade(req: TestTradeRequest):
     elif s == "btc_breakout_5m": target_engine = engine_btc_breakout_5m
     
     if target_engine:
-        async with aiohttp.ClientSession() as session:
-            # 1. Fetch Real Price
-            # Use engine's configured current timeframe or just 1m for price check
-            df = await target_engine.fetch_candles(session, req.symbol, "1m")
-            if df is None or df.empty:
-                return {"status": "error", "message": f"Could not fetch price for {req.symbol}"}
-            
-            current_price = float(df['close'].iloc[-1])
-            
-            # 2. Calculate Params
-            # Limit: Safe OTM. Market: At Market.
-            entry = current_price
-            if req.order_type == "limit":
-                 # Place 'Pending' order far away to guarantee acceptance without fill
-                 # Long: 0.9 * Price. Short: 1.1 * Price
-                 if req.action == "long": entry = current_price * 0.95
-                 else: entry = current_price * 1.05
-            
-            # SL/TP just for validation
-            sl = entry * 0.90 if req.action == "long" else entry * 1.10
-            tp = entry * 1.10 if req.action == "long" else entry * 0.90
-            
-            # 3. Execute
-            await target_engine.execute_trade(session, req.symbol, req.action, entry, sl, tp, order_type=req.order_type)
-            return {
-                "status": f"Trade Sent ({req.order_type})", 
-                "strategy": req.strategy, 
-                "details": f"Price={entry:.2f}"
-            }
+        # 1. Fetch Real Price
+        # Use engine's configured current timeframe or just 1m for price check
+        df = await target_engine.fetch_candles(req.symbol, "1m")
+        if df is None or df.empty:
+            return {"status": "error", "message": f"Could not fetch price for {req.symbol}"}
+        
+        current_price = float(df['close'].iloc[-1])
+        
+        # 2. Calculate Params
+        # Limit: Safe OTM. Market: At Market.
+        entry = current_price
+        if req.order_type == "limit":
+             # Place 'Pending' order far away to guarantee acceptance without fill
+             # Long: 0.9 * Price. Short: 1.1 * Price
+             if req.action == "long": entry = current_price * 0.95
+             else: entry = current_price * 1.05
+        
+        # SL/TP just for validation
+        sl = entry * 0.90 if req.action == "long" else entry * 1.10
+        tp = entry * 1.10 if req.action == "long" else entry * 0.90
+        
+        # 3. Execute
+        await target_engine.execute_trade(req.symbol, req.action, entry, sl, tp, order_type=req.order_type)
+        return {
+            "status": f"Trade Sent ({req.order_type})", 
+            "strategy": req.strategy, 
+            "details": f"Price={entry:.2f}"
+        }
 
 class SettingsRequest(BaseModel):
     agent_url: str
@@ -334,44 +352,134 @@ class BacktestRequest(BaseModel):
     balance: float
     days: int
 
+BACKTEST_STRATEGIES = {
+    "BitcoinBreakout": BitcoinBreakout,
+    # Gold Strategies
+    "GoldTrend": GoldTrend,
+    "GoldSniper": GoldSniper,
+    "GoldFlux": GoldFlux,
+}
+
+async def submit_backtest(req: BacktestRequest, stream=False):
+    """Queues a backtest job. Returns (job, None) or (None, error response)."""
+    strat = BACKTEST_STRATEGIES.get(req.strategy)
+    if not strat: return None, {"error": "Invalid Strategy"}
+    
+    # Calculate timestamps (From Yesterday Backwards)
+    now = datetime.now()
+    yesterday = now - pd.Timedelta(days=1)
+    end_ts = int(yesterday.timestamp())
+    start_ts = int((yesterday - pd.Timedelta(days=req.days)).timestamp())
+    
+    # Log for debugging
+    print(f"Backtest: {req.symbol} {req.timeframe} Days={req.days} (From {yesterday.date()} back)")
+    
+    try:
+        job = await backtest_jobs.submit(strat, req.symbol, req.timeframe, start_ts, end_ts, req.balance, engine_btc_breakout_5m.agent_url, stream=stream)
+    except QueueFull as e:
+        return None, JSONResponse(status_code=429, content={"error": str(e)})
+    return job, None
+
 @app.post("/api/backtest")
 async def run_backtest(req: BacktestRequest):
-    import traceback
-    try:
-        # 1. Fetch Data
-        engine = BacktestEngine(agent_url=engine_btc_breakout_5m.agent_url)
-        # Calculate timestamps (From Yesterday Backwards)
-        now = datetime.now()
-        yesterday = now - pd.Timedelta(days=1)
-        end_ts = int(yesterday.timestamp())
-        start_ts = int((yesterday - pd.Timedelta(days=req.days)).timestamp())
-        
-        # Log for debugging
-        print(f"Backtest: {req.symbol} {req.timeframe} Days={req.days} (From {yesterday.date()} back)")
-        
-        df = await engine.get_data(req.symbol, req.timeframe, start_ts, end_ts)
+    # Same response as before, but the simulation runs in a backtest worker
+    job, error = await submit_backtest(req)
+    if error is not None: return error
+    
+    await job.done.wait()
+    if job.status != DONE:
+        return {"error": job.error or f"Backtest {job.status}"}
+    return job.result
+
+@app.get("/api/backtest/stream")
+async def stream_backtest(strategy: str, symbol: str, timeframe: str, balance: float, days: int):
+    """
+    Server-Sent Events version of /api/backtest (GET, so EventSource can use it).
+    Events: job, progress, trades (new trades only), equity (downsampled points),
+    then done (summary + price_data) or error.
+    """
+    req = BacktestRequest(strategy=strategy, symbol=symbol, timeframe=timeframe, balance=balance, days=days)
+    job, error = await submit_backtest(req, stream=True)
+    if error is not None: return error
+    events = job.subscribe()
+
+    async def event_source():
+        try:
+            yield f"event: job\ndata: {json.dumps(job.to_dict())}\n\n"
+            while True:
+                event = await events.get()
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event['type'] in ("done", "error"):
+                    break
+        finally:
+            # Client went away mid-run: free the worker
+            backtest_jobs.cancel(job.id)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/api/backtest/jobs")
+async def create_backtest_job(req: BacktestRequest):
+    job, error = await submit_backtest(req)
+    if error is not None: return error
+    return job.to_dict()
+
+@app.get("/api/backtest/jobs")
+def backtest_job_stats():
+    return backtest_jobs.stats()
+
+@app.get("/api/backtest/jobs/{job_id}")
+def backtest_job_status(job_id: str):
+    job = backtest_jobs.get(job_id)
+    if job is None: return JSONResponse(status_code=404, content={"error": "Unknown job"})
+    return job.to_dict()
+
+@app.get("/api/backtest/jobs/{job_id}/result")
+def backtest_job_result(job_id: str):
+    job = backtest_jobs.get(job_id)
+    if job is None: return JSONResponse(status_code=404, content={"error": "Unknown job"})
+    if job.status != DONE:
+        # Still queued/running (202) or finished without a result
+        code = 202 if job.finished is None else 200
+        return JSONResponse(status_code=code, content={**job.to_dict(), "error": job.error or f"Backtest {job.status}"})
+    return job.result
+
+@app.delete("/api/backtest/jobs/{job_id}")
+def cancel_backtest_job(job_id: str):
+    job = backtest_jobs.cancel(job_id)
+    if job is None: return JSONResponse(status_code=404, content={"error": "Unknown job"})
+    return job.to_dict()
+
+@app.get("/api/cache/indicators")
+def indicator_cache_stats():
+    return indicator_cache.stats()
+
+@app.get("/api/cache/candles")
+def candle_store_stats():
+    return candle_store.stats()
+
+@app.get("/api/agent/stats")
+def agent_stats():
+    return {
+        "requests": engine_btc_breakout_5m.agent.stats(),
+        "market_data": market_data.stats(),
+    }
 
-        if df.empty:
-            return {"error": "No data found for this period."}
-            
-        # 2. Select Strategy
-        strat = None
-        if req.strategy == "BitcoinBreakout": strat = BitcoinBreakout
-        # Gold Strategies
-        elif req.strategy == "GoldTrend": strat = GoldTrend
-        elif req.strategy == "GoldSniper": strat = GoldSniper
-        elif req.strategy == "GoldFlux": strat = GoldFlux
-        
-        if not strat: return {"error": "Invalid Strategy"}
-        
-        # 3. Run Simulation
-        result = engine.run(strat, df, start_balance=req.balance)
-        return result
-    except Exception as e:
-        err_msg = traceback.format_exc()
-        with open("logs/backtest_error.log", "w") as f:
-            f.write(err_msg)
-        return {"error": f"Internal Error: {str(e)}"}
+@app.get("/api/db/stats")
+async def db_stats():
+    return {"pool": await run_db(db.health), "writer": db_writer.stats()}
+
+@app.get("/api/loop/stats")
+def loop_stats():
+    return loop_monitor.stats()
+
+@app.get("/api/cache/backtests")
+def backtest_cache_stats():
+    return result_cache.stats()
+
+@app.delete("/api/cache/backtests")
+def clear_backtest_cache():
+    result_cache.clear()
+    return result_cache.stats()
 
 @app.post("/api/settings")
 def update_settings(req: SettingsRequest):
@@ -0,0 +1,112 @@
+import time
+import asyncio
+import logging
+import numpy as np
+from backend.config import settings
+from backend.db_writer import db_writer
+from backend.candle_buffer import CandleBuffer, block_records, block_frame
+from backend.agent_client import AgentError
+
+logger = logging.getLogger("MarketData")
+
+
+class CandleSnapshot:
+    """Read-only copy of a feed's candles after one fetch; safe to share between engines."""
+    def __init__(self, symbol, timeframe, block, added, fetched_at):
+        block.setflags(write=False)
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.block = block
+        self.added = added
+        self.fetched_at = fetched_at
+
+    @property
+    def size(self):
+        return self.block.shape[1]
+
+    @property
+    def last_time(self):
+        return int(self.block[0, -1]) if self.size else None
+
+    def records(self, n=None):
+        return block_records(self.block if n is None else self.block[:, -n:])
+
+    def records_since(self, start_ts):
+        """Candles with time >= start_ts."""
+        return block_records(self.block[:, int(np.searchsorted(self.block[0], start_ts)):])
+
+    def frame(self, n=None):
+        return block_frame(self.block if n is None else self.block[:, -n:])
+
+
+class _Feed:
+    def __init__(self, capacity):
+        self.buffer = CandleBuffer(capacity)
+        self.snapshot = None
+        self.inflight = None
+
+
+class MarketDataHub:
+    """
+    One candle feed per (symbol, timeframe), shared by every engine and endpoint.
+
+    refresh() brings a feed up to date and returns its CandleSnapshot. Calls for
+    a feed that is already being fetched wait for that fetch instead of sending
+    their own, and a snapshot younger than `max_age` seconds is served as is, so
+    agent traffic follows the number of feeds, not of consumers. Newly closed
+    bars are queued for the DB once, here.
+    """
+    def __init__(self, capacity=1000, max_age=0.5):
+        self.capacity = capacity
+        self.max_age = max_age
+        self._feeds = {}
+        self.fetches = 0
+        self.coalesced = 0
+
+    def latest(self, symbol, timeframe):
+        feed = self._feeds.get((symbol, timeframe))
+        return feed.snapshot if feed else None
+
+    async def refresh(self, agent, symbol, timeframe):
+        """Fresh snapshot of the feed, or None when the agent could not be reached."""
+        feed = self._feeds.get((symbol, timeframe))
+        if feed is None:
+            feed = self._feeds[(symbol, timeframe)] = _Feed(self.capacity)
+        if feed.snapshot is not None and time.time() - feed.snapshot.fetched_at < self.max_age:
+            self.coalesced += 1
+            return feed.snapshot
+        if feed.inflight is not None:
+            self.coalesced += 1
+        else:
+            feed.inflight = asyncio.ensure_future(self._fetch(feed, agent, symbol, timeframe))
+            feed.inflight.add_done_callback(lambda _: setattr(feed, 'inflight', None))
+        # Shielded: one caller giving up must not cancel the fetch the others wait on
+        return await asyncio.shield(feed.inflight)
+
+    async def _fetch(self, feed, agent, symbol, timeframe):
+        buffer = feed.buffer
+        since = buffer.last_time
+        self.fetches += 1
+        try:
+            # Feeds refreshed together (engines firing on the same close) share one agent round trip
+            data = await agent.batched("candles", symbol, timeframe, since=since, n=self.capacity)
+        except AgentError:
+            return None
+
+        added = buffer.extend(data)
+        if not buffer.size:
+            return None
+        block = buffer.tail()
+        # Bars that closed since the last fetch; the newest one is still forming
+        closed = (block[:, block[0] >= since] if since is not None else block)[:, :-1]
+        if closed.shape[1]:
+            await db_writer.save_candles(symbol, timeframe, block_records(closed))
+
+        feed.snapshot = CandleSnapshot(symbol, timeframe, block, added, time.time())
+        return feed.snapshot
+
+    def stats(self):
+        return {"feeds": len(self._feeds), "fetches": self.fetches, "coalesced": self.coalesced}
+
+
+market_data = MarketDataHub(settings.MARKET_DATA_BARS, settings.MARKET_DATA_MAX_AGE)
@@ -0,0 +1,114 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+from backend.config import settings
+
+logger = logging.getLogger("ResultCache")
+
+
+def result_key(*parts):
+    """Stable hex key for a tuple of plain values (strategy, params, data range, ...)."""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    Backtest results on local disk, one pickle file per key.
+
+    Files are written to a temp name and renamed, so readers in other
+    processes never see a partial file. A hit refreshes the file's mtime;
+    when the directory grows past max_bytes the least recently used files go.
+    """
+    def __init__(self, directory="cache/backtests", max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            # Truncated or written by an incompatible version: drop it
+            logger.error(f"Dropping unreadable cache entry {key}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Error writing cache entry {key}: {e}")
+            self._remove(tmp)
+            return
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".pkl"):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+
+result_cache = ResultCache(settings.BACKTEST_CACHE_DIR, settings.BACKTEST_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,122 @@
+import time
+import asyncio
+import logging
+from backend.config import settings, TIMEFRAME_SECONDS
+
+logger = logging.getLogger("Scheduler")
+
+
+class BarCloseScheduler:
+    """
+    Runs each StrategyEngine when there is something new to look at.
+
+    Entry signals only read the closed candle, so an engine's entry pass runs
+    once per bar of its timeframe (from settings.MODES), `close_delay` seconds
+    after the close. Exit checks read the forming bar and run every
+    `exit_interval` seconds, only fetching symbols with an open position.
+
+    Bar times are the broker's server time, so closes are computed on the
+    agent's clock: `offset` (agent server time minus local time) is measured
+    through the agent's /time endpoint every `sync_interval` seconds.
+    """
+    def __init__(self, engines, close_delay=None, exit_interval=None, bar_wait=None, sync_interval=None):
+        self.engines = engines
+        self.close_delay = settings.BAR_CLOSE_DELAY if close_delay is None else close_delay
+        self.exit_interval = settings.EXIT_CHECK_SECONDS if exit_interval is None else exit_interval
+        self.bar_wait = settings.BAR_WAIT_SECONDS if bar_wait is None else bar_wait
+        self.sync_interval = settings.CLOCK_SYNC_SECONDS if sync_interval is None else sync_interval
+        self.offset = 0.0
+        self.last_sync = None
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._clock_loop())]
+        # Task names identify the engine in loop_monitor's stall reports
+        self._tasks += [asyncio.create_task(self._engine_loop(engine), name=f"engine:{engine.name}") for engine in self.engines]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def timeframe(self, engine):
+        mode_config = settings.MODES.get(engine.active_mode, settings.MODES["4H1H"])
+        return mode_config["current"]
+
+    def next_close(self, step, now=None):
+        """(local fire time, server open time of the new bar) for the next close after now."""
+        now = time.time() if now is None else now
+        bar_open = (int(now + self.offset) // step + 1) * step
+        return bar_open - self.offset + self.close_delay, bar_open
+
+    async def sync_clock(self):
+        """NTP-style offset from the agent's /time, with the request's round trip halved."""
+        engine = self.engines[0]
+        symbol = engine.symbols[0] if engine.symbols else ""
+        sent = time.time()
+        data = await engine.agent.get("/time", params={"symbol": symbol}, retries=0)
+        received = time.time()
+        offset = data["time"] - (sent + received) / 2
+        if data.get("server_offset") is not None:
+            offset += data["server_offset"]
+        elif self.last_sync is not None:
+            # Market closed: keep the broker offset we already know
+            offset += round(self.offset / 1800) * 1800
+        self.offset = offset
+        self.last_sync = received
+
+    async def _clock_loop(self):
+        while True:
+            try:
+                await self.sync_clock()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Agent clock sync failed, keeping offset {self.offset:.1f}s: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    async def _engine_loop(self, engine):
+        step = TIMEFRAME_SECONDS[self.timeframe(engine)]
+        fire_at, bar_open = self.next_close(step)
+        next_exit = time.time()
+        was_active = False
+        while True:
+            await asyncio.sleep(max(0.0, min(fire_at, next_exit) - time.time()))
+            now = time.time()
+            try:
+                if not engine.active:
+                    was_active = False
+                elif not was_active or now >= fire_at:
+                    # Just started (evaluate the current closed bar) or a bar closed
+                    was_active = True
+                    await self._entry_pass(engine, None if now < fire_at else bar_open)
+                    next_exit = time.time() + self.exit_interval
+                elif now >= next_exit:
+                    await engine.run_loop(entries=False)
+                    next_exit = time.time() + self.exit_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{engine.name} evaluation failed: {e}")
+            # The mode (/api/control) and the clock offset (first /time sync) can change between passes
+            current = TIMEFRAME_SECONDS[self.timeframe(engine)]
+            if current != step or time.time() >= fire_at:
+                step = current
+                fire_at, bar_open = self.next_close(step)
+            else:
+                # Same bar, on the latest offset
+                fire_at = bar_open - self.offset + self.close_delay
+            if time.time() >= next_exit:
+                next_exit = time.time() + self.exit_interval
+
+    async def _entry_pass(self, engine, bar_open):
+        waiting = await engine.run_loop(entries=True, bar_open=bar_open)
+        deadline = time.time() + self.bar_wait
+        while waiting and engine.active and time.time() < deadline:
+            await asyncio.sleep(1)
+            waiting = await engine.run_loop(entries=True, exits=False, bar_open=bar_open, symbols=waiting)
+        if waiting:
+            logger.warning(f"{engine.name}: no data for the new bar yet on {waiting}")
@@ -0,0 +1,202 @@
+import numpy as np
+from bisect import bisect_left
+from collections import namedtuple
+
+# Trade record layout for the array-backed simulator.
+# type: 1 = long, -1 = short. note: index into NOTES.
+TRADE_DTYPE = np.dtype([
+    ('entry_time', 'i8'),
+    ('exit_time', 'i8'),
+    ('type', 'i1'),
+    ('entry', 'f8'),
+    ('exit', 'f8'),
+    ('pnl', 'f8'),
+    ('size', 'f8'),
+    ('note', 'i1'),
+])
+
+NOTE_TP, NOTE_SL, NOTE_SIGNAL, NOTE_LIQUIDATED = 0, 1, 2, 3
+NOTES = ("TP", "SL", "Signal", "LIQUIDATED")
+SIDES = {1: "long", -1: "short"}
+
+SimulationResult = namedtuple("SimulationResult", ["balance", "trades", "equity", "equity_time"])
+
+
+def _level(value):
+    """SL/TP levels follow the old `if position.get('tp')` rule: None/0 mean 'not set'."""
+    if value is None or value == 0:
+        return np.nan
+    return float(value)
+
+
+def simulate(time, open_, high, low, close, signal, sl=None, tp=None,
+             exit_long=None, exit_short=None, start_balance=1000, size=1.0,
+             warmup=200, progress=None, progress_every=0):
+    """
+    Position simulator over plain NumPy arrays.
+
+    Mirrors the BacktestEngine per-bar loop:
+    - entry on bar i at close[i] when signal[i] is 1 (long) / -1 (short) and flat
+    - exits are checked from the next bar on: TP, SL and the strategy exit arrays
+    - TP is checked before SL, but when both hit on one bar SL sets the fill price
+      (note stays "TP"), exactly as the old loop did
+    - a balance <= 0 after an exit is recorded as "LIQUIDATED" and stops the run
+
+    Instead of stepping bar by bar, it jumps between events: the next entry
+    signal while flat, and the first bar that hits TP/SL/exit while in a trade.
+
+    size: fixed lot, or a callable(balance) evaluated once per entry.
+    progress: optional callable(filled, trades, equity) called at least
+    `progress_every` bars apart and once at the end. trades/equity are views of
+    everything recorded so far; equity holds the first `filled` bars after warmup.
+    open_ is accepted for a uniform OHLC signature; fills use close / SL / TP.
+    Returns SimulationResult(balance, trades[TRADE_DTYPE], equity[float], equity_time).
+    """
+    time = np.asarray(time)
+    n = len(close)
+
+    sl = np.full(n, np.nan) if sl is None else np.asarray(sl, dtype=float)
+    tp = np.full(n, np.nan) if tp is None else np.asarray(tp, dtype=float)
+    no_exit = np.zeros(n, dtype=bool)
+    exit_long = no_exit if exit_long is None else np.asarray(exit_long, dtype=bool)
+    exit_short = no_exit if exit_short is None else np.asarray(exit_short, dtype=bool)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+
+    start = min(warmup, n)
+    entries = (np.flatnonzero(np.asarray(signal)[start:]) + start).tolist()
+
+    # Scalar reads from NumPy arrays are slow; events read from plain lists
+    # while the long scans for an exit stay vectorized.
+    time_l, high_l, low_l, close_l = time.tolist(), high.tolist(), low.tolist(), close.tolist()
+
+    # Every trade needs its own entry bar, so this bounds the trade count
+    trades = np.empty(len(entries), dtype=TRADE_DTYPE)
+    equity = np.empty(n - start, dtype=float)
+
+    balance = float(start_balance)
+    n_trades = 0
+    end = n  # First bar NOT written to the equity curve
+    i = start
+    reported = start
+
+    while i < n:
+        # --- Flat: jump to the next entry signal ---
+        k = bisect_left(entries, i)
+        if k == len(entries):
+            equity[i - start:] = balance
+            break
+
+        j = entries[k]
+        if balance <= 0:
+            equity[i - start:j - start] = balance
+            end = j
+            break
+
+        is_long = signal[j] > 0
+        entry_price = close_l[j]
+        sl_level = _level(sl[j])
+        tp_level = _level(tp[j])
+        lot = size(balance) if callable(size) else size
+        equity[i - start:j - start + 1] = balance
+
+        # --- In position: find the first bar that closes it ---
+        exits = exit_long if is_long else exit_short
+        m = _first_exit(j + 1, n, is_long, high, low, high_l, low_l, exits, sl_level, tp_level)
+        if m < 0:
+            equity[j + 1 - start:] = balance
+            break
+
+        if is_long:
+            tp_hit = high_l[m] >= tp_level
+            sl_hit = low_l[m] <= sl_level
+        else:
+            tp_hit = low_l[m] <= tp_level
+            sl_hit = high_l[m] >= sl_level
+
+        exit_price = close_l[m]
+        if tp_hit: exit_price = tp_level
+        if sl_hit: exit_price = sl_level
+
+        pnl = (exit_price - entry_price) * lot if is_long else (entry_price - exit_price) * lot
+        equity[j + 1 - start:m - start] = balance
+
+        note = NOTE_TP if tp_hit else NOTE_SL if sl_hit else NOTE_SIGNAL
+        if balance + pnl <= 0:
+            pnl = -balance
+            balance = 0.0
+            note = NOTE_LIQUIDATED
+            end = m
+
+        trades[n_trades] = (time_l[j], time_l[m], 1 if is_long else -1, entry_price, exit_price, pnl, lot, note)
+        n_trades += 1
+
+        if note == NOTE_LIQUIDATED:
+            break
+
+        balance += pnl
+        # Same bar may re-enter: continue the flat search from the exit bar
+        i = m
+
+        if progress is not None and m - reported >= progress_every:
+            # Bars before m are final; bar m is written by the next flat step
+            progress(m - start, trades[:n_trades], equity[:m - start])
+            reported = m
+
+    if progress is not None:
+        progress(end - start, trades[:n_trades], equity[:end - start])
+
+    return SimulationResult(
+        balance=balance,
+        trades=trades[:n_trades],
+        equity=equity[:end - start],
+        equity_time=time[start:end],
+    )
+
+
+def _first_exit(start, n, is_long, high, low, high_l, low_l, exits, sl_level, tp_level):
+    """
+    Index of the first bar >= start that triggers an exit, or -1.
+    Most trades close within a few bars, so those are checked one by one
+    before switching to NumPy scans over growing chunks.
+    """
+    stop = min(n, start + 16)
+    for m in range(start, stop):
+        if is_long:
+            if exits[m] or high_l[m] >= tp_level or low_l[m] <= sl_level:
+                return m
+        elif exits[m] or low_l[m] <= tp_level or high_l[m] >= sl_level:
+            return m
+
+    start = stop
+    chunk = 256
+    while start < n:
+        stop = min(n, start + chunk)
+        if is_long:
+            hit = exits[start:stop] | (high[start:stop] >= tp_level) | (low[start:stop] <= sl_level)
+        else:
+            hit = exits[start:stop] | (low[start:stop] <= tp_level) | (high[start:stop] >= sl_level)
+        idx = np.flatnonzero(hit)
+        if idx.size:
+            return start + int(idx[0])
+        start = stop
+        chunk = min(chunk * 4, 65536)
+    return -1
+
+
+def trades_to_records(trades):
+    """Structured trade array -> list of dicts in the BacktestEngine.run result format."""
+    return [
+        {
+            "entry_time": entry_time,
+            "exit_time": exit_time,
+            "type": SIDES[side],
+            "entry": entry,
+            "exit": exit_,
+            "pnl": pnl,
+            "size": size,
+            "note": NOTES[note],
+        }
+        for entry_time, exit_time, side, entry, exit_, pnl, size, note in trades.tolist()
+    ]
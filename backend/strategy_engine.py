@@ -1,13 +1,17 @@
 import logging
 import asyncio
-import aiohttp
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 # from strategy.mean_reversion import MeanReversionRSI - REMOVED
 from backend.config import settings
 from backend.risk_manager import RiskManager
-from backend.database import db
+from backend.db_writer import db_writer
 from backend.telegram_bot import TelegramNotifier
+from backend.streaming_indicators import live_indicators
+from backend.market_data import market_data
+from backend.agent_client import AgentClient, AgentError
+from backend.account_state import account_state
 
 import logging
 from logging.handlers import RotatingFileHandler
@@ -20,6 +24,12 @@ import os
 # Base logger config (optional if we want a root logger, but we'll use instance loggers)
 # logging.basicConfig(level=logging.INFO)
 
+# Bars handed to calculate_indicators() (strategies without a streaming spec)
+HISTORY_BARS = 200
+
+# Indicator / signal evaluation for every engine, off the event loop
+analysis_pool = ThreadPoolExecutor(max_workers=settings.ANALYSIS_WORKERS, thread_name_prefix="analysis")
+
 class StrategyEngine:
     def __init__(self, name, mode, log_file, strategy_class=None, symbols=None):
         self.name = name
@@ -44,8 +54,15 @@ class StrategyEngine:
         self.logger.addHandler(console)
 
         self.strategy = strategy_class()
+        # Strategies with a streaming spec are updated bar by bar instead of
+        # recomputing calculate_indicators() every cycle (single timeframe only)
+        self.indicator_spec = None
+        if hasattr(self.strategy, 'streaming_indicators') and not settings.MODES.get(mode, {}).get("higher"):
+            self.indicator_spec = self.strategy.streaming_indicators()
         self.active = False
         self.agent_url = settings.AGENT_URL
+        # Replaced by the shared client in main.py's lifespan (set_agent)
+        self.agent = AgentClient(self.agent_url)
         
         # Use provided symbols or default from settings
         self.symbols = symbols if symbols is not None else settings.SYMBOLS
@@ -55,9 +72,6 @@ class StrategyEngine:
         self.logs = []
         self.risk_manager = RiskManager()
         
-        # Init DB
-        db.connect()
-        
         # Init Telegram
         self.notifier = TelegramNotifier(settings.TELEGRAM_TOKEN, settings.TELEGRAM_CHAT_ID)
         self.connected = False 
@@ -66,6 +80,8 @@ class StrategyEngine:
         # State Tracking to prevent spam
         self.last_trade = {s: None for s in self.symbols} 
         self.active_positions = {s: False for s in self.symbols} 
+        # Streaming strategies: indicator cells a HISTORY_BARS recompute leaves empty, per symbol
+        self.history_masks = {}
 
     def log(self, message):
         self.logger.info(message) # Write to file/console
@@ -77,6 +93,11 @@ class StrategyEngine:
 
     def set_agent_url(self, url):
         self.agent_url = url
+        self.agent.base_url = url
+
+    def set_agent(self, agent):
+        self.agent = agent
+        self.agent.base_url = self.agent_url
 
     def start(self): 
         # Mode is already set in __init__
@@ -95,36 +116,69 @@ class StrategyEngine:
         for s in self.symbols:
             self.status[s] = "Stopped"
 
-    async def fetch_candles(self, session, symbol, timeframe, n=200):
-        try:
-            url = f"{self.agent_url}/data/{symbol}/{timeframe}?n={n}"
-            async with session.get(url, timeout=10) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    # Realtime DB Saving/Caching
-                    try:
-                        db.save_candles(symbol, timeframe, data)
-                    except Exception as db_e:
-                        self.log(f"DB Cache Warning: {db_e}")
-                        
-                    df = pd.DataFrame(data)
-                    return df
-                else:
-                    # self.log(f"Error fetching {symbol} {timeframe}: {resp.status}")
-                    return None
-        except Exception as e:
-            # self.log(f"Connection error fetching {symbol}: {str(e)}")
+    async def fetch_candles(self, symbol, timeframe, n=200):
+        """The newest n candles of the shared feed as a DataFrame, or None."""
+        snapshot = await market_data.refresh(self.agent, symbol, timeframe)
+        return None if snapshot is None else snapshot.frame(n)
+
+    async def live_frame(self, symbol, timeframe):
+        """Last closed + forming bar with the strategy's indicator columns, from the streaming state."""
+        snapshot = await market_data.refresh(self.agent, symbol, timeframe)
+        if snapshot is None:
+            return None
+        spec = self.indicator_spec
+        last_time = live_indicators.last_time(symbol, timeframe, spec)
+        if last_time is not None:
+            # Only the bars this engine's state has not seen yet (plus the forming one)
+            frame = live_indicators.frame(symbol, timeframe, spec, snapshot.records_since(last_time))
+            if frame is not None:
+                return frame
+        # Cold, or the state fell behind the feed: (re)build it from the last HISTORY_BARS bars
+        self.history_masks[symbol] = await asyncio.get_running_loop().run_in_executor(
+            analysis_pool, self._history_mask, snapshot.frame(HISTORY_BARS))
+        return live_indicators.frame(symbol, timeframe, spec, snapshot.records(HISTORY_BARS))
+
+    def _history_mask(self, df):
+        """
+        (closed bar columns, forming bar columns) that calculate_indicators() over
+        HISTORY_BARS bars leaves empty, or None when it returns None (too short).
+        The streaming state keeps growing past that window, so without this a long
+        lookback (an EMA 200) would fill in and start signalling, unlike the
+        fixed-window recompute the engines ran before.
+        """
+        base = self.strategy.calculate_indicators(df, None)
+        if base is None:
+            return None
+        columns = list(self.indicator_spec)
+        closed = [c for c in columns if len(base) < 2 or pd.isna(base[c].iloc[-2])]
+        forming = [c for c in columns if base.empty or pd.isna(base[c].iloc[-1])]
+        return closed, forming
+
+    def _within_history(self, symbol, frame):
+        """The live frame with the history mask applied; None for Insufficient Data."""
+        mask = self.history_masks.get(symbol, ((), ()))
+        if mask is None:
             return None
+        closed, forming = mask
+        if not closed and not forming:
+            return frame
+        frame = frame.copy()
+        if closed:
+            frame.loc[frame.index[-2], closed] = float('nan')
+        if forming:
+            frame.loc[frame.index[-1], forming] = float('nan')
+        return frame
 
-    async def execute_trade(self, session, symbol, signal, entry, sl, tp, order_type="market"):
-        # 1. Get Account Balance
+    async def execute_trade(self, symbol, signal, entry, sl, tp, order_type="market", fresh_balance=False):
+        # 1. Get Account Balance (shared snapshot; fresh_balance forces a read from the agent)
         balance = 0.0
-        try:
-            async with session.get(f"{self.agent_url}/account", timeout=5) as resp:
-                if resp.status == 200:
-                    info = await resp.json()
-                    balance = info.get('balance', 0.0)
-        except:
+        info = await account_state.get(fresh=fresh_balance)
+        if info is None and fresh_balance and account_state.snapshot is not None:
+            info = account_state.snapshot
+            self.log(f"[WARN] Fresh balance unavailable ({account_state.error}). Sizing {symbol} from the balance read {account_state.age:.0f}s ago.")
+        if info is not None:
+            balance = info.get('balance', 0.0)
+        else:
             self.log(f"Could not fetch balance. Using default 0.")
 
         # 2. Calculate Lot Size
@@ -160,45 +214,43 @@ class StrategyEngine:
         self.log(f"Sending Order {symbol} ({order_type}): Price={payload['price']}, SL={payload['sl']}, TP={payload['tp']}")
 
         try:
-            async with session.post(f"{self.agent_url}/trade", json=payload, timeout=10) as resp:
-                if resp.status == 200:
-                    msg = f"Order Sent! {symbol} {signal} @ {entry} Qty: {qty}"
-                    self.log(msg)
-                    # DB Log
-                    try: 
-                        db.log_trade(symbol, self.name, signal, entry, qty, "ORDER_SENT")
-                    except: pass
-                    # Telegram Notify
-                    await self.notifier.send_message(f"🚀 [{self.name}] {msg}")
-                else:
-                    err = await resp.text()
-                    msg = f"Order failed {symbol}: {err}"
-                    self.log(msg)
-                    await self.notifier.send_message(f"⚠️ {msg}")
-        except Exception as e:
-            msg = f"Order connection error {symbol}: {str(e)}"
+            # Never retried: a repeated /trade could open a second position
+            await self.agent.post("/trade", json=payload)
+            msg = f"Order Sent! {symbol} {signal} @ {entry} Qty: {qty}"
             self.log(msg)
-            await self.notifier.send_message(f"🚨 {msg}")
+            # DB Log
+            try: 
+                await db_writer.log_trade(symbol, self.name, signal, entry, qty, "ORDER_SENT")
+            except: pass
+            # Telegram Notify
+            await self.notifier.send_message(f"🚀 [{self.name}] {msg}")
+        except AgentError as e:
+            if e.status:
+                msg = f"Order failed {symbol}: {e.detail}"
+                self.log(msg)
+                await self.notifier.send_message(f"⚠️ {msg}")
+            else:
+                msg = f"Order connection error {symbol}: {e.detail}"
+                self.log(msg)
+                await self.notifier.send_message(f"🚨 {msg}")
 
-    async def update_account_info(self, session):
+    async def update_account_info(self):
+        """Account info and connection state from the shared snapshot (polled in main.py)."""
         try:
-            async with session.get(f"{self.agent_url}/account", timeout=5) as resp:
-                if resp.status == 200:
-                    info = await resp.json()
-                    self.account_info = {
-                        "balance": info.get('balance', 0.0),
-                        "equity": info.get('equity', 0.0),
-                        "margin": info.get('margin', 0.0)
-                    }
-                    
-                    # Connection Restored Logic
-                    if not self.connected:
-                        self.connected = True
-                        await self.notifier.send_message("📶 Connection to Agent Restored")
-                        self.log("Connection Restored")
-                        
-                else:
-                    raise Exception(f"Status {resp.status}")
+            if not account_state.is_fresh():
+                raise Exception(account_state.error or "Account snapshot is stale")
+            info = account_state.snapshot
+            self.account_info = {
+                "balance": info.get('balance', 0.0),
+                "equity": info.get('equity', 0.0),
+                "margin": info.get('margin', 0.0)
+            }
+            
+            # Connection Restored Logic
+            if not self.connected:
+                self.connected = True
+                await self.notifier.send_message("📶 Connection to Agent Restored")
+                self.log("Connection Restored")
                     
         except Exception as e:
             # Connection Lost Logic
@@ -207,139 +259,202 @@ class StrategyEngine:
                 await self.notifier.send_message("❌ Connection Lost to Windows Agent")
                 self.log("Connection Lost")
 
-    async def run_loop(self):
-        """Main loop called periodically from main.py or background task"""
+    async def run_loop(self, entries=True, exits=True, bar_open=None, symbols=None):
+        """
+        One evaluation pass, called by the scheduler in main.py.
+        entries: look for new signals (right after a bar close); exits: manage open
+        positions. Without entries, symbols with no open position are not fetched.
+        bar_open: open time of the bar that should be forming by now; symbols whose
+        data has not reached it yet are skipped and returned so the caller can retry.
+        """
+        waiting = []
         if not self.active:
-            return
+            return waiting
 
         # Send Start Notification if pending
         if self.notification_pending:
             await self.notifier.send_message(f"🟢 Bot Started - Mode: {self.active_mode}")
             self.notification_pending = False
 
-        async with aiohttp.ClientSession() as session:
-            # Update Account Info (Acts as Heartbeat)
-            await self.update_account_info(session)
-            
-            # If not connected, we skip trading logic but keep retrying account info next loop
-            if not self.connected:
-                for symbol in self.symbols:
-                    self.status[symbol] = "Connection Lost"
-                return
+        # Update Account Info (Acts as Heartbeat)
+        await self.update_account_info()
+        
+        # If not connected, we skip trading logic but keep retrying account info next loop
+        if not self.connected:
+            for symbol in self.symbols:
+                self.status[symbol] = "Connection Lost"
+            return waiting
 
-            # Determine Timeframes based on Mode
-            mode_config = settings.MODES.get(self.active_mode, settings.MODES["4H1H"])
-            tf_current = mode_config["current"]
-            tf_higher = mode_config["higher"]
+        # Determine Timeframes based on Mode
+        mode_config = settings.MODES.get(self.active_mode, settings.MODES["4H1H"])
+        tf_current = mode_config["current"]
+        tf_higher = mode_config["higher"]
 
-            for symbol in self.symbols:
-                if not self.active: break
-                
-                self.status[symbol] = f"Scanning ({self.active_mode})..."
-                
-                # Fetch Data
-                df_curr = await self.fetch_candles(session, symbol, tf_current)
-                
-                # Fetch Higher TF only if configured
-                df_high = None
-                if tf_higher:
-                    df_high = await self.fetch_candles(session, symbol, tf_higher)
-                
-                # Logic: Current TF is mandatory. Higher TF is mandatory ONLY if it was requested.
-                # If tf_higher is None, df_high stays None, and that is valid.
-                valid_data = (df_curr is not None) and (not tf_higher or df_high is not None)
-                
-                if valid_data:
-                    # Log data size (Optional debugging)
-                    # self.log(f"{symbol} Data: Curr={len(df_curr)} High={'None' if df_high is None else len(df_high)}")
-                    
-                    # Calculate Indicators
-                    try:
-                        indicators = self.strategy.calculate_indicators(df_curr, df_high)
-                        if indicators is not None:
-                            # Update UI Data
-                            if not indicators.empty:
-                                try:
-                                    last_row = indicators.iloc[-1].copy()
-                                    # Fill NaNs with None for JSON safety
-                                    last_row = last_row.where(pd.notnull(last_row), None)
-                                    # Convert timestamps
-                                    if 'time' in last_row: last_row['time'] = str(last_row['time'])
-                                    self.market_data[symbol] = last_row.to_dict()
-                                except Exception as e:
-                                    self.log(f"[ERROR] Serialization Error {symbol}: {e}")
-                                    self.market_data[symbol] = {}
+        targets = [
+            symbol for symbol in (symbols if symbols is not None else self.symbols)
+            if entries or (exits and self.active_positions.get(symbol))
+        ]
+        # Symbols run concurrently; the agent client's token bucket paces the requests
+        slots = asyncio.Semaphore(settings.SYMBOL_CONCURRENCY)
+
+        async def run_symbol(symbol):
+            async with slots:
+                if not self.active:
+                    return False
+                return await self._run_symbol(symbol, tf_current, tf_higher, entries, exits, bar_open)
+
+        results = await asyncio.gather(*[run_symbol(symbol) for symbol in targets], return_exceptions=True)
+        for symbol, result in zip(targets, results):
+            if isinstance(result, Exception):
+                self.log(f"[ERROR] {symbol}: {result}")
+                self.status[symbol] = "Error"
+            elif result:
+                waiting.append(symbol)
+        return waiting
+
+    async def fetch_frames(self, symbol, tf_current, tf_higher):
+        """(current TF frame, higher TF frame or None) for one symbol."""
+        if self.indicator_spec:
+            df_curr = await self.live_frame(symbol, tf_current)
+        else:
+            df_curr = await self.fetch_candles(symbol, tf_current, n=HISTORY_BARS)
+        
+        # Fetch Higher TF only if configured
+        df_high = None
+        if tf_higher:
+            df_high = await self.fetch_candles(symbol, tf_higher, n=HISTORY_BARS)
+        return df_curr, df_high
+
+    async def _run_symbol(self, symbol, tf_current, tf_higher, entries, exits, bar_open):
+        """Evaluates one symbol; True when its data has not reached bar_open yet."""
+        self.status[symbol] = f"Scanning ({self.active_mode})..."
+        
+        # Fetch Data (bounded, so one slow feed only costs this symbol its pass)
+        try:
+            df_curr, df_high = await asyncio.wait_for(self.fetch_frames(symbol, tf_current, tf_higher), settings.SYMBOL_FETCH_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.status[symbol] = "Timeout"
+            self.log(f"[WARN] {symbol}: Data fetch timed out after {settings.SYMBOL_FETCH_TIMEOUT}s")
+            return False
+        
+        # Logic: Current TF is mandatory. Higher TF is mandatory ONLY if it was requested.
+        # If tf_higher is None, df_high stays None, and that is valid.
+        valid_data = (df_curr is not None) and (not tf_higher or df_high is not None)
+        
+        if valid_data and entries and bar_open and df_curr['time'].iloc[-1] < bar_open:
+            # No tick in the new bar yet: iloc[-2] would still be the bar before the close
+            self.status[symbol] = "Waiting for bar"
+            return True
+        
+        if valid_data:
+            # Log data size (Optional debugging)
+            # self.log(f"{symbol} Data: Curr={len(df_curr)} High={'None' if df_high is None else len(df_high)}")
+            
+            # Calculate Indicators
+            try:
+                # Pandas work runs in the analysis pool so the event loop stays free
+                indicators, row, signal, messages = await asyncio.get_running_loop().run_in_executor(
+                    analysis_pool, self._analyse, symbol, df_curr, df_high)
+                if indicators is not None:
+                    # Update UI Data
+                    if row is not None:
+                        self.market_data[symbol] = row
+                    for message in messages:
+                        self.log(message)
+
+                    # --- TRADE MANAGER (Exits) ---
+                    current_position = self.active_positions.get(symbol)
+                    if current_position and exits:
+                        # Check for Exit Signal
+                        should_exit = False
+                        try:
+                            should_exit = self.strategy.get_exit_signal(indicators, current_position)
+                        except: pass # Strategy might not support exits
+                        
+                        if should_exit:
+                            self.log(f"[EXIT] Exit Signal for {symbol} ({current_position})")
+                            # Close Position: Send Opposite Order
+                            close_action = "short" if current_position == "long" else "long"
+                            # Amount? We assume full close. Using same qty logic or just flat close.
+                            # For simplicity/MVP: Send a Market Close. 
+                            # Agent API is simple buy/sell. We send opposite.
+                            # We don't track exact Qty here perfectly yet, but assumes 1 trade per symbol.
                             
-                            signal = self.strategy.get_signal(indicators)
+                            # Get current price for logging
+                            exit_price = indicators.iloc[-1]['close'] if not indicators.empty else 0
                             
-                            # Detailed Tester Logging
-                            if not indicators.empty:
-                                close_p = indicators.iloc[-1]['close']
-                                # Try to log key indicators if they exist
-                                adx_str = f"ADX={indicators.iloc[-1].get('adx', 'N/A'):.1f}" if 'adx' in indicators.columns else ""
-                                rsi_str = f"RSI={indicators.iloc[-1].get('rsi', 'N/A'):.1f}" if 'rsi' in indicators.columns else ""
-                                self.log(f"[SCAN] {symbol} Price={close_p} {adx_str} {rsi_str} Signal={signal}")
-
-                            # --- TRADE MANAGER (Exits) ---
-                            current_position = self.active_positions.get(symbol)
-                            if current_position:
-                                # Check for Exit Signal
-                                should_exit = False
-                                try:
-                                    should_exit = self.strategy.get_exit_signal(indicators, current_position)
-                                except: pass # Strategy might not support exits
-                                
-                                if should_exit:
-                                    self.log(f"[EXIT] Exit Signal for {symbol} ({current_position})")
-                                    # Close Position: Send Opposite Order
-                                    close_action = "short" if current_position == "long" else "long"
-                                    # Amount? We assume full close. Using same qty logic or just flat close.
-                                    # For simplicity/MVP: Send a Market Close. 
-                                    # Agent API is simple buy/sell. We send opposite.
-                                    # We don't track exact Qty here perfectly yet, but assumes 1 trade per symbol.
-                                    
-                                    # Get current price for logging
-                                    exit_price = indicators.iloc[-1]['close'] if not indicators.empty else 0
-                                    
-                                    # Execute Close
-                                    # We use 0 as Entry/SL/TP for close order basically, relying on Market execution
-                                    await self.execute_trade(session, symbol, close_action, exit_price, 0, 0, order_type="market")
-                                    
-                                    self.active_positions[symbol] = False
-                                    self.status[symbol] = "Closed Trade"
-                                    self.log(f"[TRADE] Position Closed {symbol}")
-                                else:
-                                    self.status[symbol] = f"In Trade ({current_position})"
+                            # Execute Close
+                            # We use 0 as Entry/SL/TP for close order basically, relying on Market execution
+                            await self.execute_trade(symbol, close_action, exit_price, 0, 0, order_type="market")
                             
-                            # --- ENTRY MANAGER ---
-                            elif signal:
-                                msg = f"[SIGNAL] Signal found for {symbol}: {signal}"
-                                self.log(msg)
-                                entry, sl, tp = self.strategy.get_entry_params(signal, indicators)
-                                await self.execute_trade(session, symbol, signal, entry, sl, tp)
-                                
-                                # Mark as active with type
-                                self.active_positions[symbol] = signal
-                                self.status[symbol] = f"Entered: {signal}"
-                            else:
-                                self.status[symbol] = "Scanning"
-                                # pass
+                            self.active_positions[symbol] = False
+                            self.status[symbol] = "Closed Trade"
+                            self.log(f"[TRADE] Position Closed {symbol}")
                         else:
-                            self.status[symbol] = "Insufficient Data"
-                            self.log(f"[WARN] {symbol}: Insufficient Data (Candles: {len(df_curr)}/{len(df_high) if df_high is not None else 0})")
-                    except Exception as e:
-                        self.log(f"[ERROR] analyzing {symbol}: {e}")
-                        self.status[symbol] = "Error"
-                        import traceback
-                        traceback.print_exc()
+                            self.status[symbol] = f"In Trade ({current_position})"
+                    
+                    # --- ENTRY MANAGER ---
+                    elif current_position:
+                        pass # Entry pass only; exits run on their own cadence
+                    
+                    elif signal and entries:
+                        msg = f"[SIGNAL] Signal found for {symbol}: {signal}"
+                        self.log(msg)
+                        entry, sl, tp = self.strategy.get_entry_params(signal, indicators)
+                        await self.execute_trade(symbol, signal, entry, sl, tp)
+                        
+                        # Mark as active with type
+                        self.active_positions[symbol] = signal
+                        self.status[symbol] = f"Entered: {signal}"
+                    else:
+                        self.status[symbol] = "Scanning"
+                        # pass
                 else:
-                    self.status[symbol] = "Connection Error"
-                    # Safe logging for None types
-                    curr_len = len(df_curr) if df_curr is not None else 0
-                    high_len = len(df_high) if df_high is not None else 0
-                    self.log(f"[WARN] {symbol}: Fetch Failed or Insufficient Data. Candles: {curr_len}/{high_len}")
-                
-                # Short sleep between symbols not to flood
-                await asyncio.sleep(1)
+                    self.status[symbol] = "Insufficient Data"
+                    self.log(f"[WARN] {symbol}: Insufficient Data (Candles: {len(df_curr)}/{len(df_high) if df_high is not None else 0})")
+            except Exception as e:
+                self.log(f"[ERROR] analyzing {symbol}: {e}")
+                self.status[symbol] = "Error"
+                import traceback
+                traceback.print_exc()
+        else:
+            self.status[symbol] = "Connection Error"
+            # Safe logging for None types
+            curr_len = len(df_curr) if df_curr is not None else 0
+            high_len = len(df_high) if df_high is not None else 0
+            self.log(f"[WARN] {symbol}: Fetch Failed or Insufficient Data. Candles: {curr_len}/{high_len}")
+        return False
+
+    def _analyse(self, symbol, df_curr, df_high):
+        """CPU side of a symbol's pass (runs in analysis_pool): (indicators, UI row, signal, log lines)."""
+        if self.indicator_spec:
+            indicators = self._within_history(symbol, df_curr)
+        else:
+            indicators = self.strategy.calculate_indicators(df_curr, df_high)
+        if indicators is None:
+            return None, None, None, []
+        row, messages = None, []
+        if not indicators.empty:
+            try:
+                last_row = indicators.iloc[-1:].astype(object).iloc[0] # Keeps ints (time) as ints
+                # Fill NaNs with None for JSON safety
+                last_row = last_row.where(pd.notnull(last_row), None)
+                # Convert timestamps
+                if 'time' in last_row: last_row['time'] = str(last_row['time'])
+                row = last_row.to_dict()
+            except Exception as e:
+                messages.append(f"[ERROR] Serialization Error {symbol}: {e}")
+                row = {}
+        
+        signal = self.strategy.get_signal(indicators)
+        
+        # Detailed Tester Logging
+        if not indicators.empty:
+            close_p = indicators.iloc[-1]['close']
+            # Try to log key indicators if they exist
+            adx_str = f"ADX={indicators.iloc[-1].get('adx', 'N/A'):.1f}" if 'adx' in indicators.columns else ""
+            rsi_str = f"RSI={indicators.iloc[-1].get('rsi', 'N/A'):.1f}" if 'rsi' in indicators.columns else ""
+            messages.append(f"[SCAN] {symbol} Price={close_p} {adx_str} {rsi_str} Signal={signal}")
+        return indicators, row, signal, messages
 
 # Engine is now instantiated in main.py
@@ -0,0 +1,395 @@
+import math
+import pandas as pd
+from collections import deque
+
+NAN = float('nan')
+
+
+def _isnan(x):
+    return x != x
+
+
+class _Ewm:
+    """
+    pandas ewm(alpha, adjust=True, min_periods).mean() one value at a time.
+    step() is pure: it returns (value, new_state) and the caller commits the state.
+    """
+    def __init__(self, alpha, min_periods):
+        self.decay = 1.0 - alpha
+        self.min_periods = min_periods
+        self.state = (0.0, 0.0, 0)  # weighted sum, sum of weights, observations
+
+    def step(self, x):
+        num, den, count = self.state
+        if _isnan(x):
+            # Missing values still age the older weights (ignore_na=False)
+            state = (num * self.decay, den * self.decay, count) if count else self.state
+        else:
+            state = (num * self.decay + x, den * self.decay + 1.0, count + 1)
+        value = state[0] / state[1] if state[2] >= self.min_periods else NAN
+        return value, state
+
+
+def _rma(length):
+    return _Ewm(1.0 / length, length)
+
+
+class _SeededEma:
+    """
+    pandas_ta ema(): the first value is the sum of the first `length` inputs
+    (NaNs skipped) over length, then ewm(span=length, adjust=False).
+    """
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.state = (0, 0.0, NAN)  # inputs seen, seed sum, value
+
+    def step(self, x):
+        seen, total, value = self.state
+        seen += 1
+        if seen < self.length:
+            return NAN, (seen, total if _isnan(x) else total + x, NAN)
+        if seen == self.length:
+            value = (total if _isnan(x) else total + x) / self.length
+        elif not _isnan(x):
+            value = ((1.0 - self.alpha) * value + self.alpha * x) / ((1.0 - self.alpha) + self.alpha)
+        return value, (seen, total, value)
+
+
+class Indicator:
+    """
+    Base for streaming indicators. update(bar) commits a closed bar and peek(bar)
+    evaluates the still-forming bar without changing any state; both are O(1)
+    and return {output: value}. Bars are candle dicts with high/low/close.
+    """
+    outputs = ()
+
+    def update(self, bar):
+        return self._advance(bar, True)
+
+    def peek(self, bar):
+        return self._advance(bar, False)
+
+    def _advance(self, bar, commit):
+        raise NotImplementedError
+
+
+class EMA(Indicator):
+    outputs = ('ema',)
+
+    def __init__(self, length=10):
+        self._ema = _SeededEma(length)
+
+    def _advance(self, bar, commit):
+        value, state = self._ema.step(bar['close'])
+        if commit:
+            self._ema.state = state
+        return {'ema': value}
+
+
+class DEMA(Indicator):
+    outputs = ('dema',)
+
+    def __init__(self, length=10):
+        self._ema1 = _SeededEma(length)
+        self._ema2 = _SeededEma(length)
+
+    def _advance(self, bar, commit):
+        e1, state1 = self._ema1.step(bar['close'])
+        e2, state2 = self._ema2.step(e1)
+        if commit:
+            self._ema1.state, self._ema2.state = state1, state2
+        return {'dema': 2 * e1 - e2}
+
+
+class RSI(Indicator):
+    outputs = ('rsi',)
+
+    def __init__(self, length=14):
+        self._gain = _rma(length)
+        self._loss = _rma(length)
+        self.prev_close = None
+
+    def _advance(self, bar, commit):
+        close = bar['close']
+        change = NAN if self.prev_close is None else close - self.prev_close
+        gain, gain_state = self._gain.step(NAN if _isnan(change) else max(change, 0.0))
+        loss, loss_state = self._loss.step(NAN if _isnan(change) else min(change, 0.0))
+        if commit:
+            self._gain.state, self._loss.state = gain_state, loss_state
+            self.prev_close = close
+        total = gain + abs(loss)
+        # Flat closes: no gains and no losses, NaN as in pandas_ta
+        return {'rsi': 100 * gain / total if total else NAN}
+
+
+def _true_range(bar, prev_close):
+    if prev_close is None:
+        return NAN
+    high, low = bar['high'], bar['low']
+    return max(abs(high - low), abs(high - prev_close), abs(prev_close - low))
+
+
+class ATR(Indicator):
+    outputs = ('atr',)
+
+    def __init__(self, length=14):
+        self._rma = _rma(length)
+        self.prev_close = None
+
+    def _advance(self, bar, commit):
+        value, state = self._rma.step(_true_range(bar, self.prev_close))
+        if commit:
+            self._rma.state = state
+            self.prev_close = bar['close']
+        return {'atr': value}
+
+
+class ADX(Indicator):
+    outputs = ('adx', 'dmp', 'dmn')
+
+    def __init__(self, length=14):
+        self._atr = _rma(length)
+        self._pos = _rma(length)
+        self._neg = _rma(length)
+        self._dx = _rma(length)
+        self.prev = None  # previous (high, low, close)
+
+    def _advance(self, bar, commit):
+        high, low = bar['high'], bar['low']
+        if self.prev is None:
+            tr = pos = neg = NAN
+        else:
+            tr = _true_range(bar, self.prev[2])
+            up, down = high - self.prev[0], self.prev[1] - low
+            pos = up if up > down and up > 0 else 0.0
+            neg = down if down > up and down > 0 else 0.0
+        atr, atr_state = self._atr.step(tr)
+        pos_avg, pos_state = self._pos.step(pos)
+        neg_avg, neg_state = self._neg.step(neg)
+        k = 100 / atr if atr else NAN  # Zero range, NaN as in pandas_ta
+        dmp, dmn = k * pos_avg, k * neg_avg
+        dx = 100 * abs(dmp - dmn) / (dmp + dmn) if dmp + dmn else NAN
+        adx, dx_state = self._dx.step(dx)
+        if commit:
+            self._atr.state, self._pos.state, self._neg.state, self._dx.state = atr_state, pos_state, neg_state, dx_state
+            self.prev = (high, low, bar['close'])
+        return {'adx': adx, 'dmp': dmp, 'dmn': dmn}
+
+
+class Bollinger(Indicator):
+    """Bands over the last `length` closes (population std, as pandas_ta bbands)."""
+    outputs = ('lower', 'mid', 'upper')
+
+    def __init__(self, length=5, std=2.0):
+        self.length = length
+        self.std = std
+        self.window = deque(maxlen=length)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._since_exact = 0
+
+    def _stats(self, close):
+        if len(self.window) < self.length - 1:
+            return None
+        if len(self.window) < self.length:
+            values = list(self.window) + [close]
+            mean = math.fsum(values) / self.length
+            return mean, math.fsum((v - mean) ** 2 for v in values)
+        # Slide the window: drop the oldest close, add this one (Welford)
+        old = self.window[0]
+        delta = close - old
+        mean = self.mean + delta / self.length
+        return mean, max(self.m2 + delta * (close - mean + old - self.mean), 0.0)
+
+    def _advance(self, bar, commit):
+        close = bar['close']
+        stats = self._stats(close)
+        if commit:
+            self.window.append(close)
+            self._since_exact += 1
+            if stats is not None and self._since_exact >= self.length:
+                # Recompute exactly now and then so rounding never accumulates
+                self.mean = math.fsum(self.window) / self.length
+                stats = (self.mean, math.fsum((v - self.mean) ** 2 for v in self.window))
+                self._since_exact = 0
+            if stats is not None:
+                self.mean, self.m2 = stats
+        if stats is None:
+            return {'lower': NAN, 'mid': NAN, 'upper': NAN}
+        mean, m2 = stats
+        width = self.std * math.sqrt(m2 / self.length)
+        return {'lower': mean - width, 'mid': mean, 'upper': mean + width}
+
+
+class Donchian(Indicator):
+    """Lowest low / highest high of the last `length` bars, current bar included."""
+    outputs = ('lower', 'mid', 'upper')
+
+    def __init__(self, length=20):
+        self.length = length
+        self.count = 0
+        self._highs = deque()  # (bar index, high), highs decreasing
+        self._lows = deque()   # (bar index, low), lows increasing
+
+    def _extreme(self, queue, value, better):
+        # Only the front entry can be the bar that drops out of the window
+        first = self.count - self.length + 1
+        entry = queue[0] if queue and queue[0][0] >= first else (queue[1] if len(queue) > 1 else None)
+        return value if entry is None or better(value, entry[1]) else entry[1]
+
+    def _advance(self, bar, commit):
+        high, low = bar['high'], bar['low']
+        if self.count + 1 < self.length:
+            upper = lower = NAN
+        else:
+            upper = self._extreme(self._highs, high, lambda a, b: a >= b)
+            lower = self._extreme(self._lows, low, lambda a, b: a <= b)
+        if commit:
+            index = self.count
+            while self._highs and self._highs[-1][1] <= high:
+                self._highs.pop()
+            self._highs.append((index, high))
+            while self._lows and self._lows[-1][1] >= low:
+                self._lows.pop()
+            self._lows.append((index, low))
+            first = index - self.length + 1
+            while self._highs[0][0] < first:
+                self._highs.popleft()
+            while self._lows[0][0] < first:
+                self._lows.popleft()
+            self.count += 1
+        return {'lower': lower, 'mid': 0.5 * (lower + upper), 'upper': upper}
+
+
+class SuperTrend(Indicator):
+    outputs = ('trend', 'direction')
+
+    def __init__(self, length=7, multiplier=3.0):
+        self.multiplier = multiplier
+        self._atr = ATR(length)
+        self.prev = None  # (upper band, lower band, direction) after carrying
+
+    def _advance(self, bar, commit):
+        atr = self._atr._advance(bar, commit)['atr']
+        hl2 = 0.5 * (bar['high'] + bar['low'])
+        upper, lower = hl2 + self.multiplier * atr, hl2 - self.multiplier * atr
+        if self.prev is None:
+            direction, trend = 1, NAN
+        else:
+            prev_upper, prev_lower, direction = self.prev
+            close = bar['close']
+            if close > prev_upper:
+                direction = 1
+            elif close < prev_lower:
+                direction = -1
+            else:
+                if direction > 0 and lower < prev_lower:
+                    lower = prev_lower
+                if direction < 0 and upper > prev_upper:
+                    upper = prev_upper
+            trend = lower if direction > 0 else upper
+        if commit:
+            self.prev = (upper, lower, direction)
+        return {'trend': trend, 'direction': direction}
+
+
+INDICATORS = {
+    'ema': EMA,
+    'dema': DEMA,
+    'rsi': RSI,
+    'atr': ATR,
+    'adx': ADX,
+    'bbands': Bollinger,
+    'donchian': Donchian,
+    'supertrend': SuperTrend,
+}
+
+
+class _Series:
+    """One indicator instance for a (symbol, timeframe) and the last two committed outputs."""
+    def __init__(self, indicator):
+        self.indicator = indicator
+        self.last_time = None
+        self.value = None
+        self.prev_value = None
+
+
+class StreamingIndicators:
+    """
+    Live indicator state per (symbol, timeframe, indicator, params).
+
+    Strategies describe their calculate_indicators() columns as a spec,
+    {column: (indicator, params, output[, lag])}, and frame() turns the latest
+    candles into the same columns without recomputing history: closed bars
+    newer than the stored state are applied once each, and the forming bar is
+    only peeked. lag=1 reads the value as of the previous bar (a .shift(1)).
+
+    Several engines can share one instance; a bar that was already applied is
+    skipped, so feeding overlapping candle windows is safe.
+    """
+    def __init__(self):
+        self._series = {}
+
+    def _key(self, symbol, timeframe, name, params):
+        return (symbol, timeframe, name, tuple(sorted(params.items())))
+
+    def _entries(self, symbol, timeframe, spec):
+        entries = {}
+        for column, (name, params, *_rest) in spec.items():
+            key = self._key(symbol, timeframe, name, params)
+            if key not in self._series:
+                self._series[key] = _Series(INDICATORS[name](**params))
+            entries[key] = self._series[key]
+        return entries
+
+    def is_warm(self, symbol, timeframe, spec):
+        """True when every indicator of spec already has history for this series."""
+        return all(entry.last_time is not None for entry in self._entries(symbol, timeframe, spec).values())
+
+    def last_time(self, symbol, timeframe, spec):
+        """Oldest last applied bar time across spec's indicators (None when any is cold)."""
+        times = [entry.last_time for entry in self._entries(symbol, timeframe, spec).values()]
+        return None if None in times else min(times)
+
+    def reset(self, symbol=None, timeframe=None):
+        for key in [k for k in self._series if symbol in (None, k[0]) and timeframe in (None, k[1])]:
+            del self._series[key]
+
+    def frame(self, symbol, timeframe, spec, candles):
+        """
+        Two-row DataFrame (last closed bar, forming bar) with the spec columns,
+        laid out like calculate_indicators() so get_signal() reads iloc[-2].
+        Returns None when the candles start after the stored state (bars were
+        missed); that state is dropped, so the next call with a longer history
+        rebuilds it.
+        """
+        if len(candles) < 2:
+            return None
+        closed, forming = candles[:-1], candles[-1]
+        entries = self._entries(symbol, timeframe, spec)
+
+        for key, entry in entries.items():
+            if entry.last_time is not None and closed[0]['time'] > entry.last_time:
+                del self._series[key]
+                return None
+            for bar in closed:
+                if entry.last_time is None or bar['time'] > entry.last_time:
+                    entry.prev_value, entry.value = entry.value, entry.indicator.update(bar)
+                    entry.last_time = bar['time']
+
+        rows = [dict(closed[-1]), dict(forming)]
+        peeked = {key: entry.indicator.peek(forming) for key, entry in entries.items()}
+        for column, (name, params, output, *lag) in spec.items():
+            key = self._key(symbol, timeframe, name, params)
+            entry = entries[key]
+            if lag and lag[0]:
+                rows[0][column] = entry.prev_value[output] if entry.prev_value else NAN
+                rows[1][column] = entry.value[output]
+            else:
+                rows[0][column] = entry.value[output]
+                rows[1][column] = peeked[key][output]
+        return pd.DataFrame(rows)
+
+
+live_indicators = StreamingIndicators()
@@ -0,0 +1,182 @@
+import os
+import time
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from backend.indicator_cache import indicator_cache
+
+CANDLE_COLUMNS = ('time', 'open', 'high', 'low', 'close')
+
+
+def param_grid(grid):
+    """
+    Expands {'trend_ema': [100, 200], 'rsi_oversold': [30, 35], 'rr': 2.0}
+    into one config dict per combination. Scalars are kept fixed.
+    """
+    keys = list(grid)
+    axes = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*axes)]
+
+
+class SharedCandles:
+    """
+    Publishes candle columns in one shared memory block.
+    Workers map the block by name instead of receiving a pickled DataFrame per task.
+    """
+    def __init__(self, df, columns=CANDLE_COLUMNS):
+        arrays = [(c, np.ascontiguousarray(df[c].to_numpy())) for c in columns]
+        total = sum(a.nbytes for _, a in arrays)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(total, 1))
+
+        layout = []
+        offset = 0
+        for name, arr in arrays:
+            dst = np.ndarray(arr.shape, dtype=arr.dtype, buffer=self.shm.buf, offset=offset)
+            dst[:] = arr
+            layout.append((name, arr.dtype.str, len(arr), offset))
+            offset += arr.nbytes
+
+        # Everything a worker needs to rebuild the frame (small, picklable)
+        self.spec = (self.shm.name, layout)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_candles(spec):
+    """Maps a SharedCandles block. Returns (shm, DataFrame); keep shm alive while using the frame."""
+    name, layout = spec
+    # Pool workers share the parent's resource tracker, which unlinks the block once
+    shm = shared_memory.SharedMemory(name=name)
+
+    columns = {}
+    for col, dtype, length, offset in layout:
+        arr = np.ndarray((length,), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        arr.flags.writeable = False
+        columns[col] = arr
+    return shm, pd.DataFrame(columns, copy=False)
+
+
+# --- Worker side (one frame per process, attached once in the initializer) ---
+_worker_shm = None
+_worker_df = None
+
+
+def _init_worker(spec):
+    global _worker_shm, _worker_df
+    _worker_shm, _worker_df = attach_candles(spec)
+
+
+def _window_bounds(times, window):
+    """Row bounds [first, stop) for a window: None, start_ts or (start_ts, end_ts)."""
+    if window is None:
+        return 0, len(times)
+    start_ts, end_ts = window if isinstance(window, tuple) else (window, None)
+    first = int(np.searchsorted(times, start_ts, side='left')) if start_ts is not None else 0
+    stop = int(np.searchsorted(times, end_ts, side='left')) if end_ts is not None else len(times)
+    return first, stop
+
+
+def _run_task(fn, params, window, full_history):
+    df = _worker_df
+    first, stop = _window_bounds(df['time'].to_numpy(), window)
+    if full_history:
+        # fn computes indicators over the whole series and slices [first, stop) itself
+        result = fn(params, df, (first, stop))
+    else:
+        result = fn(params, df.iloc[first:stop].reset_index(drop=True))
+    # Each worker has its own indicator cache; report its counters with every result
+    return os.getpid(), indicator_cache.stats(), result
+
+
+class ParameterSweep:
+    """
+    Fans configs out across a process pool.
+
+    fn(params, df) -> dict must be a module-level function (it is pickled by reference).
+    The candles are shared once through SharedCandles; each task only carries its
+    params and a window: None, start_ts or (start_ts, end_ts).
+
+    full_history=True calls fn(params, full_df, (first, stop)) instead, so indicators
+    can be computed once over the whole series and sliced per window.
+    """
+    def __init__(self, fn, workers=None, progress=True, full_history=False):
+        self.fn = fn
+        self.workers = workers or os.cpu_count() or 1
+        self.progress = progress
+        self.full_history = full_history
+        self._worker_cache = {}
+
+    def run(self, configs, df, windows=None):
+        """
+        Generator yielding (params, window_name, result) as tasks finish.
+        windows: {'30d': start_ts, '200d': None} -> every config runs on each window.
+        """
+        windows = windows or {"all": None}
+        tasks = [(cfg, name, window) for cfg in configs for name, window in windows.items()]
+        return self.run_tasks(tasks, df)
+
+    def run_tasks(self, tasks, df):
+        """Like run(), for an explicit list of (params, window_name, window) tasks."""
+        total = len(tasks)
+        if not total:
+            return
+
+        started = time.time()
+        self._last_report = 0.0
+        self._worker_cache = {}
+        done = 0
+        # Bounded in-flight set so huge grids don't queue every future up front
+        max_in_flight = self.workers * 4
+        pending = {}
+        task_iter = iter(tasks)
+
+        with SharedCandles(df) as shared, ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(shared.spec,)
+        ) as pool:
+            for cfg, name, window in itertools.islice(task_iter, max_in_flight):
+                pending[pool.submit(_run_task, self.fn, cfg, window, self.full_history)] = (cfg, name)
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    cfg, name = pending.pop(fut)
+                    pid, cache_stats, result = fut.result()
+                    self._worker_cache[pid] = cache_stats
+                    done += 1
+                    if self.progress:
+                        self._report(done, total, started)
+                    yield cfg, name, result
+
+                for cfg, name, window in itertools.islice(task_iter, len(finished)):
+                    pending[pool.submit(_run_task, self.fn, cfg, window, self.full_history)] = (cfg, name)
+
+    def cache_stats(self):
+        """Indicator cache counters summed over the pool workers of the last run."""
+        totals = {"hits": 0, "misses": 0, "evictions": 0, "entries": 0, "bytes": 0}
+        for stats in self._worker_cache.values():
+            for k in totals:
+                totals[k] += stats[k]
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        totals["workers"] = len(self._worker_cache)
+        return totals
+
+    def _report(self, done, total, started):
+        # Throttled to about one line per second
+        now = time.time()
+        if done < total and now - self._last_report < 1.0:
+            return
+        self._last_report = now
+        elapsed = now - started
+        eta = elapsed / done * (total - done)
+        print(f"[SWEEP] {done}/{total} ({done / total * 100:.1f}%) | Elapsed {elapsed:.0f}s | ETA {eta:.0f}s", flush=True)
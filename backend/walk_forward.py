@@ -0,0 +1,103 @@
+import numpy as np
+from backend.sweep import ParameterSweep
+
+DAY = 24 * 60 * 60
+
+
+def make_folds(times, in_sample_days, out_of_sample_days, step_days=None):
+    """
+    Rolling walk-forward folds over a sorted unix `times` array.
+    Each fold is {'is': (start_ts, end_ts), 'oos': (start_ts, end_ts)}, end exclusive.
+    Windows slide by step_days (default: the out-of-sample length, so OOS periods tile).
+    """
+    times = np.asarray(times)
+    if len(times) == 0:
+        return []
+
+    step = (step_days or out_of_sample_days) * DAY
+    is_len = in_sample_days * DAY
+    oos_len = out_of_sample_days * DAY
+    last = int(times[-1])
+
+    folds = []
+    start = int(times[0])
+    while start + is_len <= last:
+        is_end = start + is_len
+        oos_end = min(is_end + oos_len, last + 1)
+        folds.append({"is": (start, is_end), "oos": (is_end, oos_end)})
+        start += step
+    return folds
+
+
+class WalkForward:
+    """
+    Walk-forward optimization on top of the parameter sweep.
+
+    evaluate(params, full_df, (first, stop)) must be a module-level function that
+    computes indicators over the full series (cached per worker) and simulates only
+    rows [first, stop). It returns a dict with at least 'roi', 'wr', 'trades' and,
+    when params['_equity'] is set, 'equity' (balance per bar), 'time' and 'start_balance'.
+
+    1. Every config runs on every in-sample fold in parallel.
+    2. The best config per fold (by `score`, with at least `min_trades`) runs on the
+       following out-of-sample fold, again in parallel.
+    3. Out-of-sample equity is stitched by compounding each fold's return.
+       This assumes position size scales with balance (as ResearchRunner's 5% risk does).
+    """
+    def __init__(self, evaluate, in_sample_days=60, out_of_sample_days=20, step_days=None,
+                 score="roi", min_trades=5, workers=None, progress=True):
+        self.evaluate = evaluate
+        self.in_sample_days = in_sample_days
+        self.out_of_sample_days = out_of_sample_days
+        self.step_days = step_days
+        self.score = score
+        self.min_trades = min_trades
+        self.sweep = ParameterSweep(evaluate, workers=workers, progress=progress, full_history=True)
+
+    def run(self, configs, df, start_balance=1000):
+        folds = make_folds(df['time'].to_numpy(), self.in_sample_days, self.out_of_sample_days, self.step_days)
+        if not folds:
+            return {"folds": [], "equity": np.array([]), "time": np.array([]), "final_balance": start_balance, "roi": 0.0}
+
+        # 1. In-sample optimization, every (config, fold) pair in the pool
+        best = {}
+        windows = {k: fold["is"] for k, fold in enumerate(folds)}
+        for params, k, res in self.sweep.run(configs, df, windows=windows):
+            if res['trades'] < self.min_trades:
+                continue
+            if k not in best or res[self.score] > best[k][1][self.score]:
+                best[k] = (params, res)
+
+        # 2. Out-of-sample run of each fold's winner
+        tasks = [({**params, '_equity': True}, k, folds[k]["oos"]) for k, (params, _) in best.items()]
+        oos = {k: res for _, k, res in self.sweep.run_tasks(tasks, df)}
+
+        # 3. Stitch: each fold starts from the balance the previous fold ended with
+        balance = float(start_balance)
+        equity_parts, time_parts, report = [], [], []
+        for k, fold in enumerate(folds):
+            if k not in oos:
+                report.append({"fold": k, "is": fold["is"], "oos": fold["oos"], "params": None})
+                continue
+            params, is_res = best[k]
+            res = oos[k]
+            scale = balance / res['start_balance']
+            equity_parts.append(np.asarray(res['equity']) * scale)
+            time_parts.append(np.asarray(res['time']))
+            balance = float(equity_parts[-1][-1]) if len(equity_parts[-1]) else balance
+            report.append({
+                "fold": k,
+                "is": fold["is"],
+                "oos": fold["oos"],
+                "params": params,
+                "in_sample": {m: is_res[m] for m in ("roi", "wr", "trades")},
+                "out_of_sample": {m: res[m] for m in ("roi", "wr", "trades")},
+            })
+
+        return {
+            "folds": report,
+            "equity": np.concatenate(equity_parts) if equity_parts else np.array([]),
+            "time": np.concatenate(time_parts) if time_parts else np.array([]),
+            "final_balance": balance,
+            "roi": (balance - start_balance) / start_balance * 100,
+        }
@@ -3,6 +3,7 @@ import pandas as pd
 import datetime
 from backend.database import db
 from backend.backtest_engine import BacktestEngine
+from backend.indicator_cache import indicator_cache
 from strategy.BitcoinBreakout.bitcoin_breakout import BitcoinBreakout
 from tabulate import tabulate
 
@@ -95,6 +96,7 @@ async def run_report():
         f.write(final_report)
     
     print(f"Report saved to {REPORT_FILE}")
+    print(f"Indicator cache: {indicator_cache.stats()}")
 
 if __name__ == "__main__":
     asyncio.run(run_report())
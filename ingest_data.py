@@ -2,6 +2,7 @@
 import sys
 import os
 import requests
+import time
 import asyncio
 from datetime import datetime, timedelta
 import pandas as pd
@@ -11,6 +12,8 @@ sys.path.append(os.getcwd())
 
 from backend.database import db
 from backend.config import settings
+from backend.candle_codec import CONTENT_TYPE, decode
+from backend.candle_store import to_block
 
 # Configuration
 SYMBOLS = ["XAUUSD", "EURUSD", "GBPUSD", "BITCOIN", "ETHEREUM", "DOGECOIN"] 
@@ -39,76 +42,55 @@ TIMEFRAMES = ["1m", "5m", "15m", "1h", "4h"]
 # Agent URL
 AGENT_URL = settings.AGENT_URL
 
-def calculate_n_candles(timeframe, years=2):
-    minutes_map = {
-        "1m": 1,
-        "5m": 5,
-        "15m": 15,
-        "45m": 45,
-        "1h": 60,
-        "4h": 240,
-        "D1": 1440
-    }
-    
-    tf_min = minutes_map.get(timeframe, 60)
-    
-    # Total minutes in 2 years
-    total_minutes = years * 365 * 24 * 60
-    
-    # Required candles
-    n = int(total_minutes / tf_min)
-    
-    # Buffer
-    n = int(n * 1.1)
-    # Cap at 100,000 initial attempt
-    return min(n, 100000)
+# Bars per agent page (the agent caps pages at 50,000)
+PAGE_BARS = 20000
+YEARS = 2
+
+def fetch_page(symbol, tf, start, end):
+    """One page of bars from `start`: ((6, n) block, next page's `from` or None)."""
+    response = requests.get(
+        f"{AGENT_URL}/data/{symbol}/{tf}",
+        params={"from": start, "to": end, "limit": PAGE_BARS},
+        # Columnar binary (decoded straight into NumPy); older agents answer JSON
+        headers={"Accept": f"{CONTENT_TYPE}, application/json;q=0.5"},
+        timeout=60,
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Status: {response.status_code} - {response.text[:50]}")
+    if response.headers.get("content-type", "").startswith(CONTENT_TYPE):
+        data = decode(response.content)
+    else:
+        data = to_block(response.json())
+    cursor = response.headers.get("X-Next-Cursor")
+    return data, int(cursor) if cursor else None
 
 def ingest():
     print(f"Starting Bulk Ingestion from {AGENT_URL}...")
     
-    if not db.conn:
-        db.connect()
+    db.connect()
+    end = int(time.time()) + 86400 # Bar times are server time, which can be ahead of UTC
+    start = end - YEARS * 365 * 86400
         
     for symbol in TARGETS:
         print(f"--- Processing {symbol} ---")
         for tf in TIMEFRAMES:
-            n = calculate_n_candles(tf)
-            
-            # Undo lowercase for display if preferred, but for logic keep strict
-            
-            success = False
-            attempts = 0
-            while not success and n >= 1000 and attempts < 5:
-                print(f"Fetching {tf} (~{n} candles)...", end=" ", flush=True)
-                
-                try:
-                    url = f"{AGENT_URL}/data/{symbol}/{tf}?n={n}"
-                    response = requests.get(url, timeout=120) 
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data:
-                            db.save_candles(symbol, tf, data)
-                            print(f"Success! Saved {len(data)} candles.")
-                            success = True
-                        else:
-                            print("Empty data.")
-                            break # Don't retry if clean empty
-                    elif response.status_code == 404:
-                         print("404 (Likely too many candles). Retrying with half...")
-                         n = int(n / 2)
-                         attempts += 1
-                    else:
-                        print(f"Failed. Status: {response.status_code} - {response.text[:50]}")
-                        break # Other errors, stop
-                        
-                except Exception as e:
-                    print(f"Error: {e}")
-                    break
+            # Resume after the newest stored bar when the stored history already reaches back to the start
+            cursor = start
+            stats = db.get_candle_stats(symbol, tf, start, end)
+            if stats and stats[1] - start < 7 * 86400:
+                cursor = stats[2]
+            print(f"Fetching {tf} from {datetime.utcfromtimestamp(cursor):%Y-%m-%d}...", end=" ", flush=True)
             
-                except Exception as e:
-                    print(f"Error: {e}")
-                    break
+            saved = 0
+            try:
+                while cursor is not None:
+                    data, cursor = fetch_page(symbol, tf, cursor, end)
+                    if data.shape[1]:
+                        db.save_candles(symbol, tf, data)
+                        saved += data.shape[1]
+                print(f"Success! Saved {saved} candles.")
+            except Exception as e:
+                print(f"Error after {saved} candles: {e}")
 
 if __name__ == "__main__":
     ingest()
@@ -8,33 +8,40 @@ import numpy as np
 
 sys.path.append(os.getcwd())
 from backend.backtest_engine import BacktestEngine
+from backend.sweep import ParameterSweep
+from backend.walk_forward import WalkForward
+from backend.indicator_cache import indicator_cache
 
 class UniversalStrategy:
     def __init__(self, params):
         self.params = params
         
     def calculate_indicators(self, df):
+        # Indicators go through the shared cache: configs that only differ in
+        # thresholds (rsi_oversold, adx_min, ...) reuse the same series.
+        ic = indicator_cache
+        
         # Common Indicators
         if self.params.get('use_ema_trend', True):
-            df['ema_trend'] = ta.ema(df['close'], length=self.params['trend_ema'])
+            df['ema_trend'] = ic.compute('ema', df['close'], length=self.params['trend_ema'])
             
-        df['atr'] = ta.atr(df['high'], df['low'], df['close'], length=14)
-        df['adx'] = ta.adx(df['high'], df['low'], df['close'], length=14)['ADX_14']
+        df['atr'] = ic.compute('atr', df['high'], df['low'], df['close'], length=14)
+        df['adx'] = ic.compute('adx', df['high'], df['low'], df['close'], length=14)['ADX_14']
         
         # Strategy Specific
         stype = self.params['type']
         
         if stype == 'rsi_pullback':
-            df['rsi'] = ta.rsi(df['close'], length=14)
+            df['rsi'] = ic.compute('rsi', df['close'], length=14)
             
         elif stype == 'bb_reversion':
-            bb = ta.bbands(df['close'], length=20, std=2)
+            bb = ic.compute('bbands', df['close'], length=20, std=2)
             df['bb_lower'] = bb.iloc[:, 0]
             df['bb_upper'] = bb.iloc[:, 2]
-            df['rsi'] = ta.rsi(df['close'], length=14) # Filter
+            df['rsi'] = ic.compute('rsi', df['close'], length=14) # Filter
             
         elif stype == 'stoch_rsi':
-            stoch = ta.stochrsi(df['close'], length=14, rsi_length=14, k=3, d=3)
+            stoch = ic.compute('stochrsi', df['close'], length=14, rsi_length=14, k=3, d=3)
             df['stoch_k'] = stoch.iloc[:, 0]
             df['stoch_d'] = stoch.iloc[:, 1]
             
@@ -101,17 +108,28 @@ class ResearchRunner(BacktestEngine):
     def run_simulation(self, strategy_params, df):
         if df.empty: return {'wr': 0, 'roi': 0, 'trades': 0}
         
-        balance = 1000
+        strat = UniversalStrategy(strategy_params)
+        df = strat.calculate_indicators(df.copy())
+        
+        return self.simulate_prepared(strategy_params, df)
+
+    def simulate_prepared(self, strategy_params, df, warmup=200, start_balance=1000, equity=False):
+        """
+        Runs the simulation on a frame that already has its indicator columns.
+        Walk-forward folds pass slices of a full-history frame with a small warmup.
+        equity=True also returns the balance after every simulated bar.
+        """
+        balance = start_balance
         trades = []
         position = None
+        equity_curve = []
         
         strat = UniversalStrategy(strategy_params)
-        df = strat.calculate_indicators(df.copy())
         
         # Determine strictness of RR
         rr = strategy_params.get('rr', 2.0)
         
-        for i in range(200, len(df)):
+        for i in range(warmup, len(df)):
             curr = df.iloc[i]
             window = df.iloc[:i+1]
             
@@ -139,6 +157,9 @@ class ResearchRunner(BacktestEngine):
                          trades.append({'pnl': pnl, 'res': 'win'})
                          position = None
             
+            # Balance only changes on exits, so this is the bar's closing equity
+            if equity: equity_curve.append(balance)
+            
             if not position:
                 sig = strat.get_signal(window)
                 if sig:
@@ -165,9 +186,37 @@ class ResearchRunner(BacktestEngine):
         wins = len([t for t in trades if t['pnl'] > 0])
         total = len(trades)
         wr = (wins / total * 100) if total > 0 else 0
-        roi = ((balance - 1000) / 1000) * 100
+        roi = ((balance - start_balance) / start_balance) * 100
         
-        return {'wr': wr, 'roi': roi, 'trades': total}
+        result = {'wr': wr, 'roi': roi, 'trades': total}
+        if equity:
+            result.update({
+                'equity': np.array(equity_curve),
+                'time': df['time'].to_numpy()[warmup:warmup + len(equity_curve)],
+                'start_balance': start_balance,
+            })
+        return result
+
+def evaluate_config(params, df):
+    """Sweep worker entry point (module-level so the process pool can pickle it)."""
+    return ResearchRunner(None).run_simulation(params, df)
+
+def evaluate_fold(params, df, bounds):
+    """
+    Walk-forward worker entry point. Indicators are computed over the full history
+    (identical series come from the worker's indicator cache on later folds) and
+    only rows [first, stop) are simulated.
+    """
+    strat = UniversalStrategy(params)
+    full = strat.calculate_indicators(df.copy())
+    first, stop = bounds
+    # Keep two bars before the fold so get_signal's iloc[-2]/iloc[-3] stay inside it
+    begin = max(first - 2, 0)
+    lead = max(first - begin, 2)
+    fold = full.iloc[begin:stop].reset_index(drop=True)
+    if len(fold) <= lead:
+        return {'wr': 0, 'roi': 0, 'trades': 0, 'equity': np.array([]), 'time': np.array([]), 'start_balance': 1000}
+    return ResearchRunner(None).simulate_prepared(params, fold, warmup=lead, equity=params.get('_equity', False))
 
 async def main():
     engine = ResearchRunner("http://localhost:8001")
@@ -226,26 +275,44 @@ async def main():
             configs.append({'type': 'breakout', 'trend_ema': ema, 'breakout_period': period, 'adx_min': 25, 'sl_atr': 1.5, 'rr': 2.0, 'use_ema_trend': True})
 
     # Run Optimization
+    # Configs fan out over a process pool; candles are shared once via shared memory
+    # and each task only carries its params plus the window start.
+    sweep = ParameterSweep(evaluate_config)
+    candles = df_200.reset_index(drop=True)
+    window_start = {
+        '30d': int(limit_30.timestamp()),
+        '100d': int(limit_100.timestamp()),
+        '200d': None,
+    }
+    
+    if '--walk-forward' in sys.argv:
+        run_walk_forward(configs, candles)
+        return
     
     print("\n--- Phase 1: Screening on 30 Days (Target: >5 trades, >35% WR) ---")
     
+    config_index = {id(cfg): i for i, cfg in enumerate(configs)}
     shortlist = []
-    for i, cfg in enumerate(configs):
-        res = engine.run_simulation(cfg, df_30)
+    for cfg, _, res in sweep.run(configs, candles, windows={'30d': window_start['30d']}):
         # Criteria: Trades > 5, WR > 35% (Minimal baseline)
         if res['trades'] >= 5 and res['wr'] > 35:
             cfg.update(res) # Store 30d results
             shortlist.append(cfg)
-            print(f"[{i}] Pass: {cfg['type']} | WR: {res['wr']:.1f}% | Trades: {res['trades']} | ROI: {res['roi']:.1f}%")
+            print(f"[{config_index[id(cfg)]}] Pass: {cfg['type']} | WR: {res['wr']:.1f}% | Trades: {res['trades']} | ROI: {res['roi']:.1f}%")
             
     print(f"\nShortlisted {len(shortlist)} configs. Running full validation (100d, 200d)...")
     
+    # Params only (drop the 30d stats); results are matched back by shortlist index
+    clean = [{k:v for k,v in cfg.items() if k not in ['wr', 'roi', 'trades']} for cfg in shortlist]
+    clean_index = {id(params): i for i, params in enumerate(clean)}
+    validation = {}
+    for params, window, res in sweep.run(clean, candles, windows={'100d': window_start['100d'], '200d': None}):
+        validation[(clean_index[id(params)], window)] = res
+    
     final_results = []
-    for cfg in shortlist:
-        # Test 100d
-        res_100 = engine.run_simulation(cfg, df_100)
-        # Test 200d
-        res_200 = engine.run_simulation(cfg, df_200)
+    for idx, cfg in enumerate(shortlist):
+        res_100 = validation[(idx, '100d')]
+        res_200 = validation[(idx, '200d')]
         
         # Aggregated Score?
         # User wants > 85% WR. 
@@ -273,6 +340,30 @@ async def main():
         print(f"30d : WR={r['30d']['wr']:.1f}% Trades={r['30d']['trades']} ROI={r['30d']['roi']:.1f}%")
         print(f"100d: WR={r['100d']['wr']:.1f}% Trades={r['100d']['trades']} ROI={r['100d']['roi']:.1f}%")
         print(f"200d: WR={r['200d']['wr']:.1f}% Trades={r['200d']['trades']} ROI={r['200d']['roi']:.1f}%")
+    
+    print(f"\nIndicator cache (validation pass): {sweep.cache_stats()}")
+
+def run_walk_forward(configs, candles):
+    """
+    Rolling walk-forward: optimize on 60 days, trade the winner on the next 20,
+    slide by 20 days. Only the stitched out-of-sample curve is reported as performance.
+    """
+    wf = WalkForward(evaluate_fold, in_sample_days=60, out_of_sample_days=20, min_trades=5)
+    print(f"\n--- Walk-Forward: {wf.in_sample_days}d in-sample / {wf.out_of_sample_days}d out-of-sample ---")
+    
+    report = wf.run(configs, candles)
+    for fold in report['folds']:
+        oos_start = pd.to_datetime(fold['oos'][0], unit='s').date()
+        if fold['params'] is None:
+            print(f"Fold {fold['fold']} (OOS from {oos_start}): no config with enough trades")
+            continue
+        is_res, oos_res = fold['in_sample'], fold['out_of_sample']
+        print(f"Fold {fold['fold']} (OOS from {oos_start}): {fold['params']['type']} {fold['params']}")
+        print(f"   IS : WR={is_res['wr']:.1f}% Trades={is_res['trades']} ROI={is_res['roi']:.1f}%")
+        print(f"   OOS: WR={oos_res['wr']:.1f}% Trades={oos_res['trades']} ROI={oos_res['roi']:.1f}%")
+    
+    print(f"\nStitched OOS: Final Balance={report['final_balance']:.2f} ROI={report['roi']:.1f}%")
+    print(f"Indicator cache (walk-forward): {wf.sweep.cache_stats()}")
 
 if __name__ == "__main__":
     try:
@@ -1,5 +1,6 @@
 import pandas_ta as ta
 import pandas as pd
+import numpy as np
 
 class BitcoinBreakout:
     def __init__(self):
@@ -38,6 +39,16 @@ class BitcoinBreakout:
         
         return df_current
 
+    def streaming_indicators(self):
+        """calculate_indicators() columns for the live engine: column -> (indicator, params, output[, lag])."""
+        return {
+            'high_n': ('donchian', {'length': self.breakout_period}, 'upper', 1),
+            'low_n': ('donchian', {'length': self.breakout_period}, 'lower', 1),
+            'ema_trend': ('ema', {'length': self.ema_length}, 'ema'),
+            'adx': ('adx', {'length': 14}, 'adx'),
+            'atr': ('atr', {'length': 14}, 'atr'),
+        }
+
     def get_signal(self, window):
         """
         Returns 'long', 'short', or None.
@@ -105,3 +116,35 @@ class BitcoinBreakout:
             if curr['close'] > curr['ema_trend']: return True
             
         return False
+
+    def generate_signals(self, df):
+        """
+        Vectorized get_signal / get_exit_signal over a full indicator frame.
+        entry[i] matches get_signal(df.iloc[:i+1]) (decided on closed candle i-1),
+        exit_long[i] / exit_short[i] match get_exit_signal(df.iloc[:i+1], side).
+        entry: 1 = long, -1 = short, 0 = none. sl/tp: get_entry_params levels per bar.
+        """
+        close = df['close'].to_numpy(dtype=float)
+        ema = df['ema_trend'].to_numpy(dtype=float)
+        strong = df['adx'].to_numpy(dtype=float) > self.adx_min
+
+        long_cond = (close > ema) & strong & (close > df['high_n'].to_numpy(dtype=float))
+        short_cond = (close < ema) & strong & (close < df['low_n'].to_numpy(dtype=float))
+        raw = np.where(long_cond, 1, np.where(short_cond, -1, 0))
+
+        # Shift by one bar: the signal at bar i comes from the closed candle (iloc[-2])
+        entry = np.zeros(len(df), dtype=np.int8)
+        entry[1:] = raw[:-1]
+
+        # get_entry_params on the entry bar, for every bar at once
+        dist = df['atr'].to_numpy(dtype=float) * self.sl_atr_mult
+        sl = np.where(entry == 1, close - dist, close + dist)
+        tp = np.where(entry == 1, close + (dist * self.rr_ratio), close - (dist * self.rr_ratio))
+
+        return {
+            "entry": entry,
+            "sl": sl,
+            "tp": tp,
+            "exit_long": close < ema,
+            "exit_short": close > ema,
+        }
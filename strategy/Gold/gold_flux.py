@@ -1,5 +1,6 @@
 import pandas_ta as ta
 import pandas as pd
+import numpy as np
 
 class GoldFlux:
     def __init__(self):
@@ -27,6 +28,7 @@ class GoldFlux:
         
         # 2. Trend
         df_current['ema_trend'] = ta.ema(df_current['close'], length=self.ema_length)
+        df_current['ema_fast'] = ta.ema(df_current['close'], length=50) # Exit line
         
         # 3. Filter
         adx = ta.adx(df_current['high'], df_current['low'], df_current['close'], length=14)
@@ -37,6 +39,17 @@ class GoldFlux:
         
         return df_current
 
+    def streaming_indicators(self):
+        """calculate_indicators() columns for the live engine: column -> (indicator, params, output[, lag])."""
+        return {
+            'high_n': ('donchian', {'length': self.breakout_period}, 'upper', 1),
+            'low_n': ('donchian', {'length': self.breakout_period}, 'lower', 1),
+            'ema_trend': ('ema', {'length': self.ema_length}, 'ema'),
+            'ema_fast': ('ema', {'length': 50}, 'ema'),
+            'adx': ('adx', {'length': 14}, 'adx'),
+            'atr': ('atr', {'length': 14}, 'atr'),
+        }
+
     def get_signal(self, window):
         """
         Scalp Entry Logic
@@ -87,11 +100,41 @@ class GoldFlux:
         
         if position_type == 'long':
             # Exit if price falls below EMA 50 (Faster exit than 200)
-            ema_fast = ta.ema(df['close'], length=50).iloc[-1]
-            if curr['close'] < ema_fast: return True
+            if curr['close'] < curr['ema_fast']: return True
             
         elif position_type == 'short':
-            ema_fast = ta.ema(df['close'], length=50).iloc[-1]
-            if curr['close'] > ema_fast: return True
+            if curr['close'] > curr['ema_fast']: return True
             
         return False
+
+    def generate_signals(self, df):
+        """
+        Vectorized get_signal / get_exit_signal over a full indicator frame.
+        entry[i] matches get_signal(df.iloc[:i+1]) (closed candle i-1),
+        exit arrays match get_exit_signal(df.iloc[:i+1], side).
+        """
+        close = df['close'].to_numpy(dtype=float)
+        ema = df['ema_trend'].to_numpy(dtype=float)
+        strong = df['adx'].to_numpy(dtype=float) > self.adx_min
+
+        long_cond = (close > ema) & strong & (close > df['high_n'].to_numpy(dtype=float))
+        short_cond = (close < ema) & strong & (close < df['low_n'].to_numpy(dtype=float))
+        raw = np.where(long_cond, 1, np.where(short_cond, -1, 0))
+
+        entry = np.zeros(len(df), dtype=np.int8)
+        entry[1:] = raw[:-1]
+
+        # get_entry_params on the entry bar, for every bar at once
+        dist = df['atr'].to_numpy(dtype=float) * self.sl_atr_mult
+        sl = np.where(entry == 1, close - dist, close + dist)
+        tp = np.where(entry == 1, close + (dist * self.rr_ratio), close - (dist * self.rr_ratio))
+
+        ema_fast = df['ema_fast'].to_numpy(dtype=float)
+
+        return {
+            "entry": entry,
+            "sl": sl,
+            "tp": tp,
+            "exit_long": close < ema_fast,
+            "exit_short": close > ema_fast,
+        }
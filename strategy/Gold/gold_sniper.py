@@ -1,5 +1,6 @@
 import pandas_ta as ta
 import pandas as pd
+import numpy as np
 
 class GoldSniper:
     def __init__(self, time_period=20, rsi_period=2, rsi_lower=5, rsi_upper=95, bb_std=2.0, use_bands=False):
@@ -38,6 +39,17 @@ class GoldSniper:
         
         return df
 
+    def streaming_indicators(self):
+        """calculate_indicators() columns for the live engine: column -> (indicator, params, output[, lag])."""
+        bb = {'length': self.bb_length, 'std': self.bb_std}
+        return {
+            'bbl': ('bbands', bb, 'lower'),
+            'bbm': ('bbands', bb, 'mid'),
+            'bbu': ('bbands', bb, 'upper'),
+            'rsi': ('rsi', {'length': self.rsi_length}, 'rsi'),
+            'atr': ('atr', {'length': 14}, 'atr'),
+        }
+
     def get_signal(self, window):
         if window is None or window.empty: return None
         curr = window.iloc[-2] # Closed Candle
@@ -91,3 +103,39 @@ class GoldSniper:
             if curr['rsi'] < 50: return True
             
         return False
+
+    def generate_signals(self, df):
+        """
+        Vectorized get_signal / get_exit_signal over a full indicator frame.
+        entry[i] matches get_signal(df.iloc[:i+1]) (closed candle i-1),
+        exit arrays match get_exit_signal(df.iloc[:i+1], side).
+        """
+        rsi = df['rsi'].to_numpy(dtype=float)
+
+        long_cond = rsi < self.rsi_low
+        short_cond = rsi > self.rsi_high
+
+        if self.use_bands and 'bbl' in df.columns:
+            long_cond = long_cond & (df['low'].to_numpy(dtype=float) < df['bbl'].to_numpy(dtype=float))
+            short_cond = short_cond & (df['high'].to_numpy(dtype=float) > df['bbu'].to_numpy(dtype=float))
+
+        raw = np.where(long_cond, 1, np.where(short_cond, -1, 0))
+
+        entry = np.zeros(len(df), dtype=np.int8)
+        entry[1:] = raw[:-1]
+
+        # get_entry_params on the entry bar, for every bar at once
+        close = df['close'].to_numpy(dtype=float)
+        atr = df['atr'].to_numpy(dtype=float)
+        sl_dist = atr * self.sl_atr_mult
+        tp_dist = atr * self.tp_atr_mult
+        sl = np.where(entry == 1, close - sl_dist, close + sl_dist)
+        tp = np.where(entry == 1, close + tp_dist, close - tp_dist)
+
+        return {
+            "entry": entry,
+            "sl": sl,
+            "tp": tp,
+            "exit_long": rsi > 50,
+            "exit_short": rsi < 50,
+        }
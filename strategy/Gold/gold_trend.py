@@ -1,5 +1,6 @@
 import pandas_ta as ta
 import pandas as pd
+import numpy as np
 
 class GoldTrend:
     def __init__(self):
@@ -31,6 +32,15 @@ class GoldTrend:
         
         return df_current
 
+    def streaming_indicators(self):
+        """calculate_indicators() columns for the live engine: column -> (indicator, params, output[, lag])."""
+        return {
+            'ema_50': ('ema', {'length': self.ema_short}, 'ema'),
+            'ema_200': ('ema', {'length': self.ema_long}, 'ema'),
+            'rsi': ('rsi', {'length': 14}, 'rsi'),
+            'atr': ('atr', {'length': 14}, 'atr'),
+        }
+
     def get_signal(self, window):
         """
         Swing Entry: Trend Follow Pullback
@@ -88,3 +98,36 @@ class GoldTrend:
              if curr['close'] > curr['ema_200']: return True
              
         return False
+
+    def generate_signals(self, df):
+        """
+        Vectorized get_signal / get_exit_signal over a full indicator frame.
+        entry[i] matches get_signal(df.iloc[:i+1]) (closed candle i-1),
+        exit arrays match get_exit_signal(df.iloc[:i+1], side).
+        """
+        close = df['close'].to_numpy(dtype=float)
+        ema_50 = df['ema_50'].to_numpy(dtype=float)
+        ema_200 = df['ema_200'].to_numpy(dtype=float)
+        rsi = df['rsi'].to_numpy(dtype=float)
+
+        uptrend = (ema_50 > ema_200) & (close > ema_200)
+        downtrend = (ema_50 < ema_200) & (close < ema_200)
+
+        raw = np.where(uptrend & (rsi < self.rsi_buy), 1,
+                       np.where(downtrend & (rsi > self.rsi_sell), -1, 0))
+
+        entry = np.zeros(len(df), dtype=np.int8)
+        entry[1:] = raw[:-1]
+
+        # get_entry_params on the entry bar, for every bar at once
+        dist = df['atr'].to_numpy(dtype=float) * self.sl_atr_mult
+        sl = np.where(entry == 1, close - dist, close + dist)
+        tp = np.where(entry == 1, close + (dist * self.rr_ratio), close - (dist * self.rr_ratio))
+
+        return {
+            "entry": entry,
+            "sl": sl,
+            "tp": tp,
+            "exit_long": close < ema_200,
+            "exit_short": close > ema_200,
+        }
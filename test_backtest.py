@@ -16,8 +16,7 @@ from strategy.DEMASuTBB.demasutbb_5m import DEMASuTBBStrategy5m
 async def run_test():
     print("--- Starting Manual Backtest Verification ---")
     
-    if not db.conn:
-        db.connect()
+    db.connect()
         
     engine = BacktestEngine(agent_url="http://dummy") # URL not used for DB fetch
     
@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+from aiohttp import web
+from backend.account_state import AccountState
+from backend.agent_client import AgentClient
+
+class TestAccountState(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = 0
+        self.down = False
+
+        async def account(request):
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            if self.down:
+                return web.Response(status=503, text="MT5 not connected")
+            return web.json_response({"balance": 1000.0 + self.calls, "equity": 990.0, "margin": 5.0})
+
+        app = web.Application()
+        app.router.add_get('/account', account)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.agent = AgentClient(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}", retries=0)
+
+    async def asyncTearDown(self):
+        await self.agent.close()
+        await self.runner.cleanup()
+
+    async def test_snapshot_shared_until_stale(self):
+        state = AccountState(self.agent, max_age=5)
+        results = await asyncio.gather(state.refresh(), state.get(), state.get())
+        # One poll in flight serves every reader
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(r["balance"] == 1001.0 for r in results))
+        self.assertTrue(state.is_fresh())
+
+        self.assertEqual((await state.get())["balance"], 1001.0)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual((await state.get(fresh=True))["balance"], 1002.0)
+        self.assertEqual(self.calls, 2)
+
+        state.fetched_at -= 10
+        self.assertFalse(state.is_fresh())
+        self.assertEqual((await state.get())["balance"], 1003.0)
+
+    async def test_agent_down_keeps_last_snapshot(self):
+        state = AccountState(self.agent, max_age=5)
+        await state.refresh()
+        self.down = True
+        self.assertIsNone(await state.refresh())
+        self.assertFalse(state.is_fresh())
+        self.assertIn("503", state.error)
+        # Sizing still sees the last known balance
+        self.assertEqual((await state.get())["balance"], 1001.0)
+        self.assertFalse(state.to_dict()["connected"])
+        # A forced read that fails does not pass the old balance off as fresh
+        self.assertIsNone(await state.get(fresh=True))
+
+        self.assertIsNone(await AccountState(max_age=5).get())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import unittest
+from aiohttp import web
+import time
+import base64
+import asyncio
+import numpy as np
+from backend.agent_client import AgentClient, AgentError, TokenBucket
+from backend.candle_codec import CONTENT_TYPE, encode_block
+
+class TestAgentClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.failures = 0
+        self.calls = {}
+        self.peers = set()
+
+        def count(request):
+            self.peers.add(request.transport.get_extra_info('peername'))
+            self.calls[request.path] = self.calls.get(request.path, 0) + 1
+
+        async def account(request):
+            count(request)
+            if self.failures:
+                self.failures -= 1
+                return web.Response(status=503, text="busy")
+            return web.json_response({"balance": 1000.0})
+
+        async def trade(request):
+            count(request)
+            return web.Response(status=500, text="rejected")
+
+        async def missing(request):
+            count(request)
+            return web.Response(status=404, text="No data for XYZ")
+
+        app = web.Application()
+        app.router.add_get('/account', account)
+        app.router.add_post('/trade', trade)
+        app.router.add_get('/data/XYZ/5m', missing)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.agent = AgentClient(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}", retries=2, backoff=0.01)
+
+    async def asyncTearDown(self):
+        await self.agent.close()
+        await self.runner.cleanup()
+
+    async def test_keep_alive_and_retries(self):
+        for _ in range(5):
+            self.assertEqual(await self.agent.get("/account"), {"balance": 1000.0})
+        # Every request went over the same pooled connection
+        self.assertEqual(len(self.peers), 1)
+
+        self.failures = 2
+        self.assertEqual(await self.agent.get("/account"), {"balance": 1000.0})
+        stats = self.agent.stats()["account"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["retries"]), (6, 2, 2))
+        self.assertIsNotNone(stats["latency_ms"]["p95"])
+
+    async def test_no_retry_for_orders_and_client_errors(self):
+        with self.assertRaises(AgentError) as ctx:
+            await self.agent.post("/trade", json={"symbol": "GOLD"})
+        self.assertEqual((ctx.exception.status, ctx.exception.detail), (500, "rejected"))
+        self.assertEqual(self.calls["/trade"], 1)
+
+        with self.assertRaises(AgentError) as ctx:
+            await self.agent.get("/data/XYZ/5m")
+        self.assertEqual(ctx.exception.status, 404)
+        self.assertEqual(self.calls["/data/XYZ/5m"], 1)
+
+    async def test_unreachable_agent(self):
+        agent = AgentClient("http://127.0.0.1:9", retries=1, backoff=0.01)
+        self.addAsyncCleanup(agent.close)
+        with self.assertRaises(AgentError) as ctx:
+            await agent.get("/account")
+        self.assertIsNone(ctx.exception.status)
+        self.assertEqual(agent.stats()["account"]["errors"], 2)
+
+class TestBatch(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bodies = []
+        self.paths = []
+        self.has_batch = True
+        self.garbled = False
+
+        async def batch(request):
+            if not self.has_batch:
+                # An agent from before /batch
+                return web.Response(status=404, text="Not Found")
+            body = await request.json()
+            self.bodies.append(body)
+            if self.garbled:
+                return web.json_response(["not", "a", "batch"])
+            candles = []
+            for q in body["candles"]:
+                if q["symbol"] == "XYZ":
+                    candles.append({"symbol": "XYZ", "timeframe": q["timeframe"], "status": 404, "error": "No data for XYZ"})
+                    continue
+                k = 3 if q["since"] is not None else q["n"]
+                if q["symbol"] == "BITCOIN" and body.get("candle_format") == CONTENT_TYPE:
+                    block = np.array([range(k), [1.0] * k, [2.0] * k, [0.5] * k, [1.5] * k, [7] * k], dtype=float)
+                    candles.append({"symbol": "BITCOIN", "timeframe": q["timeframe"], "data": base64.b64encode(encode_block(block)).decode()})
+                    continue
+                candles.append({"symbol": q["symbol"], "timeframe": q["timeframe"], "time": list(range(k)),
+                                "open": [1.0] * k, "high": [2.0] * k, "low": [0.5] * k, "close": [1.5] * k, "tick_volume": [7] * k})
+            out = {"candles": candles}
+            if body["account"]:
+                out["account"] = {"balance": 1000.0}
+            return web.json_response(out)
+
+        async def single(request):
+            self.paths.append(request.path)
+            if request.path == "/account":
+                return web.json_response({"balance": 5.0})
+            return web.json_response([{'time': 1, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'tick_volume': 1}])
+
+        app = web.Application()
+        app.router.add_post('/batch', batch)
+        app.router.add_get('/account', single)
+        app.router.add_get('/data/{symbol}/{timeframe}', single)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        self.agent = AgentClient(self.url, batch_window=0.01)
+
+    async def asyncTearDown(self):
+        await self.agent.close()
+        await self.runner.cleanup()
+
+    async def test_concurrent_reads_share_one_round_trip(self):
+        gold, btc, account, missing = await asyncio.gather(
+            self.agent.batched("candles", "GOLD", "5m", n=20),
+            self.agent.batched("candles", "BITCOIN", "1h", since=100),
+            self.agent.batched("account"),
+            self.agent.batched("candles", "XYZ", "5m"),
+            return_exceptions=True)
+
+        self.assertEqual(len(self.bodies), 1)
+        self.assertEqual(self.paths, [])
+        self.assertEqual((gold.shape, btc.shape), ((6, 20), (6, 3)))
+        self.assertEqual(gold[:, 0].tolist(), [0, 1.0, 2.0, 0.5, 1.5, 7])
+        # Columnar candles when the agent sends them, JSON columns otherwise
+        self.assertEqual(btc[:, 2].tolist(), [2, 1.0, 2.0, 0.5, 1.5, 7])
+        self.assertEqual(account, {"balance": 1000.0})
+        self.assertIsInstance(missing, AgentError)
+        self.assertEqual(missing.status, 404)
+
+        # The next read opens a new batch
+        await self.agent.batched("candles", "GOLD", "5m", since=5)
+        self.assertEqual(len(self.bodies), 2)
+        self.assertEqual(self.agent.stats()["batch"]["calls"], 2)
+
+    async def test_unreadable_answer_fails_every_read(self):
+        self.garbled = True
+        results = await asyncio.wait_for(asyncio.gather(
+            self.agent.batched("candles", "GOLD", "5m", n=20),
+            self.agent.batched("account"),
+            return_exceptions=True), 2)
+        self.assertTrue(all(isinstance(r, AgentError) and r.status == 502 for r in results))
+
+    async def test_falls_back_without_batch_endpoint(self):
+        self.has_batch = False
+        block, account = await asyncio.gather(self.agent.batched("candles", "GOLD", "5m", n=5), self.agent.batched("account"))
+        self.assertFalse(self.agent.batch_supported)
+        self.assertEqual(block.shape, (6, 1))
+        self.assertEqual(account, {"balance": 5.0})
+        self.assertEqual(sorted(self.paths), ["/account", "/data/GOLD/5m"])
+
+        # Not asked again
+        await self.agent.batched("account")
+        self.assertEqual(self.agent.stats()["batch"]["calls"], 0)
+        self.assertEqual(len(self.paths), 3)
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=50, burst=5)
+        started = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(15)])
+        # 5 go at once, the other 10 are spaced 20ms apart
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertAlmostEqual(bucket.waited, 0.2, delta=0.01)
+
+    async def test_unlimited(self):
+        bucket = TokenBucket(rate=0, burst=1)
+        await asyncio.gather(*[bucket.acquire() for _ in range(100)])
+        self.assertEqual(bucket.waited, 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
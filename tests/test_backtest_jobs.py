@@ -0,0 +1,134 @@
+import time
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+import numpy as np
+from backend.backtest_engine import BacktestEngine
+from backend.database import db
+from backend.result_cache import ResultCache
+from backend.backtest_jobs import BacktestJobQueue, QueueFull, DONE, CANCELLED, TIMEOUT
+from strategy.BitcoinBreakout.bitcoin_breakout import BitcoinBreakout
+
+class SlowBreakout(BitcoinBreakout):
+    """Module-level so the worker process can unpickle it."""
+    def calculate_indicators(self, df):
+        time.sleep(30)
+        return super().calculate_indicators(df)
+
+def make_candles(n=3000, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 40, n))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'time': 1_700_000_000 + np.arange(n) * 300,
+        'open': open_,
+        'high': np.maximum(open_, close) + rng.uniform(0, 30, n),
+        'low': np.minimum(open_, close) - rng.uniform(0, 30, n),
+        'close': close,
+        'tick_volume': rng.integers(1, 100, n),
+    })
+
+class TestBacktestJobs(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        df = make_candles()
+
+        async def get_data(engine, symbol, timeframe, start_ts, end_ts):
+            return df
+
+        self.df = df
+        patcher = mock.patch.object(BacktestEngine, 'get_data', get_data)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = BacktestJobQueue(workers=2, max_queued=3, timeout=10)
+        self.queue.start()
+
+    async def asyncTearDown(self):
+        await self.queue.stop()
+
+    async def submit(self, strategy_class):
+        return await self.queue.submit(strategy_class, "BITCOIN", "5m", 0, 0, 1000, None)
+
+    async def test_result_matches_inline_run(self):
+        job = await self.submit(BitcoinBreakout)
+        await asyncio.wait_for(job.done.wait(), 60)
+
+        self.assertEqual(job.status, DONE)
+        expected = BacktestEngine(None).run(BitcoinBreakout, self.df, start_balance=1000)
+        self.assertEqual(job.result['total_trades'], expected['total_trades'])
+        self.assertAlmostEqual(job.result['final_balance'], expected['final_balance'])
+
+    async def test_stream_rebuilds_result(self):
+        job = await self.queue.submit(BitcoinBreakout, "BITCOIN", "5m", 0, 0, 1000, None, stream=True)
+        events = job.subscribe()
+
+        trades, equity, pct = [], [], []
+        while True:
+            event = await asyncio.wait_for(events.get(), 60)
+            if event['type'] == 'trades': trades.extend(event['trades'])
+            elif event['type'] == 'equity': equity.extend(event['points'])
+            elif event['type'] == 'progress' and event['stage'] == 'simulating': pct.append(event['pct'])
+            elif event['type'] in ('done', 'error'): break
+
+        self.assertEqual(event['type'], 'done')
+        self.assertNotIn('trades', event['result'])
+        expected = BacktestEngine(None).run(BitcoinBreakout, self.df, start_balance=1000)
+        self.assertGreater(len(trades), 0)
+        self.assertEqual(trades, expected['trades'])
+        # Equity is downsampled with the price data step
+        step = max(1, len(self.df) // 2000)
+        self.assertEqual(equity, [{"time": int(p['time']), "equity": p['equity']} for p in expected['equity_curve'][::step]])
+        self.assertEqual(pct, sorted(pct))
+        self.assertEqual(pct[-1], 100.0)
+
+    async def test_repeat_request_served_from_cache(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.queue.cache = ResultCache(tmp.name)
+        stats = (len(self.df), int(self.df['time'].iloc[0]), int(self.df['time'].iloc[-1]), float(self.df['close'].sum()))
+        patcher = mock.patch.object(db, 'get_candle_stats', return_value=stats)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        first = await self.submit(BitcoinBreakout)
+        await asyncio.wait_for(first.done.wait(), 60)
+        self.assertFalse(first.cached)
+
+        again = await self.submit(BitcoinBreakout)
+        await asyncio.wait_for(again.done.wait(), 1)
+        self.assertTrue(again.cached)
+        self.assertEqual(again.result, first.result)
+
+        # A new candle in the range changes the key
+        db.get_candle_stats.return_value = (stats[0] + 1,) + stats[1:]
+        extended = await self.submit(BitcoinBreakout)
+        await asyncio.wait_for(extended.done.wait(), 60)
+        self.assertFalse(extended.cached)
+
+    async def test_cancel_timeout_and_full_queue(self):
+        self.queue.timeout = 3
+        slow = await self.submit(SlowBreakout)
+        queued = [await self.submit(BitcoinBreakout), await self.submit(BitcoinBreakout)]
+        # Nothing has been picked up yet, so the queue holds all three
+        with self.assertRaises(QueueFull):
+            await self.submit(BitcoinBreakout)
+
+        self.queue.cancel(queued[1].id)
+        self.assertEqual(queued[1].status, CANCELLED)
+        # Its slot frees up at once, not when a runner gets to it
+        queued.append(await self.submit(BitcoinBreakout))
+        with self.assertRaises(QueueFull):
+            await self.submit(BitcoinBreakout)
+
+        # The event loop stays responsive while the slow job runs
+        started = time.perf_counter()
+        await asyncio.sleep(0.5)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+        await asyncio.wait_for(asyncio.gather(slow.done.wait(), queued[0].done.wait()), 60)
+        self.assertEqual(slow.status, TIMEOUT)
+        self.assertEqual(queued[0].status, DONE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from backend.candle_buffer import CandleBuffer
+
+STEP = 300
+T0 = 1_700_000_100 // STEP * STEP
+
+def candle(k, close=None):
+    price = float(k) if close is None else close
+    return {'time': T0 + k * STEP, 'open': price, 'high': price + 1, 'low': price - 1, 'close': price, 'tick_volume': k}
+
+class TestCandleBuffer(unittest.TestCase):
+    def test_since_updates_replace_forming_bar(self):
+        buffer = CandleBuffer(capacity=5)
+        self.assertEqual(buffer.extend([candle(k) for k in range(3)]), 3)
+        self.assertEqual(buffer.last_time, T0 + 2 * STEP)
+
+        # A `since` fetch returns the bar that was forming (now closed) and the new one
+        self.assertEqual(buffer.extend([candle(2, close=2.5), candle(3)]), 1)
+        self.assertEqual([c['close'] for c in buffer.records()], [0.0, 1.0, 2.5, 3.0])
+
+        # Older bars and an empty answer change nothing
+        self.assertEqual(buffer.extend([candle(0, close=9.0)]), 0)
+        self.assertEqual(buffer.extend([]), 0)
+        self.assertEqual(buffer.size, 4)
+
+    def test_wraps_around(self):
+        buffer = CandleBuffer(capacity=5)
+        buffer.extend([candle(k) for k in range(4)])
+        for k in range(4, 12):
+            buffer.extend([candle(k - 1), candle(k)])
+        self.assertEqual(buffer.size, 5)
+        self.assertEqual([c['time'] for c in buffer.records()], [T0 + k * STEP for k in range(7, 12)])
+        self.assertEqual(buffer.records(2), [candle(10), candle(11)])
+
+        df = buffer.frame(3)
+        self.assertEqual(df['time'].tolist(), [T0 + k * STEP for k in range(9, 12)])
+        self.assertEqual(df['close'].tolist(), [9.0, 10.0, 11.0])
+
+        # More bars than fit: only the newest are kept
+        buffer.extend([candle(k) for k in range(12, 30)])
+        self.assertEqual([c['time'] for c in buffer.records()], [T0 + k * STEP for k in range(25, 30)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import unittest
+import numpy as np
+from aiohttp import web
+from backend.candle_codec import CONTENT_TYPE, CandleFormatError, encode_block, decode
+from backend.candle_store import to_block
+from backend.agent_client import AgentClient
+
+def make_block(n):
+    times = 1_700_000_100 + 300 * np.arange(n)
+    close = 2000 + np.cumsum(np.random.default_rng(1).normal(size=n))
+    return np.array([times, close - 0.5, close + 1.25, close - 1.5, close, np.arange(n) % 977], dtype=float)
+
+class TestCandleCodec(unittest.TestCase):
+    def test_round_trip(self):
+        block = make_block(1000)
+        payload = encode_block(block)
+        self.assertEqual(len(payload), 12 + 48 * 1000)
+        np.testing.assert_array_equal(decode(payload), block)
+        self.assertEqual(decode(encode_block(make_block(0))).shape, (6, 0))
+
+    def test_rejects_bad_payloads(self):
+        payload = encode_block(make_block(10))
+        for bad in (payload[:8], payload[:-8], b"JSON" + payload[4:]):
+            with self.assertRaises(CandleFormatError):
+                decode(bad)
+
+class TestAgentClientCandles(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.block = make_block(500)
+        self.binary = True
+        self.pages = []
+
+        async def data(request):
+            if 'from' in request.query:
+                # Paged like the agent: `limit` bar slots per page, X-Next-Cursor while more remain
+                start, end, limit = (int(request.query[k]) for k in ('from', 'to', 'limit'))
+                self.pages.append(start)
+                page_end = min(end, start + limit * 300 - 1)
+                block = self.block[:, (self.block[0] >= start) & (self.block[0] <= page_end)]
+                headers = {"X-Next-Cursor": str(page_end + 1)} if page_end < end else {}
+                return web.Response(body=encode_block(block), content_type=CONTENT_TYPE, headers=headers)
+            if self.binary and CONTENT_TYPE in request.headers.get("Accept", ""):
+                return web.Response(body=encode_block(self.block), content_type=CONTENT_TYPE)
+            records = [{'time': int(t), 'open': o, 'high': h, 'low': l, 'close': c, 'tick_volume': int(v)}
+                       for t, o, h, l, c, v in self.block.T.tolist()]
+            return web.json_response(records)
+
+        app = web.Application()
+        app.router.add_get('/data/{symbol}/{timeframe}', data)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.agent = AgentClient(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}")
+
+    async def asyncTearDown(self):
+        await self.agent.close()
+        await self.runner.cleanup()
+
+    async def test_binary_and_json_agents_give_the_same_block(self):
+        binary = await self.agent.get_candles("/data/GOLD/5m", params={"n": 500})
+        binary_bytes = self.agent.stats()["data"]["bytes"]
+        self.binary = False
+        legacy = await self.agent.get_candles("/data/GOLD/5m", params={"n": 500})
+        json_bytes = self.agent.stats()["data"]["bytes"] - binary_bytes
+
+        np.testing.assert_array_equal(binary, self.block)
+        np.testing.assert_array_equal(legacy, binary)
+        self.assertLess(binary_bytes * 2, json_bytes)
+
+    async def test_range_follows_cursor_pages(self):
+        start, end = int(self.block[0, 10]), int(self.block[0, 250])
+        block = await self.agent.get_candle_range("/data/GOLD/5m", start, end, limit=100)
+        np.testing.assert_array_equal(block, self.block[:, 10:251])
+        self.assertEqual(self.pages, [start, start + 100 * 300, start + 200 * 300])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from backend.candle_store import CandleStore, to_block, rows_to_block
+
+def candles(times, close=1.0):
+    return [{'time': t, 'open': close, 'high': close, 'low': close, 'close': close, 'tick_volume': 5} for t in times]
+
+class TestCandleStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_merge_sorts_and_replaces(self):
+        store = CandleStore(self.tmp.name)
+        store.merge("GOLD", "1m", to_block(candles([180, 60, 120])))
+        store.merge("GOLD", "1m", to_block(candles([120, 240], close=2.0)))
+
+        df = store.frame("GOLD", "1m", 0, 1000)
+        self.assertEqual(df['time'].tolist(), [60, 120, 180, 240])
+        self.assertEqual(df['close'].tolist(), [1.0, 2.0, 1.0, 2.0])
+        self.assertEqual(df['time'].dtype, np.int64)
+        self.assertEqual(store.times("GOLD", "1m", 100, 200).tolist(), [120, 180])
+        self.assertTrue(store.frame("GOLD", "1m", 300, 400).empty)
+
+    def test_file_tier_survives_restart(self):
+        CandleStore(self.tmp.name).merge("GOLD", "5m", rows_to_block([(300, 1, 2, 0.5, 1.5, 10), (600, 1.5, 2, 1, 1.8, 12)]))
+
+        fresh = CandleStore(self.tmp.name)
+        df = fresh.frame("GOLD", "5m", 0, 600)
+        self.assertEqual(df['close'].tolist(), [1.5, 1.8])
+        self.assertEqual(fresh.stats()['file_hits'], 1)
+        fresh.frame("GOLD", "5m", 0, 600)
+        self.assertEqual(fresh.stats()['memory_hits'], 1)
+
+    def test_concurrent_merges_keep_every_bar(self):
+        # Backtest jobs merge from executor threads; one series must not lose a write
+        store = CandleStore(self.tmp.name, max_bytes=0)
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda k: store.merge("GOLD", "1m", to_block(candles(range(k * 6000, (k + 1) * 6000, 60)))), range(16)))
+        self.assertEqual(CandleStore(self.tmp.name).times("GOLD", "1m", 0, 10**9).tolist(), list(range(0, 96000, 60)))
+
+    def test_memory_tier_is_bounded(self):
+        store = CandleStore(self.tmp.name, max_bytes=6 * 8 * 150)
+        store.merge("GOLD", "1m", to_block(candles(range(0, 6000, 60))))
+        store.merge("BITCOIN", "1m", to_block(candles(range(0, 6000, 60))))
+        self.assertEqual(store.stats()['series_in_memory'], 1)
+        # Evicted series still load from its file
+        self.assertEqual(len(store.frame("GOLD", "1m", 0, 6000)), 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from backend import database as database_module
+from backend.database import Database
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.alive = True
+        self.statements = []
+
+    def ping(self):
+        if not self.alive:
+            raise database_module.mariadb.Error("Server has gone away")
+
+    def reconnect(self):
+        self.alive = True
+
+    def cursor(self):
+        conn = self
+        class Cursor:
+            def execute(self, query, params=None):
+                conn.statements.append(query.split()[0])
+                if "SELECT COUNT" in query:
+                    self.row = (2, 100, 400, 3.0)
+            def executemany(self, query, data):
+                conn.statements.append(query.split()[0])
+            def fetchone(self):
+                return self.row
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        with self.pool.lock:
+            self.pool.idle.append(self)
+            self.pool.in_use -= 1
+
+class FakePool:
+    created = 0
+
+    def __init__(self, pool_size, **kw):
+        FakePool.created += 1
+        self.lock = threading.Lock()
+        self.idle = [FakeConnection(self) for _ in range(pool_size)]
+        self.in_use = 0
+        self.peak = 0
+
+    def get_connection(self):
+        with self.lock:
+            if not self.idle:
+                return None
+            self.in_use += 1
+            self.peak = max(self.peak, self.in_use)
+            return self.idle.pop()
+
+class TestPooledDatabase(unittest.TestCase):
+    def setUp(self):
+        FakePool.created = 0
+        patcher = mock.patch.object(database_module.mariadb, 'ConnectionPool', FakePool, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_connection_per_operation(self):
+        db = Database(pool_size=3)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: db.get_candle_stats("GOLD", "5m", 0, 500), range(40)))
+        self.assertEqual(results, [(2, 100, 400, 3.0)] * 40)
+        self.assertEqual(FakePool.created, 1)
+        # Every connection went back to the pool, and never more than pool_size were out
+        self.assertEqual((db.pool.in_use, len(db.pool.idle)), (0, 3))
+        self.assertLessEqual(db.pool.peak, 3)
+
+    def test_reconnect_dropped_connection(self):
+        db = Database(pool_size=1)
+        db.connect()
+        db.pool.idle[0].alive = False
+        db.log_trade("GOLD", "T", "long", 1.0, 0.1, "ORDER_SENT")
+        self.assertEqual(db.reconnects, 1)
+        self.assertEqual(db.pool.idle[0].statements[-1], "INSERT")
+        self.assertTrue(db.health()["connected"])
+
+    def test_unreachable_server_retried_later(self):
+        db = Database(retry_seconds=60)
+        with mock.patch.object(database_module.mariadb, 'ConnectionPool', side_effect=database_module.mariadb.Error("refused"), create=True) as pool:
+            self.assertEqual(db.get_candle_rows("GOLD", "5m", 0, 1), [])
+            self.assertIsNone(db.get_candle_stats("GOLD", "5m", 0, 1))
+            self.assertFalse(db.health()["connected"])
+        # One attempt; the others failed fast until retry_seconds pass
+        self.assertEqual(pool.call_count, 1)
+        self.assertIn("refused", db.last_error)
+
+if __name__ == '__main__':
+    unittest.main()
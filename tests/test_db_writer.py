@@ -0,0 +1,74 @@
+import time
+import asyncio
+import unittest
+from unittest import mock
+from backend import db_writer as db_writer_module
+from backend.db_writer import WriteBehindQueue
+
+def candles(times):
+    return [{'time': t, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'tick_volume': 1} for t in times]
+
+class TestWriteBehindQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = mock.Mock()
+        patcher = mock.patch.object(db_writer_module, 'db', self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def saved(self):
+        return [(c.args[0], c.args[1], [r['time'] for r in c.args[2]]) for c in self.db.save_candles.call_args_list]
+
+    async def test_batches_and_drops_duplicates(self):
+        writer = WriteBehindQueue(batch_size=100, flush_interval=0.1)
+        writer.start()
+        await writer.save_candles("GOLD", "5m", candles([1, 2, 3]))
+        await writer.save_candles("GOLD", "5m", candles([2, 3, 4]))
+        await writer.save_candles("BTC", "5m", candles([1]))
+        await writer.log_trade("GOLD", "T", "long", 1.0, 0.1, "ORDER_SENT")
+        # Nothing written on the caller's side
+        self.db.save_candles.assert_not_called()
+
+        await asyncio.sleep(0.2)
+        self.assertEqual(self.saved(), [("GOLD", "5m", [1, 2, 3, 4]), ("BTC", "5m", [1])])
+        self.db.log_trade.assert_called_once_with("GOLD", "T", "long", 1.0, 0.1, "ORDER_SENT")
+        stats = writer.stats()
+        self.assertEqual((stats["flushes"], stats["candles"], stats["duplicates"], stats["queue_depth"]), (1, 5, 2, 0))
+        await writer.stop()
+
+    async def test_size_flush_backpressure_and_stop(self):
+        self.db.save_candles.side_effect = lambda *a: time.sleep(0.05) or True
+        writer = WriteBehindQueue(batch_size=2, flush_interval=10, max_pending=1)
+        writer.start()
+        for t in range(6):
+            await writer.save_candles("GOLD", "5m", candles([t]))
+        # A slow DB made producers wait for queue room
+        self.assertGreater(writer.stats()["blocked_s"], 0)
+        await writer.stop()
+        self.assertEqual([t for _, _, times in self.saved() for t in times], list(range(6)))
+        self.assertTrue(all(len(times) <= 2 for _, _, times in self.saved()))
+
+    async def test_failed_flush_is_retried(self):
+        # The DB is down for the first flush of each kind
+        self.db.save_candles.side_effect = [False, True]
+        self.db.log_trade.side_effect = [False, True]
+        writer = WriteBehindQueue(batch_size=100, flush_interval=0.05)
+        writer.start()
+        await writer.save_candles("GOLD", "5m", candles([1, 2]))
+        await writer.log_trade("GOLD", "T", "long", 1.0, 0.1, "ORDER_SENT")
+        await asyncio.sleep(0.1)
+        # Bars closing after the outage are written along with the retry
+        await writer.save_candles("GOLD", "5m", candles([3]))
+        await writer.stop()
+
+        self.assertEqual(self.saved(), [("GOLD", "5m", [1, 2]), ("GOLD", "5m", [1, 2, 3])])
+        self.assertEqual(self.db.log_trade.call_count, 2)
+        stats = writer.stats()
+        self.assertEqual((stats["candles"], stats["trades"], stats["failed_flushes"], stats["dropped"], stats["retrying"]), (3, 1, 1, 0, 0))
+
+    async def test_direct_write_when_not_running(self):
+        writer = WriteBehindQueue()
+        await writer.log_trade("GOLD", "T", "long", 1.0, 0.1, "ORDER_SENT")
+        self.db.log_trade.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
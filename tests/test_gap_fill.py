@@ -0,0 +1,129 @@
+import tempfile
+import unittest
+import numpy as np
+from unittest import mock
+from aiohttp import web
+from backend import backtest_engine
+from backend.backtest_engine import BacktestEngine, missing_ranges, plan_fetches
+from backend.candle_store import CandleStore
+from backend.candle_buffer import block_records
+
+STEP = 300
+T0 = 1_700_000_100 // STEP * STEP
+
+class FakeDB:
+    """Candle table in a dict: {(symbol, timeframe): {ts: candle}}."""
+    def __init__(self, candles=()):
+        self.rows = {("GOLD", "5m"): {c['time']: c for c in candles}}
+        self.queries = 0
+
+    def _range(self, symbol, timeframe, start_ts, end_ts):
+        rows = self.rows.setdefault((symbol, timeframe), {})
+        return [rows[t] for t in sorted(rows) if start_ts <= t <= end_ts]
+
+    def get_candle_rows(self, *args):
+        self.queries += 1
+        return [(c['time'], c['open'], c['high'], c['low'], c['close'], c['tick_volume']) for c in self._range(*args)]
+
+    def get_candle_stats(self, *args):
+        rows = self._range(*args)
+        return (len(rows), rows[0]['time'], rows[-1]['time'], 0.0) if rows else None
+
+    def save_candles(self, symbol, timeframe, candles):
+        if isinstance(candles, np.ndarray):
+            candles = block_records(candles)
+        self.rows.setdefault((symbol, timeframe), {}).update({c['time']: c for c in candles})
+
+def candle(t):
+    return {'time': t, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'tick_volume': 1}
+
+class TestGapMath(unittest.TestCase):
+    def test_missing_ranges(self):
+        times = [T0 + k * STEP for k in (2, 3, 7)]
+        gaps = missing_ranges(times, T0 - 10, T0 + 9 * STEP + 10, STEP)
+        self.assertEqual(gaps, [(T0, T0 + STEP), (T0 + 4 * STEP, T0 + 6 * STEP), (T0 + 8 * STEP, T0 + 9 * STEP)])
+        self.assertEqual(missing_ranges([T0 + k * STEP for k in range(10)], T0, T0 + 9 * STEP, STEP), [])
+
+    def test_plan_merges_and_chunks(self):
+        gaps = [(T0, T0), (T0 + 3 * STEP, T0 + 4 * STEP), (T0 + 100 * STEP, T0 + 124 * STEP)]
+        chunks = plan_fetches(gaps, STEP, merge_bars=5, max_bars=10)
+        self.assertEqual(chunks, [
+            (T0, T0 + 4 * STEP),
+            (T0 + 100 * STEP, T0 + 109 * STEP),
+            (T0 + 110 * STEP, T0 + 119 * STEP),
+            (T0 + 120 * STEP, T0 + 124 * STEP),
+        ])
+
+class TestGetData(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Agent has every bar except a "weekend" [40, 60)
+        self.agent_bars = [T0 + k * STEP for k in range(200) if not 40 <= k < 60]
+        self.requests = []
+
+        async def data(request):
+            start, end = int(request.query['from']), int(request.query['to'])
+            self.requests.append((start, end))
+            return web.json_response([candle(t) for t in self.agent_bars if start <= t <= end])
+
+        app = web.Application()
+        app.router.add_get('/data/{symbol}/{timeframe}', data)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.engine = BacktestEngine(f"http://127.0.0.1:{port}")
+
+        self.db = FakeDB(candle(t) for t in self.agent_bars[:30])
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store_dir = tmp.name
+        self.store = CandleStore(tmp.name)
+        for patcher in (mock.patch.object(backtest_engine, 'db', self.db),
+                        mock.patch.object(backtest_engine, 'candle_store', self.store)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    async def test_fetches_only_missing_bars(self):
+        end = T0 + 199 * STEP
+        with mock.patch.object(backtest_engine, 'FETCH_MAX_BARS', 64):
+            df = await self.engine.get_data("GOLD", "5m", T0, end)
+
+        self.assertEqual(df['time'].tolist(), self.agent_bars)
+        # Only bars 30..199 were requested, in chunks of at most 64 bars
+        self.assertEqual(min(a for a, _ in self.requests), T0 + 30 * STEP)
+        self.assertTrue(all((b - a) // STEP < 64 for a, b in self.requests))
+
+        # Agent data went to the DB too
+        self.assertEqual(sorted(self.db.rows[("GOLD", "5m")]), self.agent_bars)
+
+        # The weekend is known to be empty now: a repeat run is served by the store alone
+        self.requests.clear()
+        queries = self.db.queries
+        again = await self.engine.get_data("GOLD", "5m", T0, end)
+        self.assertEqual(self.requests, [])
+        self.assertEqual(self.db.queries, queries)
+        self.assertEqual(again['close'].tolist(), df['close'].tolist())
+
+        # Also after a restart: the answered ranges were saved next to the candle files
+        with mock.patch.object(backtest_engine, 'candle_store', CandleStore(self.store_dir)):
+            await self.engine.get_data("GOLD", "5m", T0, end)
+        self.assertEqual(self.requests, [])
+        self.assertEqual(self.db.queries, queries)
+
+    async def test_db_tier_reads_gaps_in_one_query(self):
+        # Gaps far apart (like session breaks), found in the DB
+        bars = [T0 + k * STEP for k in range(5000)]
+        in_db = set(bars[::1000])
+        self.store.merge("GOLD", "5m", backtest_engine.to_block([candle(t) for t in bars if t not in in_db]))
+        self.db.rows[("GOLD", "5m")] = {t: candle(t) for t in in_db}
+        df = await self.engine.get_data("GOLD", "5m", T0, bars[-1])
+        self.assertEqual(df['time'].tolist(), bars)
+        self.assertEqual(self.db.queries, 1)
+        self.assertEqual(self.requests, [])
+
+if __name__ == '__main__':
+    unittest.main()
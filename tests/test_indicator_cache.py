@@ -0,0 +1,67 @@
+import unittest
+import pandas as pd
+import numpy as np
+import pandas_ta as ta
+from backend.indicator_cache import IndicatorCache, fingerprint
+
+def make_close(n=400, seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.Series(100 + np.cumsum(rng.normal(0, 1, n)), name='close')
+
+class TestIndicatorCache(unittest.TestCase):
+    def test_hit_reuses_series(self):
+        cache = IndicatorCache()
+        close = make_close()
+        first = cache.compute('ema', close, length=50)
+        second = cache.compute('ema', close.copy(), length=50)
+
+        pd.testing.assert_series_equal(first, ta.ema(close, length=50))
+        pd.testing.assert_series_equal(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_params_and_data_are_part_of_key(self):
+        cache = IndicatorCache()
+        close = make_close()
+        cache.compute('ema', close, length=50)
+        cache.compute('ema', close, length=100)
+        cache.compute('ema', close + 1, length=50)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.hits, 0)
+
+    def test_result_follows_caller_index(self):
+        cache = IndicatorCache()
+        close = make_close()
+        cache.compute('rsi', close, length=14)
+        shifted = close.copy()
+        shifted.index = shifted.index + 1000
+        out = cache.compute('rsi', shifted, length=14)
+        self.assertEqual(cache.hits, 1)
+        self.assertTrue(out.index.equals(shifted.index))
+
+    def test_cached_arrays_are_not_shared(self):
+        cache = IndicatorCache()
+        close = make_close()
+        out = cache.compute('ema', close, length=20)
+        out.iloc[-1] = -1
+        self.assertNotEqual(cache.compute('ema', close, length=20).iloc[-1], -1)
+
+    def test_lru_eviction_by_bytes(self):
+        close = make_close(n=1000)
+        cache = IndicatorCache(max_bytes=2 * close.to_numpy().nbytes + 1)
+        cache.compute('ema', close, length=10)
+        cache.compute('ema', close, length=20)
+        cache.compute('ema', close, length=10) # refresh 10 -> 20 is now oldest
+        cache.compute('ema', close, length=30)
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+
+        cache.compute('ema', close, length=10)
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_fingerprint_ignores_index(self):
+        close = make_close()
+        self.assertEqual(fingerprint(close), fingerprint(close.reset_index(drop=True).to_numpy()))
+        self.assertNotEqual(fingerprint(close), fingerprint(close * 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from backend import strategy_engine
+from backend.market_data import CandleSnapshot
+from backend.streaming_indicators import live_indicators
+from backend.strategy_engine import StrategyEngine, HISTORY_BARS
+from strategy.BitcoinBreakout.bitcoin_breakout import BitcoinBreakout
+from strategy.Gold.gold_trend import GoldTrend
+
+def make_block(n, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 40, n))
+    open_ = np.r_[close[0], close[:-1]]
+    return np.array([
+        1_700_000_000 + np.arange(n) * 300, open_,
+        np.maximum(open_, close) + rng.uniform(0, 30, n),
+        np.minimum(open_, close) - rng.uniform(0, 30, n),
+        close, rng.integers(1, 100, n),
+    ], dtype=float)
+
+class TestLiveHistory(unittest.IsolatedAsyncioTestCase):
+    """Streaming engines see what a HISTORY_BARS recompute saw, however long their state runs."""
+
+    def engine(self, strategy_class, mode, symbol):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        live_indicators._series.clear()
+        return StrategyEngine(name=mode, mode=mode, log_file=os.path.join(tmp.name, "engine.log"),
+                              strategy_class=strategy_class, symbols=[symbol])
+
+    async def analyse(self, engine, symbol, timeframe, block):
+        snapshot = CandleSnapshot(symbol, timeframe, block, 0, 0.0)
+        with mock.patch.object(strategy_engine.market_data, 'refresh', mock.AsyncMock(return_value=snapshot)):
+            frame = await engine.live_frame(symbol, timeframe)
+        return engine._analyse(symbol, frame, None)
+
+    async def test_long_ema_stays_empty(self):
+        engine = self.engine(BitcoinBreakout, "BTC_BREAKOUT_5M", "BITCOIN")
+        block = make_block(HISTORY_BARS + 50)
+        await self.analyse(engine, "BITCOIN", "5m", block[:, :HISTORY_BARS])
+        # Bars later the streaming EMA 200 has a value, but a 200-bar recompute never had one
+        indicators, _, signal, _ = await self.analyse(engine, "BITCOIN", "5m", block[:, 40:])
+        self.assertTrue(np.isnan(indicators['ema_trend'].iloc[-2]))
+        self.assertFalse(np.isnan(indicators['atr'].iloc[-2]))
+        self.assertIsNone(signal)
+
+    async def test_short_history_is_insufficient(self):
+        # GoldTrend needs ema_long + 10 bars, more than HISTORY_BARS
+        engine = self.engine(GoldTrend, "GOLD_1H", "GOLD")
+        indicators, row, signal, _ = await self.analyse(engine, "GOLD", "1h", make_block(1000))
+        self.assertIsNone(indicators)
+        self.assertIsNone(signal)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import time
+import asyncio
+import unittest
+from backend.loop_monitor import LoopLagMonitor
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+class TestLoopLagMonitor(unittest.IsolatedAsyncioTestCase):
+    async def test_blocking_task_is_named(self):
+        monitor = LoopLagMonitor(interval=0.05, threshold=0.05)
+        monitor.start()
+        self.addAsyncCleanup(monitor.stop)
+        await asyncio.sleep(0.1)
+
+        async def engine():
+            await asyncio.sleep(0.01)
+            busy_wait(0.3)
+
+        await asyncio.create_task(engine(), name="engine:TEST")
+        await asyncio.sleep(0.1)
+
+        stats = monitor.stats()
+        self.assertEqual(stats["stalls"], 1)
+        culprit = stats["by_task"]["engine:TEST"]
+        self.assertGreaterEqual(culprit["max_ms"], 200)
+        self.assertIn("tests/test_loop_monitor.py", culprit["where"])
+        self.assertIn("busy_wait", culprit["where"])
+
+    async def test_offloaded_work_does_not_stall(self):
+        monitor = LoopLagMonitor(interval=0.05, threshold=0.05)
+        monitor.start()
+        self.addAsyncCleanup(monitor.stop)
+        await asyncio.get_running_loop().run_in_executor(None, busy_wait, 0.3)
+        await asyncio.sleep(0.1)
+        self.assertEqual(monitor.stats()["stalls"], 0)
+        self.assertGreater(monitor.stats()["samples"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
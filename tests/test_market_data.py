@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+from unittest import mock
+from aiohttp import web
+from backend import market_data as market_data_module
+from backend.market_data import MarketDataHub
+from backend.agent_client import AgentClient
+
+STEP = 300
+T0 = 1_700_000_100 // STEP * STEP
+
+def candle(k):
+    return {'time': T0 + k * STEP, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.0 + k, 'tick_volume': k}
+
+class TestMarketDataHub(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bars = 50
+        self.requests = []
+
+        async def data(request):
+            self.requests.append(dict(request.query))
+            await asyncio.sleep(0.1)
+            bars = [candle(k) for k in range(self.bars)]
+            if 'since' in request.query:
+                bars = [c for c in bars if c['time'] >= int(request.query['since'])]
+            else:
+                bars = bars[-int(request.query['n']):]
+            return web.json_response(bars)
+
+        app = web.Application()
+        app.router.add_get('/data/{symbol}/{timeframe}', data)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.agent = AgentClient(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}")
+
+        self.saved = []
+        writer = mock.Mock()
+        writer.save_candles = mock.AsyncMock(side_effect=lambda symbol, timeframe, rows: self.saved.append([c['time'] for c in rows]))
+        patcher = mock.patch.object(market_data_module, 'db_writer', writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.agent.close()
+        await self.runner.cleanup()
+
+    async def test_concurrent_refreshes_share_one_fetch(self):
+        hub = MarketDataHub(capacity=40, max_age=0)
+        snapshots = await asyncio.gather(*[hub.refresh(self.agent, "GOLD", "5m") for _ in range(3)])
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.requests[0], {'n': '40'})
+        self.assertTrue(all(s is snapshots[0] for s in snapshots))
+        self.assertEqual(snapshots[0].size, 40)
+        self.assertFalse(snapshots[0].block.flags.writeable)
+        self.assertEqual(hub.stats()['coalesced'], 2)
+
+        # Everything but the forming bar is queued for the DB
+        self.assertEqual(self.saved, [[T0 + k * STEP for k in range(10, 49)]])
+
+        # Next refresh asks only for bars since the newest held; the DB gets the bars that closed since
+        self.bars = 52
+        snapshot = await hub.refresh(self.agent, "GOLD", "5m")
+        self.assertEqual(self.requests[-1], {'since': str(T0 + 49 * STEP)})
+        self.assertEqual(snapshot.added, 2)
+        self.assertEqual(snapshot.last_time, T0 + 51 * STEP)
+        self.assertEqual(self.saved[-1], [T0 + k * STEP for k in (49, 50)])
+        self.assertEqual([c['time'] for c in snapshot.records_since(T0 + 50 * STEP)], [T0 + 50 * STEP, T0 + 51 * STEP])
+        # The earlier snapshot is untouched
+        self.assertEqual(snapshots[0].last_time, T0 + 49 * STEP)
+
+    async def test_recent_snapshot_served_without_fetch(self):
+        hub = MarketDataHub(capacity=40, max_age=5)
+        first = await hub.refresh(self.agent, "GOLD", "5m")
+        again = await hub.refresh(self.agent, "GOLD", "5m")
+        self.assertIs(again, first)
+        self.assertEqual(len(self.requests), 1)
+
+        # Feeds are per (symbol, timeframe)
+        await hub.refresh(self.agent, "GOLD", "1h")
+        self.assertEqual(len(self.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,71 +1,55 @@
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
-import asyncio
+import tempfile
+import os
 from backend.strategy_engine import StrategyEngine
 
-class TestOrderPayload(unittest.IsolatedAsyncioTestCase):
-    async def test_execute_trade_sends_market_order(self):
-        # Setup
-        engine = StrategyEngine(name="TestBot", mode="15m1m", log_file="test.log")
-        engine.agent_url = "http://mock-agent:8001"
-        
-        # Mock Session
-        mock_response = MagicMock()
-        mock_response.status = 200
-        mock_response.json = AsyncMock(return_value={"retcode": 0})
-        mock_response.__aenter__.return_value = mock_response
+class FixedRiskStrategy:
+    """No get_position_size, so the engine sizes with its RiskManager."""
 
+class TestOrderPayload(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.engine = StrategyEngine(name="TestBot", mode="15m1m", log_file=os.path.join(tmp.name, "test.log"),
+                                     strategy_class=FixedRiskStrategy)
         # Mock Risk Manager to return valid qty
-        engine.risk_manager.calculate_lot_size = MagicMock(return_value=0.1)
+        self.engine.risk_manager.calculate_lot_size = MagicMock(return_value=0.1)
+        self.engine.notifier = MagicMock(send_message=AsyncMock())
+        # Mock AgentClient: /trade answers {"retcode": 0}
+        self.engine.agent = MagicMock(post=AsyncMock(return_value={"retcode": 0}))
 
-        # Execute
-        with patch('aiohttp.ClientSession.post', return_value=mock_response) as mock_post:
-            with patch('aiohttp.ClientSession.get', return_value=mock_response): # Account info mock
-                async with asyncio.Lock(): # dummy context
-                    # manually call execute_trade with a session
-                    # We need to simulate the session context manager in execute_trade?
-                    # execute_trade takes 'session' as arg.
-                    
-                    mock_session = MagicMock()
-                    mock_session.post.return_value = mock_response
-                    mock_session.get.return_value = mock_response
-                    
-                    # Call with explicit order_type="market" (which is now default, but testing explicit)
-                    await engine.execute_trade(mock_session, "BTCUSD", "long", 50000, 49000, 52000, order_type="market")
-                    
-                    # Verify
-                    mock_session.post.assert_called_once()
-                    args, kwargs = mock_session.post.call_args
-                    
-                    url = args[0]
-                    payload = kwargs['json']
-                    
-                    print(f"URL: {url}")
-                    print(f"Payload: {payload}")
-                    
-                    self.assertEqual(payload['order_type'], "market")
-                    self.assertEqual(payload['action'], "buy")
-                    self.assertEqual(payload['price'], 50000) # It sends price, but Agent ignores it for market
+        # Balance comes from the shared account snapshot; the trade log goes to the DB writer
+        for target, mock in (('account_state', MagicMock(get=AsyncMock(return_value={"balance": 1000.0}))),
+                             ('db_writer', MagicMock(log_trade=AsyncMock()))):
+            patcher = patch(f'backend.strategy_engine.{target}', mock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
 
-    async def test_execute_trade_default_is_market(self):
-        # Setup
-        engine = StrategyEngine(name="TestBot", mode="15m1m", log_file="test.log")
-        
-        mock_response = MagicMock()
-        mock_response.status = 200
-        engine.risk_manager.calculate_lot_size = MagicMock(return_value=0.1)
+    async def test_execute_trade_sends_market_order(self):
+        # Call with explicit order_type="market" (which is now default, but testing explicit)
+        await self.engine.execute_trade("BTCUSD", "long", 50000, 49000, 52000, order_type="market")
 
-        mock_session = MagicMock()
-        mock_session.post.return_value = mock_response
-        mock_session.get.return_value = mock_response
-        mock_response.__aenter__.return_value = mock_response
+        # Verify
+        self.engine.agent.post.assert_awaited_once()
+        args, kwargs = self.engine.agent.post.call_args
+        self.assertEqual(args[0], "/trade")
+        payload = kwargs['json']
+
+        self.assertEqual(payload['order_type'], "market")
+        self.assertEqual(payload['action'], "buy")
+        self.assertEqual(payload['price'], 50000) # It sends price, but Agent ignores it for market
+        self.assertEqual(payload['volume'], 0.1)
+        self.engine.risk_manager.calculate_lot_size.assert_called_once()
+        self.assertEqual(self.engine.risk_manager.calculate_lot_size.call_args.args[0], 1000.0)
 
+    async def test_execute_trade_default_is_market(self):
         # Call WITHOUT order_type arg
-        await engine.execute_trade(mock_session, "BTCUSD", "long", 50000, 49000, 52000)
-        
-        args, kwargs = mock_session.post.call_args
+        await self.engine.execute_trade("BTCUSD", "long", 50000, 49000, 52000)
+
+        args, kwargs = self.engine.agent.post.call_args
         payload = kwargs['json']
-        
+
         self.assertEqual(payload['order_type'], "market", "Default order type should be market")
 
 if __name__ == '__main__':
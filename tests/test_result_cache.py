@@ -0,0 +1,41 @@
+import os
+import time
+import tempfile
+import unittest
+from backend.result_cache import ResultCache, result_key
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_roundtrip_and_keys(self):
+        cache = ResultCache(self.tmp.name)
+        key = result_key(1, "GoldFlux", (("rr", "2.0"),), "GOLD", "5m", (100, 0, 29700, 123.5), 1000.0)
+        self.assertEqual(key, result_key(1, "GoldFlux", (("rr", "2.0"),), "GOLD", "5m", (100, 0, 29700, 123.5), 1000.0))
+        self.assertNotEqual(key, result_key(1, "GoldFlux", (("rr", "2.0"),), "GOLD", "5m", (101, 0, 30000, 124.0), 1000.0))
+
+        self.assertIsNone(cache.get(key))
+        cache.put(key, {"final_balance": 1234.5, "trades": [{"pnl": 1.0}]})
+        self.assertEqual(cache.get(key)["trades"], [{"pnl": 1.0}])
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(self.tmp.name, max_bytes=25_000)
+        payload = {"blob": bytes(10_000)}
+        for key in ("a", "b"):
+            cache.put(key, payload)
+        # Touch "a" so "b" becomes the oldest
+        old = time.time() - 60
+        os.utime(os.path.join(self.tmp.name, "b.pkl"), (old, old))
+        cache.get("a")
+
+        cache.put("c", payload)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertLessEqual(cache.stats()["bytes"], 25_000)
+
+if __name__ == '__main__':
+    unittest.main()
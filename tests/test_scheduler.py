@@ -0,0 +1,95 @@
+import time
+import asyncio
+import unittest
+from unittest import mock
+from aiohttp import web
+from backend.config import TIMEFRAME_SECONDS
+from backend.scheduler import BarCloseScheduler
+from backend.agent_client import AgentClient
+
+class FakeEngine:
+    def __init__(self, active=True, positions=False):
+        self.name = "FAKE"
+        self.active_mode = "GOLD_5M"
+        self.symbols = ["GOLD"]
+        self.agent = None
+        self.active = active
+        self.positions = positions
+        self.calls = []
+
+    async def run_loop(self, entries=True, exits=True, bar_open=None, symbols=None):
+        self.calls.append((time.time(), entries, bar_open))
+        return []
+
+class TestBarCloseScheduler(unittest.IsolatedAsyncioTestCase):
+    def test_next_close_uses_agent_clock(self):
+        scheduler = BarCloseScheduler([], close_delay=1.0)
+        scheduler.offset = 7200 + 3.0  # Broker at UTC+2, agent clock 3s ahead
+        fire_at, bar_open = scheduler.next_close(300, now=1_700_000_000)
+        # Server time is 1_700_007_203 -> next 5m bar opens at 1_700_007_300
+        self.assertEqual(bar_open, 1_700_007_300)
+        self.assertAlmostEqual(fire_at, 1_700_000_000 + 97 + 1.0)
+
+    async def test_sync_clock(self):
+        async def agent_time(request):
+            self.assertEqual(request.query['symbol'], "GOLD")
+            return web.json_response({"time": time.time() + 2.5, "server_offset": 10800})
+
+        app = web.Application()
+        app.router.add_get('/time', agent_time)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        self.addAsyncCleanup(runner.cleanup)
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+
+        engine = FakeEngine()
+        engine.agent = AgentClient(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}")
+        self.addAsyncCleanup(engine.agent.close)
+        scheduler = BarCloseScheduler([engine])
+        await scheduler.sync_clock()
+        self.assertAlmostEqual(scheduler.offset, 10800 + 2.5, delta=0.1)
+
+    async def test_entries_follow_bar_closes(self):
+        engine = FakeEngine()
+        scheduler = BarCloseScheduler([engine], close_delay=0.05, exit_interval=0.3, bar_wait=0)
+        with mock.patch.dict(TIMEFRAME_SECONDS, {"5m": 1}):
+            task = asyncio.create_task(scheduler._engine_loop(engine))
+            await asyncio.sleep(2.5)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        entries = [(t, bar_open) for t, is_entry, bar_open in engine.calls if is_entry]
+        # One pass when the engine is first seen active, then one per bar close
+        self.assertIsNone(entries[0][1])
+        closes = entries[1:]
+        self.assertIn(len(closes), (2, 3))
+        for fired, bar_open in closes:
+            self.assertGreaterEqual(fired, bar_open + 0.05)
+            self.assertLess(fired, bar_open + 0.2)
+        # Exit checks in between, at their own cadence
+        exits = [t for t, is_entry, _ in engine.calls if not is_entry]
+        self.assertGreaterEqual(len(exits), 3)
+
+    async def test_follows_mode_and_offset_changes(self):
+        engine = FakeEngine()
+        scheduler = BarCloseScheduler([engine], close_delay=0.05, exit_interval=0.2, bar_wait=0)
+        with mock.patch.dict(TIMEFRAME_SECONDS, {"5m": 1000, "1m": 1}):
+            task = asyncio.create_task(scheduler._engine_loop(engine))
+            await asyncio.sleep(0.3)
+            # Switched to a 1m mode, and the first clock sync lands
+            engine.active_mode = "15m1m"
+            scheduler.offset = 0.5
+            await asyncio.sleep(2.5)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        closes = [(t, bar_open) for t, is_entry, bar_open in engine.calls if is_entry and bar_open is not None]
+        self.assertGreaterEqual(len(closes), 2)
+        for fired, bar_open in closes:
+            # Closes on the new bar length, on the agent's clock
+            self.assertGreaterEqual(fired + 0.5, bar_open + 0.05)
+            self.assertLess(fired + 0.5, bar_open + 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
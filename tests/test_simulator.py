@@ -0,0 +1,99 @@
+import json
+import unittest
+import pandas as pd
+import numpy as np
+from backend.backtest_engine import BacktestEngine
+from backend.simulator import simulate, trades_to_records, NOTES
+
+class ColumnStrategy:
+    """Reads pre-baked signal/exit/level columns, so both engine paths see identical decisions."""
+    lot = 1.0
+
+    def get_signal(self, window):
+        return {1: "long", -1: "short"}.get(int(window.iloc[-1]['sig']))
+
+    def get_exit_signal(self, window, position_type):
+        return bool(window.iloc[-1]['exit_long' if position_type == 'long' else 'exit_short'])
+
+    def get_entry_params(self, signal, window):
+        curr = window.iloc[-1]
+        return curr['close'], curr['sl'], curr['tp']
+
+    def get_position_size(self, balance):
+        return self.lot
+
+def make_frame(n=3000, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) + rng.uniform(0, 1, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 1, n)
+    sig = rng.choice([0, 0, 0, 0, 1, -1], n)
+    dist = rng.uniform(0.5, 3, n)
+    df = pd.DataFrame({
+        'time': 1_700_000_000 + np.arange(n) * 60,
+        'open': open_, 'high': high, 'low': low, 'close': close,
+        'sig': sig,
+        'sl': np.where(sig == 1, close - dist, close + dist),
+        'tp': np.where(sig == 1, close + 2 * dist, close - 2 * dist),
+        'exit_long': rng.random(n) < 0.05,
+        'exit_short': rng.random(n) < 0.05,
+    })
+    # Some entries without levels: 0 means "not set" like in the old loop
+    df.loc[rng.random(n) < 0.1, 'tp'] = 0
+    return df
+
+class TestSimulator(unittest.TestCase):
+    def run_both(self, df, start_balance=1000, lot=1.0):
+        strategy = ColumnStrategy()
+        strategy.lot = lot
+        balance, trades, equity = BacktestEngine("http://unused")._run_windows(strategy, df, start_balance)
+
+        res = simulate(
+            df['time'].to_numpy(), df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(),
+            df['close'].to_numpy(), df['sig'].to_numpy(), sl=df['sl'].to_numpy(), tp=df['tp'].to_numpy(),
+            exit_long=df['exit_long'].to_numpy(), exit_short=df['exit_short'].to_numpy(),
+            start_balance=start_balance, size=lambda b: lot, warmup=200,
+        )
+        return (balance, trades, equity), res
+
+    def assert_same(self, expected, res):
+        balance, trades, equity = expected
+        self.assertAlmostEqual(balance, res.balance)
+        records = trades_to_records(res.trades)
+        self.assertEqual(len(trades), len(records))
+        for old, new in zip(trades, records):
+            for key in ('entry_time', 'exit_time', 'type', 'note'):
+                self.assertEqual(old[key], new[key])
+            for key in ('entry', 'exit', 'pnl', 'size'):
+                self.assertAlmostEqual(float(old[key]), new[key])
+        self.assertEqual(len(equity), len(res.equity))
+        np.testing.assert_allclose([e['equity'] for e in equity], res.equity)
+        np.testing.assert_array_equal([e['time'] for e in equity], res.equity_time)
+
+    def test_matches_per_bar_loop(self):
+        df = make_frame()
+        expected, res = self.run_both(df)
+        self.assertGreater(len(res.trades), 50)
+        self.assertIn(NOTES.index("Signal"), res.trades['note'])
+        self.assert_same(expected, res)
+        # Streamed as-is over SSE: plain Python numbers only
+        json.dumps(expected[1])
+
+    def test_liquidation_stops_run(self):
+        df = make_frame(seed=11)
+        expected, res = self.run_both(df, start_balance=5, lot=50.0)
+        self.assertEqual(NOTES[res.trades['note'][-1]], "LIQUIDATED")
+        self.assertEqual(res.balance, 0)
+        self.assert_same(expected, res)
+
+    def test_no_signals(self):
+        df = make_frame()
+        df['sig'] = 0
+        expected, res = self.run_both(df)
+        self.assertEqual(len(res.trades), 0)
+        self.assertEqual(len(res.equity), len(df) - 200)
+        self.assert_same(expected, res)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+from backend.streaming_indicators import (
+    EMA, DEMA, RSI, ATR, ADX, Bollinger, Donchian, SuperTrend, StreamingIndicators,
+)
+from strategy.BitcoinBreakout.bitcoin_breakout import BitcoinBreakout
+from strategy.Gold.gold_trend import GoldTrend
+from strategy.Gold.gold_sniper import GoldSniper
+from strategy.Gold.gold_flux import GoldFlux
+
+def make_candles(n=1500, seed=11):
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 3, n))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'time': 1_700_000_000 + np.arange(n) * 300,
+        'open': open_,
+        'high': np.maximum(open_, close) + rng.uniform(0, 2, n),
+        'low': np.minimum(open_, close) - rng.uniform(0, 2, n),
+        'close': close,
+        'tick_volume': rng.integers(1, 100, n),
+    })
+
+class TestIndicatorParity(unittest.TestCase):
+    """Bar-by-bar updates must reproduce pandas_ta over the whole series."""
+
+    def setUp(self):
+        self.df = make_candles()
+        self.bars = self.df.to_dict('records')
+
+    def stream(self, indicator):
+        rows = []
+        for bar in self.bars:
+            peeked = indicator.peek(bar)
+            rows.append(indicator.update(bar))
+            # Peeking the forming bar gives what the close will commit
+            for name, value in rows[-1].items():
+                np.testing.assert_allclose(peeked[name], value, rtol=1e-12)
+        return pd.DataFrame(rows)
+
+    def assertSeries(self, actual, expected):
+        np.testing.assert_allclose(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float), rtol=1e-9, atol=1e-9)
+
+    def test_moving_averages(self):
+        close = self.df['close']
+        self.assertSeries(self.stream(EMA(200))['ema'], ta.ema(close, length=200))
+        self.assertSeries(self.stream(EMA(50))['ema'], ta.ema(close, length=50))
+        self.assertSeries(self.stream(DEMA(20))['dema'], ta.dema(close, length=20))
+
+    def test_oscillators(self):
+        h, l, c = self.df['high'], self.df['low'], self.df['close']
+        self.assertSeries(self.stream(RSI(14))['rsi'], ta.rsi(c, length=14))
+        self.assertSeries(self.stream(RSI(2))['rsi'], ta.rsi(c, length=2))
+        self.assertSeries(self.stream(ATR(14))['atr'], ta.atr(h, l, c, length=14))
+        adx = self.stream(ADX(14))
+        expected = ta.adx(h, l, c, length=14)
+        self.assertSeries(adx['adx'], expected['ADX_14'])
+        self.assertSeries(adx['dmp'], expected['DMP_14'])
+        self.assertSeries(adx['dmn'], expected['DMN_14'])
+
+    def test_flat_series(self):
+        # No movement at all: NaN, like pandas_ta, rather than a division error
+        bar = {'high': 2000.0, 'low': 2000.0, 'close': 2000.0}
+        rsi, adx = RSI(3), ADX(3)
+        for _ in range(10):
+            self.assertTrue(np.isnan(rsi.update(bar)['rsi']))
+            self.assertTrue(np.isnan(adx.update(bar)['dmp']))
+        self.assertFalse(np.isnan(rsi.update(dict(bar, close=2001.0))['rsi']))
+
+    def test_channels(self):
+        h, l, c = self.df['high'], self.df['low'], self.df['close']
+        bb = self.stream(Bollinger(20, 2.0))
+        expected = ta.bbands(c, length=20, std=2.0)
+        self.assertSeries(bb['lower'], expected.iloc[:, 0])
+        self.assertSeries(bb['mid'], expected.iloc[:, 1])
+        self.assertSeries(bb['upper'], expected.iloc[:, 2])
+
+        dc = self.stream(Donchian(50))
+        self.assertSeries(dc['upper'], h.rolling(50).max())
+        self.assertSeries(dc['lower'], l.rolling(50).min())
+
+        st = self.stream(SuperTrend(10, 3.0))
+        expected = ta.supertrend(h, l, c, length=10, multiplier=3.0)
+        self.assertSeries(st['trend'][1:], expected.iloc[1:, 0])
+        self.assertSeries(st['direction'], expected.iloc[:, 1])
+
+class TestLiveFrame(unittest.TestCase):
+    """The live two-row frame must match calculate_indicators() on the full history."""
+
+    def assert_matches_batch(self, strategy):
+        df = make_candles()
+        batch = strategy.calculate_indicators(df.copy())
+        spec = strategy.streaming_indicators()
+        live = StreamingIndicators()
+        candles = df.to_dict('records')
+
+        # Warm up on the first 1000 bars, then one new bar per cycle
+        for end in range(1000, len(df) + 1, 7):
+            window = candles[max(0, end - 10):end] if end > 1000 else candles[:end]
+            frame = live.frame("GOLD", "5m", spec, window)
+            for column in spec:
+                np.testing.assert_allclose(frame[column].to_numpy(dtype=float),
+                                           batch[column].iloc[end - 2:end].to_numpy(dtype=float),
+                                           rtol=1e-9, err_msg=f"{column} at {end}")
+            self.assertEqual(strategy.get_signal(frame), strategy.get_signal(batch.iloc[:end]))
+
+    def test_strategies(self):
+        for strategy in (BitcoinBreakout(), GoldTrend(), GoldSniper(), GoldFlux()):
+            self.assert_matches_batch(strategy)
+
+    def test_missed_bars_drop_state(self):
+        spec = GoldTrend().streaming_indicators()
+        live = StreamingIndicators()
+        candles = make_candles().to_dict('records')
+        self.assertIsNotNone(live.frame("GOLD", "1h", spec, candles[:1000]))
+        self.assertTrue(live.is_warm("GOLD", "1h", spec))
+
+        # The next fetch starts after bars the state never saw
+        self.assertIsNone(live.frame("GOLD", "1h", spec, candles[1100:1110]))
+        self.assertFalse(live.is_warm("GOLD", "1h", spec))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import pandas as pd
+import numpy as np
+from backend.sweep import ParameterSweep, SharedCandles, attach_candles, param_grid
+
+def window_stats(params, df):
+    """Module-level so the process pool can pickle it."""
+    return {'rows': len(df), 'first': int(df['time'].iloc[0]), 'scaled': float(df['close'].sum() * params['k'])}
+
+def make_candles(n=500):
+    close = np.linspace(100, 200, n)
+    return pd.DataFrame({
+        'time': 1_700_000_000 + np.arange(n) * 60,
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+    })
+
+class TestSweep(unittest.TestCase):
+    def test_param_grid(self):
+        grid = param_grid({'ema': [100, 200], 'rsi': [30, 35, 40], 'rr': 2.0})
+        self.assertEqual(len(grid), 6)
+        self.assertIn({'ema': 200, 'rsi': 35, 'rr': 2.0}, grid)
+
+    def test_shared_candles_roundtrip(self):
+        df = make_candles()
+        with SharedCandles(df) as shared:
+            shm, view = attach_candles(shared.spec)
+            pd.testing.assert_frame_equal(view, df[['time', 'open', 'high', 'low', 'close']], check_dtype=True)
+            del view
+            shm.close()
+
+    def test_sweep_windows(self):
+        df = make_candles()
+        configs = param_grid({'k': [1, 2, 3]})
+        start = int(df['time'].iloc[100])
+
+        results = {}
+        for params, window, res in ParameterSweep(window_stats, workers=2, progress=False).run(configs, df, windows={'all': None, 'tail': start}):
+            results[(params['k'], window)] = res
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[(1, 'all')]['rows'], 500)
+        self.assertEqual(results[(2, 'tail')]['rows'], 400)
+        self.assertEqual(results[(2, 'tail')]['first'], start)
+        self.assertAlmostEqual(results[(3, 'all')]['scaled'], df['close'].sum() * 3)
+
+if __name__ == '__main__':
+    unittest.main()
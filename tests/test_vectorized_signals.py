@@ -0,0 +1,49 @@
+import unittest
+import pandas as pd
+import numpy as np
+from strategy.BitcoinBreakout.bitcoin_breakout import BitcoinBreakout
+from strategy.Gold.gold_trend import GoldTrend
+from strategy.Gold.gold_sniper import GoldSniper
+from strategy.Gold.gold_flux import GoldFlux
+
+def make_candles(n=600, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 3, n))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'time': 1_700_000_000 + np.arange(n) * 300,
+        'open': open_,
+        'high': np.maximum(open_, close) + rng.uniform(0, 2, n),
+        'low': np.minimum(open_, close) - rng.uniform(0, 2, n),
+        'close': close,
+    })
+
+class TestVectorizedSignals(unittest.TestCase):
+    """generate_signals must reproduce the per-bar get_signal/get_exit_signal results."""
+
+    def assert_matches_per_bar(self, strategy):
+        df = strategy.calculate_indicators(make_candles())
+        signals = strategy.generate_signals(df)
+        sides = {1: "long", -1: "short"}
+
+        for i in range(200, len(df)):
+            window = df.iloc[:i+1]
+            self.assertEqual(sides.get(int(signals['entry'][i])), strategy.get_signal(window), f"entry at {i}")
+            self.assertEqual(bool(signals['exit_long'][i]), bool(strategy.get_exit_signal(window, 'long')), f"exit_long at {i}")
+            self.assertEqual(bool(signals['exit_short'][i]), bool(strategy.get_exit_signal(window, 'short')), f"exit_short at {i}")
+
+    def test_bitcoin_breakout(self):
+        self.assert_matches_per_bar(BitcoinBreakout())
+
+    def test_gold_trend(self):
+        self.assert_matches_per_bar(GoldTrend())
+
+    def test_gold_sniper(self):
+        self.assert_matches_per_bar(GoldSniper())
+        self.assert_matches_per_bar(GoldSniper(use_bands=True, rsi_lower=20, rsi_upper=80))
+
+    def test_gold_flux(self):
+        self.assert_matches_per_bar(GoldFlux())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import pandas as pd
+import numpy as np
+from backend.walk_forward import WalkForward, make_folds, DAY
+
+def drift_fold(params, df, bounds):
+    """Module-level so the process pool can pickle it. Balance grows by params['k'] per bar."""
+    first, stop = bounds
+    n = stop - first
+    equity = 1000 + params['k'] * np.arange(1, n + 1)
+    res = {'roi': (equity[-1] - 1000) / 10, 'wr': 100, 'trades': n, 'first': first}
+    if params.get('_equity'):
+        res.update({'equity': equity, 'time': df['time'].to_numpy()[first:stop], 'start_balance': 1000})
+    return res
+
+def make_candles(days=10):
+    t = 1_700_000_000 + np.arange(days * 24) * 3600
+    return pd.DataFrame({'time': t, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0})
+
+class TestWalkForward(unittest.TestCase):
+    def test_folds_tile_out_of_sample(self):
+        times = make_candles()['time'].to_numpy()
+        folds = make_folds(times, in_sample_days=4, out_of_sample_days=2)
+
+        self.assertEqual(len(folds), 3)
+        self.assertEqual(folds[0]['is'], (int(times[0]), int(times[0]) + 4 * DAY))
+        for a, b in zip(folds, folds[1:]):
+            self.assertEqual(a['oos'][1], b['oos'][0])
+            self.assertEqual(a['oos'][0], a['is'][1])
+
+    def test_best_config_is_stitched(self):
+        df = make_candles()
+        wf = WalkForward(drift_fold, in_sample_days=4, out_of_sample_days=2, min_trades=1, workers=2, progress=False)
+        report = wf.run([{'k': 1}, {'k': 3}, {'k': 2}], df)
+
+        self.assertEqual([f['params']['k'] for f in report['folds']], [3, 3, 3])
+        # OOS bars are covered once, in order
+        self.assertTrue(np.all(np.diff(report['time']) > 0))
+        self.assertEqual(len(report['equity']), len(report['time']))
+
+        # Each fold compounds on the previous fold's closing balance
+        expected = 1000.0
+        for fold in report['folds']:
+            n = fold['out_of_sample']['trades']
+            expected *= (1000 + 3 * n) / 1000
+        self.assertAlmostEqual(report['final_balance'], expected)
+
+if __name__ == '__main__':
+    unittest.main()
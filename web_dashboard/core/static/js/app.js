@@ -409,6 +409,7 @@ window.stopAll = async function () {
 
 // --- Global Backtest Logic ---
 window.backtestTrades = {}; // Store trades globally
+window.backtestEquity = {}; // Downsampled equity points per strategy
 
 async function runGlobalBacktest() {
     const daysInput = document.getElementById('backtestDays');
@@ -427,6 +428,7 @@ async function runGlobalBacktest() {
 
     // Clear previous trades
     window.backtestTrades = {};
+    window.backtestEquity = {};
 
     // New Strategy Mapping
     const strategies = [
@@ -458,26 +460,38 @@ async function runGlobalBacktest() {
 
         // ... rest of logic
 
-        try {
-            const response = await fetch(`${API_BASE}/api/backtest`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    strategy: item.strategy,
-                    symbol: item.symbol,
-                    timeframe: item.timeframe,
-                    balance: capital,
-                    days: parseInt(days)
-                })
+        // Stream the run: trades and equity arrive while the simulation is still going
+        window.backtestTrades[item.id] = [];
+        window.backtestEquity[item.id] = [];
+        const params = new URLSearchParams({
+            strategy: item.strategy,
+            symbol: item.symbol,
+            timeframe: item.timeframe,
+            balance: capital,
+            days: parseInt(days)
+        });
+
+        await new Promise((resolve) => {
+            const source = new EventSource(`${API_BASE}/api/backtest/stream?${params}`);
+            const finish = () => { source.close(); resolve(); };
+
+            source.addEventListener('progress', (e) => {
+                const data = JSON.parse(e.data);
+                if (wrSpan && data.stage === 'simulating') wrSpan.innerText = data.pct.toFixed(0) + "%";
             });
 
-            if (response.ok) {
-                const data = await response.json();
-                if (data.error) {
-                    if (wrSpan) wrSpan.innerText = "Err";
-                    return;
-                }
+            source.addEventListener('trades', (e) => {
+                const data = JSON.parse(e.data);
+                window.backtestTrades[item.id].push(...data.trades);
+            });
+
+            source.addEventListener('equity', (e) => {
+                const data = JSON.parse(e.data);
+                window.backtestEquity[item.id].push(...data.points);
+            });
 
+            source.addEventListener('done', (e) => {
+                const data = JSON.parse(e.data).result;
                 const start = capital;
                 const end = data.final_balance;
                 const pnl = end - start;
@@ -485,11 +499,6 @@ async function runGlobalBacktest() {
                 let winRate = (data.win_rate * 100).toFixed(0) + "%";
                 if (data.total_trades === 0) winRate = "-";
 
-                // Store Trades
-                if (data.trades) {
-                    window.backtestTrades[item.id] = data.trades;
-                }
-
                 // Update UI (Generic)
                 if (resDiv) resDiv.style.opacity = "1";
                 if (wrSpan) wrSpan.innerText = winRate;
@@ -497,10 +506,15 @@ async function runGlobalBacktest() {
                     pnlSpan.innerText = (pnl >= 0 ? "+" : "") + pnl.toFixed(2);
                     pnlSpan.style.color = color;
                 }
-            }
-        } catch (e) {
-            if (wrSpan) wrSpan.innerText = "Err";
-        }
+                finish();
+            });
+
+            // Server-side failure ("error" event) or a dropped connection
+            source.addEventListener('error', () => {
+                if (wrSpan) wrSpan.innerText = "Err";
+                finish();
+            });
+        });
     });
 
     await Promise.all(promises);
@@ -1,15 +1,23 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone, timedelta
 import uvicorn
 import os
 import json
 import urllib.request
 import urllib.error
 import traceback
+import time
+import struct
+import base64
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # CONFIGURATION
 # Set this to the IP of your Ubuntu Backend, e.g., "http://192.168.1.100:8000"
@@ -17,6 +25,46 @@ BACKEND_URL = os.getenv("BACKEND_URL", "http://192.168.122.1:8001")
 
 app = FastAPI(title="MT5 Windows Agent")
 
+# Columnar candle format, sent when the client asks for it (Accept: application/x-candles).
+# Little-endian: header b"CNDL", u8 version, u8 column count, u16 reserved, u32 bar count,
+# then whole columns time i8[n], open/high/low/close f8[n], tick_volume i8[n].
+# The backend decodes it in backend/candle_codec.py.
+CANDLES_TYPE = "application/x-candles"
+CANDLE_COLUMNS = (("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("tick_volume", "<i8"))
+
+def encode_candles(rates):
+    header = struct.pack("<4sBBHI", b"CNDL", 1, len(CANDLE_COLUMNS), 0, len(rates))
+    return header + b"".join(np.ascontiguousarray(rates[name], dtype=dtype).tobytes() for name, dtype in CANDLE_COLUMNS)
+
+# Range requests are answered in pages covering at most this many bar slots
+MAX_PAGE_BARS = 50000
+TF_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "4h": 14400, "1d": 86400}
+
+def no_rates():
+    return np.zeros(0, dtype=[(name, dtype) for name, dtype in CANDLE_COLUMNS])
+
+def candles_response(request: Request, rates, next_cursor=None):
+    """
+    MT5 rates as columnar bytes when accepted, else the JSON list of dicts.
+    next_cursor (the `from` of the next page) goes in the X-Next-Cursor header.
+    """
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
+    if CANDLES_TYPE in request.headers.get("accept", ""):
+        if len(rates) == 0:
+            rates = no_rates()
+        return Response(content=encode_candles(rates), media_type=CANDLES_TYPE, headers=headers)
+    return JSONResponse([
+        {
+            "time": int(rate['time']), # Unix timestamp
+            "open": float(rate['open']),
+            "high": float(rate['high']),
+            "low": float(rate['low']),
+            "close": float(rate['close']),
+            "tick_volume": int(rate['tick_volume']),
+        }
+        for rate in rates
+    ], headers=headers)
+
 def log_to_backend(level: str, message: str, context: dict = {}):
     """Sends logs to the main backend for centralized viewing."""
     try:
@@ -67,85 +115,362 @@ class InitResponse(BaseModel):
     version: tuple
     terminal_info: dict
 
+class MT5Session:
+    """
+    Owner of the terminal connection. mt5.initialize() runs once, and again
+    only after the link is lost. Every MetaTrader5 call runs on one worker
+    thread, in arrival order. The library is not meant to be driven from
+    several threads, so handlers only await the results. symbol_info() is
+    cached for its static fields.
+    """
+    # mt5.last_error() codes for a lost IPC link to the terminal
+    LOST = (-10001, -10002, -10004, -10005)
+
+    def __init__(self, symbol_ttl=300):
+        self.symbol_ttl = symbol_ttl
+        self.connected = False
+        self.connects = 0
+        self.calls = 0
+        self.pending = 0
+        self.latency = deque(maxlen=500)
+        self._symbols = {}
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mt5")
+
+    async def call(self, fn, *args, retry=True, **kwargs):
+        """Runs fn(*args, **kwargs) on the MT5 thread. retry=False for anything that is not a read."""
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._worker, self._run, fn, args, kwargs, retry)
+        finally:
+            self.pending -= 1
+            self.calls += 1
+            self.latency.append(time.perf_counter() - started)
+
+    def _connect(self):
+        if not mt5.initialize():
+            error = mt5.last_error()
+            log_to_backend("CRITICAL", f"MT5 Initialize Failed: {error}")
+            raise HTTPException(status_code=500, detail=f"MT5 not initialized: {error}")
+        self.connected = True
+        self.connects += 1
+
+    def _lost(self):
+        error = mt5.last_error()
+        return bool(error) and error[0] in self.LOST
+
+    def _run(self, fn, args, kwargs, retry):
+        if not self.connected:
+            self._connect()
+        try:
+            return fn(*args, **kwargs)
+        except HTTPException:
+            if not self._lost():
+                raise
+            self.connected = False
+            self._symbols.clear()
+            mt5.shutdown()
+            if not retry:
+                raise
+        # The terminal dropped the link mid-call: reconnect and read once more
+        log_to_backend("WARNING", "MT5 connection lost, reconnecting")
+        self._connect()
+        return fn(*args, **kwargs)
+
+    def reconnect(self):
+        """MT5 thread only: fresh initialize()."""
+        mt5.shutdown()
+        self.connected = False
+        self._symbols.clear()
+        self._connect()
+
+    def symbol_info(self, symbol):
+        """MT5 thread only: cached symbol_info (static fields; prices come from symbol_info_tick)."""
+        cached = self._symbols.get(symbol)
+        if cached is not None and time.monotonic() - cached[0] < self.symbol_ttl:
+            return cached[1]
+        info = mt5.symbol_info(symbol)
+        if info is None:
+            raise HTTPException(status_code=404, detail=f"{symbol} not found")
+        if not info.visible:
+            if not mt5.symbol_select(symbol, True):
+                raise HTTPException(status_code=404, detail=f"{symbol} not found or not visible")
+        self._symbols[symbol] = (time.monotonic(), info)
+        return info
+
+    def close(self):
+        self._worker.submit(mt5.shutdown).result()
+        self._worker.shutdown()
+
+    def stats(self):
+        latency = sorted(self.latency)
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "calls": self.calls,
+            "pending": self.pending,
+            "cached_symbols": len(self._symbols),
+            "latency_ms": {
+                "p50": round(latency[len(latency) // 2] * 1000, 1),
+                "p95": round(latency[int(len(latency) * 0.95)] * 1000, 1),
+                "max": round(latency[-1] * 1000, 1),
+            } if latency else None,
+        }
+
+session = MT5Session()
+
+class BarCache:
+    """
+    The newest `capacity` bars per (symbol, timeframe), kept on the MT5 thread.
+    A read copies from MT5 only what is new since the newest cached bar: the
+    bar that was forming, and any that opened since. A series is copied at
+    most once per `min_interval` seconds, so MT5 load stays flat however many
+    backend engines poll it. Reads reaching past the cache go to MT5.
+    """
+    def __init__(self, capacity=5000, min_interval=0.25, max_series=200):
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self.max_series = max_series
+        self._series = {}  # (symbol, timeframe) -> [rates, copied_at, read_at]
+        self.hits = 0
+        self.copies = 0
+
+    def read(self, symbol, timeframe, mt5_tf, n=None, since=None):
+        """MT5 thread only: rates like the direct copy would give, or None when the cache cannot answer."""
+        if since is None and (n is None or n > self.capacity):
+            return None
+        key = (symbol, timeframe)
+        now = time.monotonic()
+        entry = self._series.get(key)
+        if entry is None:
+            rates = mt5.copy_rates_from_pos(symbol, mt5_tf, 0, self.capacity)
+            self.copies += 1
+            if rates is None or len(rates) == 0:
+                return None
+            entry = self._series[key] = [rates, now, now]
+            self._evict()
+        elif now - entry[1] >= self.min_interval:
+            rates = entry[0]
+            # Bar times are server time, which can be ahead of UTC: leave room past now
+            new = mt5.copy_rates_range(
+                symbol, mt5_tf,
+                datetime.fromtimestamp(int(rates['time'][-1]), tz=timezone.utc),
+                datetime.now(tz=timezone.utc) + timedelta(days=1),
+            )
+            self.copies += 1
+            if new is None:
+                return None
+            if len(new):
+                entry[0] = np.concatenate([rates[rates['time'] < new['time'][0]], new])[-self.capacity:]
+            entry[1] = now
+        else:
+            self.hits += 1
+        entry[2] = now
+
+        rates = entry[0]
+        if since is not None:
+            if since < rates['time'][0]:
+                return None
+            return rates[np.searchsorted(rates['time'], since):]
+        if n is not None and n <= len(rates):
+            return rates[-n:]
+        return None
+
+    def _evict(self):
+        while len(self._series) > self.max_series:
+            oldest = min(self._series, key=lambda k: self._series[k][2])
+            del self._series[oldest]
+
+    def stats(self):
+        return {"series": len(self._series), "hits": self.hits, "mt5_copies": self.copies}
+
+bar_cache = BarCache()
+
+@app.on_event("shutdown")
+def close_session():
+    session.close()
+
 @app.get("/")
 def read_root():
     return {"status": "running", "service": "MT5 Agent"}
 
+@app.get("/session")
+def session_stats():
+    return dict(session.stats(), bar_cache=bar_cache.stats())
+
+def read_tick_time(symbol):
+    tick = mt5.symbol_info_tick(symbol)
+    return tick.time if tick is not None else None
+
+@app.get("/time")
+async def get_time(symbol: str = None):
+    """
+    Agent wall clock, plus the broker's server-time offset from UTC (bar times are
+    in server time) estimated from the symbol's last tick. The offset is None when
+    the tick is stale (market closed), since it could not be told apart from age.
+    """
+    server_offset = None
+    tick_time = await session.call(read_tick_time, symbol) if symbol else None
+    now = time.time()
+    if tick_time is not None:
+        raw = tick_time - now
+        # Broker time zones are whole half hours; what is left over is the tick's age
+        rounded = round(raw / 1800) * 1800
+        if abs(raw - rounded) < 300:
+            server_offset = rounded
+    return {"time": now, "server_offset": server_offset}
+
+def init_info():
+    session.reconnect()
+    return mt5.version(), mt5.terminal_info()._asdict()
+
 @app.post("/init")
-def initialize_mt5():
-    if not mt5.initialize():
-        error_code = mt5.last_error()
-        log_to_backend("CRITICAL", f"MT5 Initialize Failed: {error_code}")
-        raise HTTPException(status_code=500, detail=f"initialize() failed, error code = {error_code}")
-    
-    version = mt5.version()
-    terminal_info = mt5.terminal_info()._asdict()
+async def initialize_mt5():
+    version, terminal_info = await session.call(init_info, retry=False)
     log_to_backend("INFO", "MT5 Initialized Successfully", {"version": version})
     return {"status": True, "version": version, "terminal_info": terminal_info}
 
-@app.get("/account")
-def get_account_info():
-    if not mt5.initialize():
-         raise HTTPException(status_code=500, detail="MT5 not initialized")
-    
+def read_account():
     account_info = mt5.account_info()
     if account_info is None:
         raise HTTPException(status_code=500, detail="Failed to get account info")
-    
     return account_info._asdict()
 
-@app.get("/data/{symbol}/{timeframe}")
-def get_candles(symbol: str, timeframe: str, n: int = 100):
-    if not mt5.initialize():
-         raise HTTPException(status_code=500, detail="MT5 not initialized")
-    
-    # Map timeframe string to MT5 constant
-    tf_map = {
-        "1m": mt5.TIMEFRAME_M1,
-        "5m": mt5.TIMEFRAME_M5,
-        "15m": mt5.TIMEFRAME_M15,
-        "15m": mt5.TIMEFRAME_M15,
-        "30m": mt5.TIMEFRAME_M30,
-        "1h": mt5.TIMEFRAME_H1,
-        "4h": mt5.TIMEFRAME_H4,
-        "1d": mt5.TIMEFRAME_D1,
-    }
-    
-    mt5_tf = tf_map.get(timeframe)
+@app.get("/account")
+async def get_account_info():
+    return await session.call(read_account)
+
+# Map timeframe string to MT5 constant
+TF_MAP = {
+    "1m": mt5.TIMEFRAME_M1,
+    "5m": mt5.TIMEFRAME_M5,
+    "15m": mt5.TIMEFRAME_M15,
+    "30m": mt5.TIMEFRAME_M30,
+    "1h": mt5.TIMEFRAME_H1,
+    "4h": mt5.TIMEFRAME_H4,
+    "1d": mt5.TIMEFRAME_D1,
+}
+
+def read_rates(symbol, timeframe, n=100, start=None, end=None, since=None, limit=MAX_PAGE_BARS):
+    """(MT5 rates array, next page cursor or None) for one /data query; raises HTTPException."""
+    mt5_tf = TF_MAP.get(timeframe)
     if mt5_tf is None:
         raise HTTPException(status_code=400, detail=f"Invalid timeframe: {timeframe}")
     
-    rates = mt5.copy_rates_from_pos(symbol, mt5_tf, 0, n)
+    next_cursor = None
+    if start is None:
+        # Recent bars (polling engines): served from the bar cache when it covers the request
+        rates = bar_cache.read(symbol, timeframe, mt5_tf, n=n if since is None else None, since=since)
+        if rates is not None:
+            return rates, None
+    if since is not None:
+        # Bar times are server time, which can be ahead of UTC: leave room past now
+        rates = mt5.copy_rates_range(
+            symbol, mt5_tf,
+            datetime.fromtimestamp(since, tz=timezone.utc),
+            datetime.now(tz=timezone.utc) + timedelta(days=1),
+        )
+        if rates is not None and len(rates) == 0:
+            return [], None
+    elif start is not None:
+        if end is None:
+            end = int(time.time()) + 86400 # Server time can be ahead of UTC
+        # Bounded page: MT5 only ever copies `limit` bar slots per request
+        limit = max(1, min(limit, MAX_PAGE_BARS))
+        page_end = min(end, start + limit * TF_SECONDS[timeframe] - 1)
+        next_cursor = page_end + 1 if page_end < end else None
+        rates = mt5.copy_rates_range(
+            symbol, mt5_tf,
+            datetime.fromtimestamp(start, tz=timezone.utc),
+            datetime.fromtimestamp(page_end, tz=timezone.utc),
+        )
+        # An empty page (market closed) is a valid answer, not a missing symbol
+        if rates is not None and len(rates) == 0:
+            return [], next_cursor
+    else:
+        rates = mt5.copy_rates_from_pos(symbol, mt5_tf, 0, n)
     if rates is None:
         raise HTTPException(status_code=404, detail=f"No data for {symbol}")
-        
-    # Convert to list of dicts for JSON
-    data = []
-    for rate in rates:
-        data.append({
-            "time": int(rate['time']), # Unix timestamp
-            "open": float(rate['open']),
-            "high": float(rate['high']),
-            "low": float(rate['low']),
-            "close": float(rate['close']),
-            "tick_volume": int(rate['tick_volume']),
-        })
-    
-    return data
+    return rates, next_cursor
+
+@app.get("/data/{symbol}/{timeframe}")
+async def get_candles(request: Request, symbol: str, timeframe: str, n: int = 100,
+                start: int = Query(None, alias="from"), end: int = Query(None, alias="to"),
+                since: int = None, limit: int = MAX_PAGE_BARS):
+    """
+    Latest n bars; or bars with from <= time <= to (unix seconds, `to` defaults to
+    now), one page of at most `limit` bar slots at a time: when more remain, the
+    X-Next-Cursor header holds the `from` of the next page; or every bar with
+    time >= since (the caller's newest bar, possibly still forming at the time, up
+    to the current one). Columnar bytes instead of JSON when the Accept header
+    asks for application/x-candles.
+    """
+    rates, next_cursor = await session.call(read_rates, symbol, timeframe, n=n, start=start, end=end, since=since, limit=limit)
+    # Encoding (JSON especially) runs in the threadpool, not on the MT5 thread
+    return await run_in_threadpool(candles_response, request, rates, next_cursor)
+
+class CandleQuery(BaseModel):
+    symbol: str
+    timeframe: str
+    n: int = 100
+    since: int = None
+
+class BatchRequest(BaseModel):
+    candles: list[CandleQuery] = []
+    account: bool = False
+    positions: bool = False
+    candle_format: str = "json"  # or CANDLES_TYPE
+
+@app.post("/batch")
+async def batch(req: BatchRequest):
+    """
+    Several reads in one round trip. Each candle set is answered as columns
+    ({"time": [...], "open": [...], ...}), or with candle_format CANDLES_TYPE as
+    {"data": base64 of the columnar bytes}, or with its own status and error,
+    so one bad symbol does not fail the others.
+    """
+    # One job on the MT5 thread for the whole batch
+    return await session.call(read_batch, req)
+
+def read_batch(req):
+    out = {"candles": []}
+    for q in req.candles:
+        entry = {"symbol": q.symbol, "timeframe": q.timeframe}
+        try:
+            rates, _ = read_rates(q.symbol, q.timeframe, n=q.n, since=q.since)
+            if req.candle_format == CANDLES_TYPE:
+                entry["data"] = base64.b64encode(encode_candles(rates if len(rates) else no_rates())).decode("ascii")
+            else:
+                entry.update({name: (rates[name].tolist() if len(rates) else []) for name, _ in CANDLE_COLUMNS})
+        except HTTPException as e:
+            # A lost link fails the whole batch, so MT5Session reconnects and reads it again
+            if session._lost():
+                raise
+            entry.update({"status": e.status_code, "error": e.detail})
+        out["candles"].append(entry)
+    if req.account:
+        info = mt5.account_info()
+        if info is None:
+            _raise_if_lost("account_info")
+        out["account"] = info._asdict() if info is not None else None
+    if req.positions:
+        positions = mt5.positions_get()
+        if positions is None:
+            _raise_if_lost("positions_get")
+        out["positions"] = [p._asdict() for p in positions] if positions is not None else None
+    return out
+
+def _raise_if_lost(call):
+    if session._lost():
+        raise HTTPException(status_code=503, detail=f"MT5 connection lost during {call}: {mt5.last_error()}")
 
 @app.post("/trade")
-def execute_trade(trade: TradeRequest):
-    if not mt5.initialize():
-         raise HTTPException(status_code=500, detail="MT5 not initialized")
-    
-    symbol_info = mt5.symbol_info(trade.symbol)
-    if symbol_info is None:
-        raise HTTPException(status_code=404, detail=f"{trade.symbol} not found")
-    
-    if not symbol_info.visible:
-        if not mt5.symbol_select(trade.symbol, True):
-            raise HTTPException(status_code=404, detail=f"{trade.symbol} not found or not visible")
+async def execute_trade(trade: TradeRequest):
+    # Never retried on a lost connection: the order may already be at the broker
+    return await session.call(send_order, trade, retry=False)
 
+def send_order(trade):
+    symbol_info = session.symbol_info(trade.symbol)
     digits = symbol_info.digits
     
     # Determine Order Type
@@ -156,8 +481,11 @@ def execute_trade(trade: TradeRequest):
     if trade.order_type == "market":
         action = mt5.TRADE_ACTION_DEAL
         type_order = mt5.ORDER_TYPE_BUY if trade.action == "buy" else mt5.ORDER_TYPE_SELL
-        # For Market, we must use current Ask/Bid
-        price = symbol_info.ask if trade.action == "buy" else symbol_info.bid
+        # For Market, we must use current Ask/Bid (symbol_info is cached, the tick is not)
+        tick = mt5.symbol_info_tick(trade.symbol)
+        if tick is None:
+            raise HTTPException(status_code=500, detail=f"No price for {trade.symbol}")
+        price = tick.ask if trade.action == "buy" else tick.bid
 
     # Determine Filling Mode
     filling_mode = mt5.ORDER_FILLING_FOK # Default